@@ -0,0 +1,54 @@
+"""
+Trigger-maintained agent workload
+
+``agents.assigned_tickets`` is the number of open (not Resolved) tickets whose
+``complaints.assigned_agent_id`` points at the agent. Triggers on complaints
+keep it exact in the same transaction as any insert, delete, status change or
+reassignment, so ticket code never adjusts it by hand and routing can order
+agents by it directly. The triggers are created by migrations.py.
+``reconcile_workload`` recounts it with one aggregate query and fixes drift.
+"""
+
+OPEN_SQL = "{row}.status IS NOT 'Resolved'"
+
+
+def add_inserted_workload(cursor, first_id):
+    """Fold open complaints with id >= first_id into agents.assigned_tickets
+
+    The bulk-load counterpart of the insert trigger, run once per chunk.
+    """
+    cursor.execute(f'''
+        UPDATE agents SET assigned_tickets = assigned_tickets + inserted.open_tickets
+        FROM (
+            SELECT c.assigned_agent_id, COUNT(*) AS open_tickets
+            FROM complaints c
+            WHERE c.id >= ? AND c.assigned_agent_id IS NOT NULL AND {OPEN_SQL.format(row='c')}
+            GROUP BY c.assigned_agent_id
+        ) AS inserted
+        WHERE agents.id = inserted.assigned_agent_id
+    ''', (first_id,))
+
+
+def reconcile_workload(cursor):
+    """Recount every agent's open tickets, fixing and returning the drift
+
+    Must run inside a write transaction. Returns a list of (name, stored, actual).
+    """
+    cursor.execute(f'''
+        SELECT a.id, a.name, a.assigned_tickets, COALESCE(w.open_tickets, 0)
+        FROM agents a
+        LEFT JOIN (
+            SELECT c.assigned_agent_id, COUNT(*) AS open_tickets
+            FROM complaints c
+            WHERE {OPEN_SQL.format(row='c')}
+            GROUP BY c.assigned_agent_id
+        ) w ON w.assigned_agent_id = a.id
+        WHERE a.assigned_tickets IS NOT COALESCE(w.open_tickets, 0)
+    ''')
+    drift = cursor.fetchall()
+
+    cursor.executemany(
+        "UPDATE agents SET assigned_tickets = ? WHERE id = ?",
+        [(actual, agent_id) for agent_id, _, _, actual in drift]
+    )
+    return [(name, stored, actual) for _, name, stored, actual in drift]
@@ -0,0 +1,90 @@
+"""
+Memoized aggregate results for the admin analytics and workload views
+
+Analytics and workload statistics only change when tickets or agents do, yet
+every admin refresh recomputed them. ``AggregateCache`` keeps each result
+until one of three things happens:
+
+- a ticket or agent write made through this process's ``Database`` calls
+  ``invalidate`` (see database.invalidates_aggregates);
+- the data version moves: a write made by another worker or the db_writer
+  shows up as a new ticket event (see events), read at most once every
+  VERSION_CHECK_INTERVAL seconds;
+- the entry is older than the TTL, a safety net for writes that bypass both.
+
+Between version checks a hit is a dictionary lookup. Cached values are shared
+between callers and must not be modified.
+"""
+
+import threading
+import time
+
+DEFAULT_TTL = 300               # seconds an entry is served at most
+VERSION_CHECK_INTERVAL = 1.0    # seconds between reads of the data version
+
+# Version before the first read, distinct from any version token
+_UNKNOWN = object()
+
+
+class AggregateCache:
+    def __init__(self, version, ttl=DEFAULT_TTL, check_interval=VERSION_CHECK_INTERVAL, clock=time.monotonic):
+        """``version()`` returns a token that changes whenever the cached data may have"""
+        self.version = version
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}              # key: (version, expires, value)
+        self._version = _UNKNOWN
+        self._checked_at = None
+        self._generation = 0            # bumped by invalidate
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_version(self, now):
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._version
+        version = self.version()
+        with self._lock:
+            self._version, self._checked_at = version, now
+        return version
+
+    def get(self, key, compute):
+        """The cached result for ``key``, computing and storing it with ``compute()`` on a miss"""
+        now = self.clock()
+        version = self._current_version(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            generation = self._generation
+
+        value = compute()
+        with self._lock:
+            # A write invalidated while this was computed: the value may predate it
+            if generation == self._generation:
+                self._entries[key] = (version, now + self.ttl, value)
+        return value
+
+    def invalidate(self):
+        """Drop every entry and re-read the data version on the next lookup"""
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
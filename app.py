@@ -1,13 +1,18 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import is_resource_modified
 import os
 from dotenv import load_dotenv
 from gemini_chat import chatbot
 from database import db
 from agent_manager import agent_manager
 from notifications import NotificationSystem
+from blocking_pool import BlockingPool
+import exports
+import events
 import uuid
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
 import markdown
 
 load_dotenv()
@@ -18,6 +23,49 @@ app.secret_key = os.getenv("SECRET_KEY", "P-004-complaint-management-secret-key"
 # Initialize the notification system
 notification_system = NotificationSystem()
 
+# Pushes notification counts and admin stats to open /api/events streams
+event_hub = events.EventHub(db.event_files, notification_system.get_unread_count, db.get_dashboard_stats,
+                            max_streams=events.stream_limit())
+
+# Runs the Gemini calls and database work of the async chat views
+blocking_pool = BlockingPool(cleanup=db.release_connection)
+
+# Tickets rendered per page on the admin listings (more are fetched on demand)
+TICKET_PAGE_SIZE = 50
+MAX_TICKET_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Hand this thread's pooled connection back in a clean state"""
+    db.release_connection()
+
+def conditional_json(version, build, last_modified=None):
+    """jsonify(build()) with an ETag for ``version`` and, if given, a Last-Modified time
+    
+    ``version`` is a cheap token that changes whenever the payload would. A
+    client that already holds it (If-None-Match, or If-Modified-Since for
+    ``last_modified``, a UTC 'YYYY-MM-DD HH:MM:SS' string) gets a 304 without
+    build() being called, so unchanged polls skip the query and serialization.
+    """
+    etag = hashlib.sha1(repr(version).encode()).hexdigest()
+    modified = None
+    if last_modified:
+        modified = datetime.strptime(last_modified, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    
+    if is_resource_modified(request.environ, etag=etag, last_modified=modified):
+        response = jsonify(build())
+    else:
+        response = app.response_class(status=304)
+    
+    response.set_etag(etag)
+    if modified:
+        response.last_modified = modified
+    # Revalidate every time; responses depend on the logged-in user
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
 # Routes
 @app.route("/")
 def index():
@@ -90,7 +138,7 @@ def profile():
     
     user_details = db.get_user_by_id(session['user_id'])
     if user_details:
-        return jsonify({
+        profile_details = {
             "success": True,
             "username": user_details[1],
             "email": user_details[2], 
@@ -98,7 +146,11 @@ def profile():
             "phone": user_details[5] if user_details[5] else "Not provided",
             "created_at": user_details[6],
             "is_admin": bool(user_details[7])
-        })
+        }
+        # Accounts are never edited, so the returned fields are the version;
+        # the password hash never goes into the ETag
+        return conditional_json(tuple(profile_details.values()), lambda: profile_details,
+                                last_modified=user_details[6])
     return jsonify({"success": False, "message": "User not found"})
 
 @app.route("/dashboard")
@@ -122,35 +174,21 @@ def chat():
     
     return render_template("chat.html")
 
-@app.route("/ask", methods=["POST"])
-def ask():
-    """Handle chatbot conversations"""
-    if 'user_id' not in session:
-        return jsonify({"error": "Not authenticated"}), 401
-    
-    data = request.get_json()
-    user_message = data.get("message", "")
-    
-    if not user_message.strip():
-        return jsonify({"reply": "Please enter a message."})
-    
-    # Get chat session ID
-    chat_session_id = session.get('chat_session_id', str(uuid.uuid4()))
-    session['chat_session_id'] = chat_session_id
-    
+def chat_reply(user_id, chat_session_id, user_message):
+    """The /ask response body for a message; blocking, run on blocking_pool"""
     # Get chat history for context
-    chat_history = db.get_chat_history(session['user_id'], chat_session_id)
+    chat_history = db.get_chat_history(user_id, chat_session_id)
     
     # Get bot response
     bot_result = chatbot.chat_with_bot(
         user_message, 
-        user_id=session['user_id'], 
+        user_id=user_id, 
         session_id=chat_session_id
     )
     
-    # Save chat history
-    db.save_chat_history(
-        session['user_id'], 
+    # Queue chat history; it is written in batches off the request path
+    db.queue_chat_history(
+        user_id, 
         chat_session_id, 
         user_message, 
         bot_result['response']
@@ -168,11 +206,93 @@ def ask():
         response_data["show_ticket_button"] = True
         response_data["ticket_message"] = "Would you like me to create a support ticket for this issue?"
     
+    return response_data
+
+@app.route("/ask", methods=["POST"])
+async def ask():
+    """Handle chatbot conversations
+    
+    Async: the bot call waits on blocking_pool, holding no worker thread when
+    served through asgi.py.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    data = request.get_json()
+    user_message = data.get("message", "")
+    
+    if not user_message.strip():
+        return jsonify({"reply": "Please enter a message."})
+    
+    # Get chat session ID
+    chat_session_id = session.get('chat_session_id', str(uuid.uuid4()))
+    session['chat_session_id'] = chat_session_id
+    
+    response_data = await blocking_pool.run(chat_reply, session['user_id'], chat_session_id, user_message)
     return jsonify(response_data)
 
+def ticket_from_chat(user_id, full_name, chat_session_id, user_message):
+    """Create a ticket from a chat and return the /create_ticket response body; blocking, run on blocking_pool"""
+    # Get chat history for context
+    chat_history = db.get_chat_history(user_id, chat_session_id)
+    
+    # Generate ticket summary using AI
+    ticket_info = chatbot.generate_ticket_summary(user_message, chat_history)
+    if not all(key in ticket_info for key in ['title', 'description', 'category', 'priority']):
+        raise ValueError("Failed to generate complete ticket summary from AI.")
+
+    # Create the ticket with auto-assignment enabled
+    ticket_id, complaint_id = db.create_complaint(
+        user_id,
+        ticket_info['title'],
+        ticket_info['description'],
+        ticket_info['category'],
+        ticket_info['priority'],
+        auto_assign=True  # Enable auto-assignment
+    )
+    
+    if not ticket_id:
+        raise ConnectionError("Failed to create a complaint in the database.")
+
+    # Get the assigned agent info
+    complaint = db.get_complaint_by_ticket_id(ticket_id)
+    assigned_agent = complaint['assigned_to'] if complaint else None
+    assigned_agent_id = complaint['assigned_agent_id'] if complaint else None
+    
+    # Create notifications
+    notification_system.create_notification(
+        user_id,
+        f"Ticket #{ticket_id} Created",
+        f"Your {ticket_info['priority']} priority ticket has been created successfully.",
+        "info"
+    )
+    notification_system.create_admin_notification(
+        f"New Ticket Created",
+        f"New {ticket_info['priority']} priority ticket #{ticket_id} created by {full_name}.",
+        "info"
+    )
+    if assigned_agent_id:
+        notification_system.create_agent_notification(
+            assigned_agent_id,
+            f"New Ticket Assignment",
+            f"Ticket #{ticket_id} has been automatically assigned to you.",
+            "info"
+        )
+    
+    assignment_message = f" Your ticket has been automatically assigned to {assigned_agent}." if assigned_agent else ""
+    
+    return {
+        "success": True,
+        "ticket_id": ticket_id,
+        "category": ticket_info['category'],
+        "priority": ticket_info['priority'],
+        "assigned_agent": assigned_agent,
+        "message": f"Support ticket {ticket_id} has been created successfully!{assignment_message} Our team will review your issue."
+    }
+
 @app.route("/create_ticket", methods=["POST"])
-def create_ticket():
-    """Create support ticket from chat with auto-assignment"""
+async def create_ticket():
+    """Create support ticket from chat with auto-assignment (async, like /ask)"""
     if 'user_id' not in session:
         return jsonify({"success": False, "error": "Not authenticated"}), 401
     
@@ -184,63 +304,9 @@ def create_ticket():
         user_message = data.get("message", "")
         chat_session_id = session.get('chat_session_id')
         
-        # Get chat history for context
-        chat_history = db.get_chat_history(session['user_id'], chat_session_id)
-        
-        # Generate ticket summary using AI
-        ticket_info = chatbot.generate_ticket_summary(user_message, chat_history)
-        if not all(key in ticket_info for key in ['title', 'description', 'category', 'priority']):
-            raise ValueError("Failed to generate complete ticket summary from AI.")
-
-        # Create the ticket with auto-assignment enabled
-        ticket_id, complaint_id = db.create_complaint(
-            session['user_id'],
-            ticket_info['title'],
-            ticket_info['description'],
-            ticket_info['category'],
-            ticket_info['priority'],
-            auto_assign=True  # Enable auto-assignment
-        )
-        
-        if not ticket_id:
-            raise ConnectionError("Failed to create a complaint in the database.")
-
-        # Get the assigned agent info
-        complaint = db.get_complaint_by_ticket_id(ticket_id)
-        assigned_agent = complaint['assigned_to'] if complaint else None
-        
-        # Create notifications
-        notification_system.create_notification(
-            session['user_id'],
-            f"Ticket #{ticket_id} Created",
-            f"Your {ticket_info['priority']} priority ticket has been created successfully.",
-            "info"
-        )
-        notification_system.create_admin_notification(
-            f"New Ticket Created",
-            f"New {ticket_info['priority']} priority ticket #{ticket_id} created by {session['full_name']}.",
-            "info"
-        )
-        if assigned_agent:
-            agent = db.get_agent_by_name(assigned_agent)
-            if agent:
-                notification_system.create_agent_notification(
-                    agent['id'],
-                    f"New Ticket Assignment",
-                    f"Ticket #{ticket_id} has been automatically assigned to you.",
-                    "info"
-                )
-        
-        assignment_message = f" Your ticket has been automatically assigned to {assigned_agent}." if assigned_agent else ""
-        
-        return jsonify({
-            "success": True,
-            "ticket_id": ticket_id,
-            "category": ticket_info['category'],
-            "priority": ticket_info['priority'],
-            "assigned_agent": assigned_agent,
-            "message": f"Support ticket {ticket_id} has been created successfully!{assignment_message} Our team will review your issue."
-        })
+        return jsonify(await blocking_pool.run(
+            ticket_from_chat, session['user_id'], session['full_name'], chat_session_id, user_message
+        ))
 
     except Exception as e:
         # Log the full error for debugging
@@ -281,26 +347,66 @@ def admin_dashboard():
         flash("Access denied. Admin privileges required.")
         return redirect(url_for('login'))
     
-    complaints = db.get_all_complaints_admin()
+    page = db.get_complaints_page(limit=TICKET_PAGE_SIZE)
     stats = db.get_dashboard_stats()
+    agents = db.get_all_agents()
     
-    return render_template("admin_dashboard.html", complaints=complaints, stats=stats)
+    return render_template("admin_dashboard.html", complaints=page['tickets'],
+                           next_cursor=page['next_cursor'], stats=stats, agents=agents)
+
+def ticket_conflict_response(result):
+    """409 for a compare-and-swap update that lost to a concurrent edit"""
+    return jsonify({
+        "error": "Ticket was changed by someone else; reload it and try again",
+        "conflict": True,
+        "ticket": result
+    }), 409
+
+def parse_row_version(data):
+    """The row_version a client read the ticket at, or None for an unconditional update"""
+    row_version = data.get("row_version")
+    return int(row_version) if row_version is not None else None
 
 @app.route("/admin/update_ticket", methods=["POST"])
 def admin_update_ticket():
-    """Admin update ticket status"""
+    """Admin update ticket status, and optionally its agent
+    
+    Send the ticket's row_version to update only if nobody changed it since;
+    otherwise the response is a 409 with the ticket's current state.
+    """
     if not session.get('is_admin'):
         return jsonify({"error": "Access denied"}), 403
     
     data = request.get_json()
     ticket_id = data.get("ticket_id")
     status = data.get("status")
-    assigned_to = data.get("assigned_to")
+    agent_id = data.get("assigned_agent_id") or None
     resolution_notes = data.get("resolution_notes")
     
-    db.update_complaint_status(ticket_id, status, assigned_to, resolution_notes)
+    if not ticket_id or not status:
+        return jsonify({"error": "Ticket ID and status are required"}), 400
     
-    return jsonify({"success": True, "message": "Ticket updated successfully"})
+    try:
+        result = db.update_complaint_status(ticket_id, status, agent_id, resolution_notes, parse_row_version(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    
+    if result.conflict:
+        return ticket_conflict_response(result)
+    
+    # The update returned the ticket's owner and agent, so no re-read is needed
+    notification_system.create_notification(
+        result.user_id,
+        "Ticket Status Update",
+        f"Your ticket #{ticket_id} has been updated to {status}.",
+        "info"
+    )
+    notification_system.create_admin_notification(
+        "Ticket Status Changed",
+        f"Ticket #{ticket_id} status changed to {status} by {session.get('full_name', 'admin')}",
+        "info"
+    )
+    return jsonify({"success": True, "message": "Ticket updated successfully", "row_version": result.row_version})
 
 @app.route("/admin/agents")
 def admin_agents():
@@ -325,8 +431,9 @@ def admin_agent_details(agent_id):
         flash("Agent not found")
         return redirect(url_for('admin_agents'))
     
-    assigned_tickets = db.get_agent_tickets(agent['name'])
-    return render_template("admin_agent_details.html", agent=agent, tickets=assigned_tickets)
+    page = db.get_complaints_page(limit=TICKET_PAGE_SIZE, agent_id=agent_id)
+    return render_template("admin_agent_details.html", agent=agent, tickets=page['tickets'],
+                           next_cursor=page['next_cursor'])
 
 @app.route("/admin/assign_ticket", methods=["POST"])
 def assign_ticket():
@@ -336,11 +443,18 @@ def assign_ticket():
     
     data = request.get_json()
     ticket_id = data.get("ticket_id")
-    agent_name = data.get("agent_name")
+    agent_id = data.get("agent_id")
+    
+    try:
+        result = db.assign_ticket_to_agent(ticket_id, agent_id, parse_row_version(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
     
-    db.assign_ticket_to_agent(ticket_id, agent_name)
+    if result.conflict:
+        return ticket_conflict_response(result)
     
-    return jsonify({"success": True, "message": f"Ticket assigned to {agent_name} successfully"})
+    return jsonify({"success": True, "message": f"Ticket assigned to {result.assigned_to} successfully",
+                    "row_version": result.row_version})
 
 @app.route("/admin/agent_response", methods=["POST"])
 def add_agent_response():
@@ -357,7 +471,7 @@ def add_agent_response():
     db.add_agent_response(ticket_id, agent_id, response_text, response_type)
     
     # Get ticket details to send notification to user
-    ticket = db.get_ticket_details(ticket_id)
+    ticket = db.get_complaint_by_ticket_id(ticket_id)
     agent = db.get_agent_by_id(agent_id)
     
     if ticket and agent:
@@ -384,8 +498,58 @@ def api_stats():
     if not session.get('is_admin'):
         return jsonify({"error": "Access denied"}), 403
     
-    stats = db.get_dashboard_stats()
-    return jsonify(stats)
+    return conditional_json(db.stats_version(), db.get_dashboard_stats)
+
+@app.route("/api/tickets/page")
+def api_tickets_page():
+    """API endpoint for incrementally loading the admin ticket listings"""
+    if not session.get('is_admin'):
+        return jsonify({"error": "Access denied"}), 403
+    
+    cursor = request.args.get('cursor')
+    limit = min(max(request.args.get('limit', TICKET_PAGE_SIZE, type=int), 1), MAX_TICKET_PAGE_SIZE)
+    agent_id = request.args.get('agent_id', type=int)
+    
+    if agent_id is not None and not db.get_agent_by_id(agent_id):
+        return jsonify({"error": "Agent not found"}), 404
+    
+    try:
+        page = db.get_complaints_page(cursor, limit, agent_id=agent_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "tickets": page['tickets'],
+        "next_cursor": page['next_cursor']
+    })
+
+@app.route("/api/tickets/search")
+def api_tickets_search():
+    """API endpoint for full-text ticket search"""
+    if not session.get('is_admin'):
+        return jsonify({"error": "Access denied"}), 403
+    
+    query = request.args.get('q', '')
+    cursor = request.args.get('cursor')
+    limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), MAX_TICKET_PAGE_SIZE)
+    filters = {
+        'status': request.args.get('status'),
+        'priority': request.args.get('priority'),
+        'category': request.args.get('category'),
+        'agent_id': request.args.get('agent_id', type=int)
+    }
+    
+    try:
+        results = db.search_tickets(query, filters, cursor, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "tickets": results['tickets'],
+        "next_cursor": results['next_cursor']
+    })
 
 @app.route("/api/unassigned_tickets")
 def api_unassigned_tickets():
@@ -393,114 +557,53 @@ def api_unassigned_tickets():
     if not session.get('is_admin'):
         return jsonify({"error": "Access denied"}), 403
     
-    # Get tickets without assigned agents
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT ticket_id, title, category, priority, status, created_at
-        FROM complaints 
-        WHERE assigned_to IS NULL OR assigned_to = ''
-        ORDER BY 
-            CASE priority 
-                WHEN 'Urgent' THEN 1
-                WHEN 'High' THEN 2
-                WHEN 'Medium' THEN 3
-                WHEN 'Low' THEN 4
-            END,
-            created_at DESC
-    ''')
-    
-    tickets = cursor.fetchall()
-    conn.close()
-    
-    unassigned_tickets = [
-        {
-            'ticket_id': row[0],
-            'title': row[1],
-            'category': row[2],
-            'priority': row[3],
-            'status': row[4],
-            'created_at': row[5]
-        }
-        for row in tickets
-    ]
-    
-    return jsonify(unassigned_tickets)
+    def unassigned_tickets():
+        # Get tickets without assigned agents (from every shard when sharded)
+        return [
+            {
+                'ticket_id': ticket.ticket_id,
+                'title': ticket.title,
+                'category': ticket.category,
+                'priority': ticket.priority,
+                'status': ticket.status,
+                'created_at': ticket.created_at
+            }
+            for ticket in db.get_unassigned_tickets()
+        ]
+    
+    version, changed = db.ticket_version()
+    return conditional_json(version, unassigned_tickets, changed)
 
 @app.route("/api/export")
 def api_export():
-    """API endpoint for exporting ticket data"""
+    """API endpoint for exporting ticket data
+    
+    csv, ndjson and parquet are streamed as a file download while the tickets
+    are read; json returns them in one response body, for small exports.
+    """
     if not session.get('is_admin'):
         return jsonify({"error": "Access denied"}), 403
     
     export_type = request.args.get('type', 'all')
     format_type = request.args.get('format', 'json')
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Build query based on export type
-    if export_type == 'active':
-        query = '''
-            SELECT ticket_id, title, description, category, priority, status, 
-                   assigned_to, created_at, updated_at, resolution_notes
-            FROM complaints 
-            WHERE status != 'Resolved'
-            ORDER BY created_at DESC
-        '''
-    elif export_type == 'resolved':
-        query = '''
-            SELECT ticket_id, title, description, category, priority, status, 
-                   assigned_to, created_at, updated_at, resolution_notes
-            FROM complaints 
-            WHERE status = 'Resolved'
-            ORDER BY updated_at DESC
-        '''
-    else:  # all
-        query = '''
-            SELECT ticket_id, title, description, category, priority, status, 
-                   assigned_to, created_at, updated_at, resolution_notes
-            FROM complaints 
-            ORDER BY created_at DESC
-        '''
-    
-    cursor.execute(query)
-    tickets = cursor.fetchall()
-    conn.close()
-    
-    # Format data
-    ticket_data = []
-    for row in tickets:
-        ticket_data.append({
-            'ticket_id': row[0],
-            'title': row[1],
-            'description': row[2],
-            'category': row[3],
-            'priority': row[4],
-            'status': row[5],
-            'assigned_to': row[6] or 'Unassigned',
-            'created_at': row[7],
-            'updated_at': row[8],
-            'resolution_notes': row[9] or 'N/A'
-        })
+    # Read from the reporting snapshot, away from ticket writes
+    source = db.analytics_db()
     
-    if format_type == 'csv':
-        # Generate CSV content
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=ticket_data[0].keys() if ticket_data else [])
-        writer.writeheader()
-        writer.writerows(ticket_data)
+    if format_type in exports.FORMATS:
+        if format_type == 'parquet' and not exports.parquet_available():
+            return jsonify({"error": "Parquet export needs the pyarrow package"}), 501
         
-        return jsonify({
-            'success': True,
-            'data': output.getvalue(),
-            'filename': f'tickets_{export_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-            'count': len(ticket_data)
-        })
+        mimetype, extension = exports.FORMATS[format_type]
+        filename = f'tickets_{export_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        rows = source.iter_export_rows(export_type)
+        return Response(
+            stream_with_context(exports.WRITERS[format_type](rows)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
+    ticket_data = [exports.export_record(row) for row in source.export_complaints(export_type)]
     
     return jsonify({
         'success': True,
@@ -515,107 +618,7 @@ def api_detailed_analytics():
     if not session.get('is_admin'):
         return jsonify({"error": "Access denied"}), 403
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Get comprehensive analytics
-    analytics = {}
-    
-    # Basic stats
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total,
-            COUNT(CASE WHEN status != 'Resolved' THEN 1 END) as active,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved,
-            COUNT(CASE WHEN assigned_to IS NULL OR assigned_to = '' THEN 1 END) as unassigned
-        FROM complaints
-    ''')
-    basic_stats = cursor.fetchone()
-    analytics['basic_stats'] = {
-        'total_tickets': basic_stats[0],
-        'active_tickets': basic_stats[1],
-        'resolved_tickets': basic_stats[2],
-        'unassigned_tickets': basic_stats[3]
-    }
-    
-    # Priority distribution
-    cursor.execute('''
-        SELECT priority, COUNT(*) as count
-        FROM complaints
-        GROUP BY priority
-        ORDER BY 
-            CASE priority 
-                WHEN 'Urgent' THEN 1
-                WHEN 'High' THEN 2
-                WHEN 'Medium' THEN 3
-                WHEN 'Low' THEN 4
-            END
-    ''')
-    priority_stats = dict(cursor.fetchall())
-    analytics['priority_distribution'] = priority_stats
-    
-    # Category distribution
-    cursor.execute('''
-        SELECT category, COUNT(*) as count
-        FROM complaints
-        GROUP BY category
-        ORDER BY count DESC
-    ''')
-    category_stats = dict(cursor.fetchall())
-    analytics['category_distribution'] = category_stats
-    
-    # Status distribution
-    cursor.execute('''
-        SELECT status, COUNT(*) as count
-        FROM complaints
-        GROUP BY status
-        ORDER BY count DESC
-    ''')
-    status_stats = dict(cursor.fetchall())
-    analytics['status_distribution'] = status_stats
-    
-    # Agent workload
-    cursor.execute('''
-        SELECT 
-            COALESCE(assigned_to, 'Unassigned') as agent,
-            COUNT(*) as total_tickets,
-            COUNT(CASE WHEN status != 'Resolved' THEN 1 END) as active_tickets,
-            COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_tickets
-        FROM complaints
-        GROUP BY assigned_to
-        ORDER BY total_tickets DESC
-    ''')
-    agent_workload = []
-    for row in cursor.fetchall():
-        agent_workload.append({
-            'agent': row[0],
-            'total_tickets': row[1],
-            'active_tickets': row[2],
-            'resolved_tickets': row[3]
-        })
-    analytics['agent_workload'] = agent_workload
-    
-    # Recent activity (last 7 days)
-    cursor.execute('''
-        SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM complaints
-        WHERE created_at >= DATE('now', '-7 days')
-        GROUP BY DATE(created_at)
-        ORDER BY date DESC
-    ''')
-    recent_activity = dict(cursor.fetchall())
-    analytics['recent_activity'] = recent_activity
-    
-    # Average resolution time
-    cursor.execute('''
-        SELECT AVG(JULIANDAY(updated_at) - JULIANDAY(created_at)) as avg_resolution_days
-        FROM complaints
-        WHERE status = 'Resolved' AND updated_at IS NOT NULL
-    ''')
-    avg_resolution = cursor.fetchone()[0]
-    analytics['avg_resolution_time'] = round(avg_resolution * 24, 2) if avg_resolution else 0  # Convert to hours
-    
-    conn.close()
+    analytics = db.analytics_db().get_detailed_analytics()
     
     return jsonify({
         'success': True,
@@ -636,6 +639,24 @@ def api_agent_workload():
         'workload_stats': workload_stats
     })
 
+@app.route("/api/metrics")
+def api_metrics():
+    """API endpoint for this worker's aggregate cache counters"""
+    if not session.get('is_admin'):
+        return jsonify({"error": "Access denied"}), 403
+    
+    # Analytics read from the snapshot replica, which has a cache of its own
+    aggregate_cache = {'live': db.aggregates.stats()}
+    replica = db.analytics_db()
+    if replica is not db:
+        aggregate_cache['replica'] = replica.aggregates.stats()
+    
+    return jsonify({
+        'success': True,
+        'worker_pid': os.getpid(),
+        'aggregate_cache': aggregate_cache
+    })
+
 @app.route("/api/tickets/reassign", methods=["POST"])
 def api_reassign_ticket():
     """API endpoint for reassigning tickets"""
@@ -644,18 +665,23 @@ def api_reassign_ticket():
     
     data = request.get_json()
     ticket_id = data.get('ticket_id')
-    new_agent = data.get('new_agent')
+    agent_id = data.get('agent_id')
     reason = data.get('reason', 'Manual reassignment by admin')
     
-    if not ticket_id or not new_agent:
+    if not ticket_id or not agent_id:
         return jsonify({"error": "Missing required fields"}), 400
     
     try:
-        db.reassign_ticket(ticket_id, new_agent, session['user_id'], reason)
+        result = db.reassign_ticket(ticket_id, agent_id, session['user_id'], reason, parse_row_version(data))
+        if result.conflict:
+            return ticket_conflict_response(result)
         return jsonify({
             "success": True,
-            "message": f"Ticket {ticket_id} reassigned to {new_agent}"
+            "message": f"Ticket {ticket_id} reassigned to {result.assigned_to}",
+            "row_version": result.row_version
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -670,10 +696,12 @@ def api_auto_assign_tickets():
         assigned_count = 0
         
         for ticket in unassigned_tickets:
-            best_agent = db.get_best_agent_for_category(ticket['category'], ticket['priority'])
-            if best_agent:
-                db.reassign_ticket(ticket['ticket_id'], best_agent, session['user_id'], "Auto-assignment by system")
-                assigned_count += 1
+            best_agent_id = db.get_best_agent_for_category(ticket['category'], ticket['priority'])
+            if best_agent_id:
+                # Skip tickets an admin assigned since the list was read
+                result = db.reassign_ticket(ticket['ticket_id'], best_agent_id, session['user_id'],
+                                            "Auto-assignment by system", ticket['row_version'])
+                assigned_count += not result.conflict
         
         return jsonify({
             "success": True,
@@ -694,6 +722,29 @@ def health_check():
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route("/api/events")
+def api_events():
+    """Server-sent events: the user's unread notification count, and dashboard stats for admins
+    
+    Replaces polling the notification and stats endpoints; see events.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    try:
+        subscription = event_hub.subscribe(session['user_id'], bool(session.get('is_admin')))
+    except events.StreamsFull:
+        # Each stream holds a worker thread; past the limit the page polls instead
+        return Response(
+            f"retry: {events.FULL_RETRY_MS}\n\n", status=503, mimetype='text/event-stream',
+            headers={'Retry-After': str(events.FULL_RETRY_MS // 1000), 'Cache-Control': 'no-cache'}
+        )
+    return Response(
+        stream_with_context(event_hub.stream(subscription, dumps=app.json.dumps)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Notification API endpoints
 @app.route("/api/notifications", methods=["GET"])
 def get_notifications():
@@ -703,17 +754,18 @@ def get_notifications():
         
     limit = request.args.get('limit', 20, type=int)
     only_unread = request.args.get('unread', False, type=bool)
+    user_id = session['user_id']
     
-    notifications = notification_system.get_notifications(
-        session['user_id'], 
-        limit=limit, 
-        only_unread=only_unread
-    )
+    def notifications():
+        return {
+            "notifications": notification_system.get_notifications(user_id, limit=limit, only_unread=only_unread),
+            "unread_count": notification_system.get_unread_count(user_id)
+        }
     
-    return jsonify({
-        "notifications": notifications,
-        "unread_count": notification_system.get_unread_count(session['user_id'])
-    })
+    version, changed = notification_system.notification_version(user_id)
+    # Times are shown relative to now ("5 minutes ago"), so the payload also ages by the minute
+    token = (user_id, version, datetime.now().strftime('%Y-%m-%d %H:%M'))
+    return conditional_json(token, notifications, changed)
 
 @app.route("/api/notifications/unread-count", methods=["GET"])
 def get_unread_count():
@@ -751,93 +803,5 @@ def delete_notification(notification_id):
     notification_system.delete_notification(notification_id)
     return jsonify({"success": True})
 
-# Update existing endpoints to create notifications
-@app.route("/admin/update_ticket", methods=["POST"])
-def update_ticket():
-    """Update ticket status or assignment"""
-    if 'user_id' not in session or not session.get('is_admin', False):
-        return jsonify({"error": "Not authorized"}), 403
-    
-    data = request.get_json()
-    ticket_id = data.get('ticket_id')
-    new_status = data.get('status')
-    assigned_to = data.get('assigned_to')
-    
-    if not ticket_id:
-        return jsonify({"error": "Ticket ID is required"}), 400
-    
-    try:
-        # Get ticket info to send proper notifications
-        ticket = db.get_ticket_details(ticket_id)
-        if not ticket:
-            return jsonify({"error": "Ticket not found"}), 404
-        
-        # Update the ticket
-        if new_status:
-            db.update_ticket_status(ticket_id, new_status)
-            
-            # Send notification to customer
-            notification_system.create_notification(
-                ticket['user_id'],
-                f"Ticket Status Update",
-                f"Your ticket #{ticket_id} has been updated to {new_status}.",
-                "info"
-            )
-            
-            # Send notification to all admins
-            notification_system.create_admin_notification(
-                f"Ticket Status Changed",
-                f"Ticket #{ticket_id} status changed to {new_status} by {session['full_name']}",
-                "info"
-            )
-            
-            # If assigned to an agent, notify them too
-            if ticket['assigned_to']:
-                agent = db.get_agent_by_name(ticket['assigned_to'])
-                if agent:
-                    notification_system.create_agent_notification(
-                        agent['id'],
-                        f"Ticket Status Changed",
-                        f"Ticket #{ticket_id} status changed to {new_status} by admin {session['full_name']}",
-                        "info"
-                    )
-                    
-        if assigned_to:
-            previous_agent = ticket.get('assigned_to')
-            db.assign_ticket(ticket_id, assigned_to)
-            
-            # Notify the newly assigned agent
-            new_agent = db.get_agent_by_name(assigned_to)
-            if new_agent:
-                notification_system.create_agent_notification(
-                    new_agent['id'],
-                    "New Ticket Assignment",
-                    f"Ticket #{ticket_id} has been assigned to you.",
-                    "info"
-                )
-            
-            # Notify admins
-            notification_system.create_admin_notification(
-                "Ticket Assignment",
-                f"Ticket #{ticket_id} reassigned from {previous_agent or 'Unassigned'} to {assigned_to}",
-                "info"
-            )
-            
-            # Notify customer
-            notification_system.create_notification(
-                ticket['user_id'],
-                f"Ticket Assigned",
-                f"Your ticket #{ticket_id} has been assigned to agent {assigned_to}.",
-                "info"
-            )
-            
-        return jsonify({
-            "success": True,
-            "message": "Ticket updated successfully"
-        })
-    except Exception as e:
-        print(f"Error updating ticket: {str(e)}")
-        return jsonify({"error": str(e)}), 500
-
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,138 @@
+"""
+Cold archive for resolved tickets and old chat sessions
+
+Resolved tickets (with their agent responses) and chat sessions that have been
+idle for a while are moved out of the hot database into a second SQLite file,
+attached to every connection as the ``archive`` schema. Status queries, the
+search index and the page cache then only see live data, while lookups by
+ticket id, user ticket lists, chat history and exports fall through to the
+archive.
+
+Archive tables mirror the hot tables' columns (without foreign keys, which
+cannot cross database files) and gain any column added to the hot schema the
+next time ``ensure_archive_schema`` runs. Rows are copied into the archive
+(INSERT OR REPLACE on the hot row id) before they are deleted, so a move
+interrupted between the two files is completed, not duplicated, by the next
+run.
+"""
+
+import json
+import os
+
+from timestamps import to_epoch
+
+SCHEMA = 'archive'
+ARCHIVED_TABLES = ['complaints', 'agent_responses', 'chat_history']
+
+DEFAULT_TICKET_AGE_DAYS = 90   # resolved this long ago
+DEFAULT_CHAT_AGE_DAYS = 30     # no message in the session for this long
+ARCHIVE_BATCH_SIZE = 500       # tickets or chat sessions moved per transaction
+
+ARCHIVE_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_complaints_ticket ON complaints (ticket_id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_complaints_user_created ON complaints (user_id, created_at)",
+    # Exports read archived tickets newest first, by creation or resolution
+    "CREATE INDEX IF NOT EXISTS archive.idx_complaints_created ON complaints (created_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_complaints_updated ON complaints (updated_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_agent_responses_ticket ON agent_responses (ticket_id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_chat_history_session ON chat_history (user_id, session_id, timestamp)",
+]
+
+
+def default_archive_path(db_path):
+    """complaints.db -> complaints_archive.db, next to the hot database"""
+    if db_path == ':memory:':
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def table_columns(cursor, table, schema='main'):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+
+def ensure_archive_schema(cursor):
+    """Create the archive tables, adding any columns the hot tables gained since"""
+    for table in ARCHIVED_TABLES:
+        hot = table_columns(cursor, table)
+        archived = {name for name, _ in table_columns(cursor, table, SCHEMA)}
+        if not archived:
+            columns = ', '.join(
+                'id INTEGER PRIMARY KEY' if name == 'id' else f'{name} {column_type}'.strip()
+                for name, column_type in hot
+            )
+            cursor.execute(f"CREATE TABLE {SCHEMA}.{table} ({columns})")
+            continue
+        for name, column_type in hot:
+            if name not in archived:
+                cursor.execute(f"ALTER TABLE {SCHEMA}.{table} ADD COLUMN {name} {column_type}")
+
+    for statement in ARCHIVE_INDEXES:
+        cursor.execute(statement)
+
+
+def union_sql(cursor, table):
+    """A subquery over a table's hot and archived rows, for reads and rebuilds"""
+    columns = ', '.join(name for name, _ in table_columns(cursor, table))
+    return f"(SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM {SCHEMA}.{table})"
+
+
+def _move_rows(cursor, table, where, params):
+    columns = ', '.join(name for name, _ in table_columns(cursor, table))
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO {SCHEMA}.{table} ({columns})
+        SELECT {columns} FROM main.{table} WHERE {where}
+    ''', params)
+    cursor.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+    return cursor.rowcount
+
+
+def archive_tickets(cursor, resolved_before, limit=ARCHIVE_BATCH_SIZE):
+    """Move up to ``limit`` tickets resolved before the cutoff, with their responses
+
+    Must run inside a write transaction. Returns the number of tickets moved.
+    """
+    cursor.execute('''
+        SELECT id, ticket_id FROM main.complaints
+        WHERE status = 'Resolved' AND resolved_epoch < ?
+        ORDER BY resolved_epoch
+        LIMIT ?
+    ''', (to_epoch(resolved_before), limit))
+    tickets = cursor.fetchall()
+    if not tickets:
+        return 0
+
+    # Responses first: they reference complaints.ticket_id
+    _move_rows(cursor, 'agent_responses', "ticket_id IN (SELECT value FROM json_each(?))",
+               (json.dumps([ticket_id for _, ticket_id in tickets]),))
+    return _move_rows(cursor, 'complaints', "id IN (SELECT value FROM json_each(?))",
+                      (json.dumps([row_id for row_id, _ in tickets]),))
+
+
+def archive_chat_sessions(cursor, idle_before, limit=ARCHIVE_BATCH_SIZE, after=None):
+    """Move up to ``limit`` chat sessions with no message since the cutoff
+
+    Sessions are visited in (user_id, session_id) order from just past
+    ``after``, walking the session index once across batches instead of
+    grouping all of chat_history for each one. Must run inside a write
+    transaction. Returns the (user_id, session_id) of the sessions moved; pass
+    the last as ``after`` for the next batch.
+    """
+    keyset = "AND (user_id, session_id) > (?, ?)" if after else ""
+    cursor.execute(f'''
+        SELECT user_id, session_id FROM main.chat_history
+        WHERE user_id IS NOT NULL AND session_id IS NOT NULL {keyset}
+        GROUP BY user_id, session_id
+        HAVING MAX(timestamp) < ?
+        ORDER BY user_id, session_id
+        LIMIT ?
+    ''', (*(after or ()), idle_before, limit))
+    sessions = cursor.fetchall()
+    if sessions:
+        _move_rows(cursor, 'chat_history', '''
+            (user_id, session_id) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            )
+        ''', (json.dumps(sessions),))
+    return sessions
@@ -0,0 +1,159 @@
+"""
+ASGI entry point: async views on the event loop, everything else as WSGI
+
+Under gunicorn's sync or threaded workers every request holds a thread until
+it returns, so a few slow Gemini calls in ``/ask`` stall a worker. Served here
+instead (``ASGI_MODE=1`` with gunicorn.conf.py, which runs ``asgi:app`` on
+uvicorn workers), requests for ``async def`` views (``/ask``,
+``/create_ticket``) are dispatched on the event loop: the request context is
+pushed in the request's task, the view awaits its blocking work on
+app.blocking_pool, and the loop serves other requests meanwhile.
+
+``/api/events`` streams are served on the event loop too: each waits on its
+EventHub subscription (see events.EventHub.stream_async) rather than holding a
+thread, so open dashboards never take threads from other requests. Every
+other route runs as plain WSGI through a2wsgi's WSGIMiddleware, one short
+request per thread of its pool as under gthread workers.
+"""
+
+import asyncio
+import inspect
+import io
+import os
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import session
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app, blocking_pool, event_hub
+from blocking_pool import WORKER_THREADS_ENV, DEFAULT_POOL_THREADS
+from database import db
+
+# Threads for the WSGI routes
+wsgi_app = WSGIMiddleware(flask_app, workers=int(os.getenv(WORKER_THREADS_ENV, DEFAULT_POOL_THREADS)))
+
+
+def match_endpoint(environ):
+    """The endpoint a request is routed to, or None when no route matches"""
+    adapter = flask_app.url_map.bind_to_environ(environ)
+    try:
+        endpoint, _ = adapter.match()
+    except HTTPException:
+        return None
+    return endpoint
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def dispatch(view, environ, send):
+    """Run an async view as Flask's full_dispatch_request would, without leaving the event loop"""
+    ctx = flask_app.request_context(environ)
+    error = None
+    ctx.push()
+    try:
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view(**ctx.request.view_args)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = flask_app.handle_exception(e)
+        body = response.get_data()
+        headers = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()]
+        response.close()
+    finally:
+        ctx.pop(error)
+    
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_events(scope, environ, receive, send):
+    """Serve /api/events from the event loop, as app.api_events does from a thread"""
+    with flask_app.request_context(environ):
+        user_id, is_admin = session.get('user_id'), bool(session.get('is_admin'))
+    if user_id is None:
+        # The view answers 401
+        await wsgi_app(scope, receive, send)
+        return
+    
+    # Reading the initial state is blocking work; waiting on the stream is not
+    subscription = await blocking_pool.run(event_hub.subscribe, user_id, is_admin, asyncio.get_running_loop())
+    
+    async def pump():
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        async for chunk in event_hub.stream_async(subscription, dumps=flask_app.json.dumps):
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    pumping = asyncio.ensure_future(pump())
+    watching = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([pumping, watching], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # A client that went away ends its stream, which unsubscribes it
+        for task in (pumping, watching):
+            task.cancel()
+        await asyncio.gather(pumping, watching, return_exceptions=True)
+    if not pumping.cancelled() and pumping.exception() is not None:
+        raise pumping.exception()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Finish in-flight requests and blocking calls, then write the queued chat turns
+            wsgi_app.executor.shutdown(wait=True)
+            blocking_pool.shutdown()
+            db.chat_buffer.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    
+    # Routed before the body is read, so WSGI routes read it as they go
+    environ = build_environ(scope, io.BytesIO())
+    endpoint = match_endpoint(environ)
+    if endpoint == 'api_events':
+        await stream_events(scope, environ, receive, send)
+        return
+    view = flask_app.view_functions.get(endpoint)
+    if not inspect.iscoroutinefunction(view):
+        await wsgi_app(scope, receive, send)
+    else:
+        environ['wsgi.input'] = io.BytesIO(await read_body(receive))
+        environ['wsgi.input_terminated'] = True     # the whole body is read, with or without Content-Length
+        await dispatch(view, environ, send)
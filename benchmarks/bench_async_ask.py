@@ -0,0 +1,122 @@
+"""
+Benchmark: concurrent /ask throughput, sync workers vs the ASGI entry point
+
+Sends N /ask requests whose Gemini call is replaced by a sleep of --latency
+seconds (no API key needed) through the Flask WSGI app with --sync-workers
+requests in flight at once, as gunicorn's sync workers serve them, and
+through asgi.app from a single event loop with --concurrency in flight, and
+reports throughput and latency for each.
+
+Usage: python benchmarks/bench_async_ask.py [--requests 200] [--concurrency 200] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def simulated_chat(latency):
+    def chat_with_bot(user_message, user_id=None, session_id=None):
+        time.sleep(latency)
+        return {'response': f"Echo: {user_message}", 'session_id': session_id, 'requires_ticket': False}
+    return chat_with_bot
+
+
+def report(name, latencies, elapsed):
+    latencies.sort()
+    print(f"{name:<28} {len(latencies) / elapsed:>8.1f} req/s  "
+          f"p50 {statistics.median(latencies):6.2f} s  p99 {latencies[int(len(latencies) * 0.99)]:6.2f} s")
+
+
+def run_sync(flask_app, count, workers):
+    def ask(i):
+        with flask_app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+            start = time.perf_counter()
+            assert client.post('/ask', json={'message': f"Question {i}"}).status_code == 200
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        latencies = list(executor.map(ask, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_asgi(asgi_app, cookie, count, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def ask(i):
+        body = json.dumps({'message': f"Question {i}"}).encode()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/ask', 'raw_path': b'/ask', 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'bench'), (b'content-type', b'application/json'), (b'cookie', cookie.encode())],
+            'server': ('bench', 80), 'client': ('127.0.0.1', 50000)
+        }
+        incoming = [{'type': 'http.request', 'body': body}]
+        done = asyncio.Event()
+
+        async def receive():
+            if incoming:
+                return incoming.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        statuses = []
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async with limit:
+            start = time.perf_counter()
+            await asgi_app(scope, receive, send)
+            done.set()
+            assert statuses == [200]
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[ask(i) for i in range(count)])
+    return list(latencies), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200, help="/ask requests per mode")
+    parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight on the event loop")
+    parser.add_argument('--sync-workers', type=int, default=4, help="Sync gunicorn workers to compare with")
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds each simulated Gemini call takes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app opens complaints.db in the working directory
+        os.chdir(tmp)
+        import app
+        import asgi
+        app.chatbot.chat_with_bot = simulated_chat(args.latency)
+        print(f"{args.requests} /ask requests, {args.latency:.2f} s model latency, "
+              f"{app.blocking_pool.threads} pool threads")
+
+        latencies, elapsed = run_sync(app.app, args.requests, args.sync_workers)
+        report(f"sync, {args.sync_workers} workers", latencies, elapsed)
+        sync_rate = args.requests / elapsed
+
+        serializer = app.app.session_interface.get_signing_serializer(app.app)
+        cookie = f"session={serializer.dumps({'user_id': 1})}"
+        latencies, elapsed = asyncio.run(run_asgi(asgi.app, cookie, args.requests, args.concurrency))
+        report(f"asgi, 1 process, {args.concurrency} in flight", latencies, elapsed)
+        print(f"asgi: {args.requests / elapsed / sync_rate:.0f}x higher throughput")
+
+        app.db.chat_buffer.close()
+
+
+if __name__ == "__main__":
+    main()
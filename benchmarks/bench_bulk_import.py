@@ -0,0 +1,60 @@
+"""
+Benchmark: one create_complaint call per ticket vs create_complaints_bulk
+
+Inserts N tickets (with auto-assignment) through each path into a fresh
+database and reports throughput.
+
+Usage: python benchmarks/bench_bulk_import.py [--tickets 50000] [--single 2000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+CATEGORIES = ['Technical', 'Billing', 'Service', 'Product', 'General']
+PRIORITIES = ['Urgent', 'High', 'Medium', 'Low']
+
+
+def make_tickets(user_id, count):
+    for i in range(count):
+        yield {
+            'user_id': user_id,
+            'title': f"Imported ticket {i}",
+            'description': "Something is broken " * 5,
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'priority': PRIORITIES[i % len(PRIORITIES)],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=50000, help="Tickets for the bulk path")
+    parser.add_argument('--single', type=int, default=2000, help="Tickets for the one-at-a-time path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'bench.db'))
+        user_id = database.create_user("bench", "bench@example.com", "secret", "Bench User")
+
+        start = time.perf_counter()
+        for ticket in make_tickets(user_id, args.single):
+            database.create_complaint(ticket['user_id'], ticket['title'], ticket['description'],
+                                      ticket['category'], ticket['priority'])
+        single_rate = args.single / (time.perf_counter() - start)
+        print(f"create_complaint       {args.single:>7} tickets  {single_rate:>10,.0f} tickets/s")
+
+        start = time.perf_counter()
+        created = database.create_complaints_bulk(make_tickets(user_id, args.tickets))
+        bulk_rate = created / (time.perf_counter() - start)
+        print(f"create_complaints_bulk {created:>7} tickets  {bulk_rate:>10,.0f} tickets/s")
+        print(f"bulk: {bulk_rate / single_rate:.0f}x higher throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: synchronous chat history writes vs the write-behind buffer
+
+Saves N chat turns through save_chat_history (one commit per turn) and through
+queue_chat_history (batched commits off the calling thread) and reports the
+per-call latency each adds to /ask.
+
+Usage: python benchmarks/bench_chat_history.py [--turns 5000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def time_calls(save, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        save(1, f"session-{i % 50}", f"question {i}", "answer " * 40)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=5000, help="Chat turns per path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'bench.db'))
+
+        p50, p99 = time_calls(database.save_chat_history, args.turns)
+        print(f"save_chat_history   p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  ({args.turns} commits)")
+
+        p50, p99 = time_calls(database.queue_chat_history, args.turns)
+        start = time.perf_counter()
+        database.chat_buffer.close()
+        print(f"queue_chat_history  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  "
+              f"(final flush {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
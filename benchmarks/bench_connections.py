@@ -0,0 +1,71 @@
+"""
+Benchmark: per-request SQLite connection overhead
+
+Simulates the database work of one /create_ticket request (seven connection
+acquisitions, each running a small query) with the old connect-per-call pattern
+and with the pooled per-thread connections from connection_manager.
+
+Usage: python benchmarks/bench_connections.py [--requests 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_manager import ConnectionManager
+
+CALLS_PER_REQUEST = 7
+
+
+def legacy_connection(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def run_request(get_connection):
+    for _ in range(CALLS_PER_REQUEST):
+        conn = get_connection()
+        conn.execute("SELECT id FROM users WHERE username = ?", ("admin",)).fetchone()
+        conn.close()
+
+
+def measure(label, get_connection, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        run_request(get_connection)
+    elapsed = time.perf_counter() - start
+    per_request_us = elapsed / requests * 1e6
+    print(f"{label:<28} {per_request_us:10.1f} us/request  {requests / elapsed:10.0f} requests/s")
+    return per_request_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE)")
+        conn.execute("INSERT INTO users (username) VALUES ('admin')")
+        conn.commit()
+        conn.close()
+
+        manager = ConnectionManager(db_path)
+
+        print(f"{args.requests} simulated requests, {CALLS_PER_REQUEST} connection acquisitions each")
+        before = measure("connect per call (before)", lambda: legacy_connection(db_path), args.requests)
+        after = measure("pooled per thread (after)", manager.get_connection, args.requests)
+        print(f"speedup: {before / after:.1f}x")
+        manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: building admin ticket listings as dicts vs slotted records
+
+Loads N joined ticket rows the old way (hand-built 18-key dicts) and through
+the Ticket row factory, reporting build time and peak memory of the result.
+
+Usage: python benchmarks/bench_records.py [--tickets 100000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import run_migrations
+from records import Ticket
+
+QUERY = f'''
+    SELECT {Ticket.COLUMNS}
+    FROM complaints c
+    JOIN users u ON c.user_id = u.id
+'''
+
+
+def build_dicts(conn):
+    return [
+        {
+            'id': row[0],
+            'ticket_id': row[1],
+            'user_id': row[2],
+            'title': row[3],
+            'description': row[4],
+            'category': row[5],
+            'priority': row[6],
+            'status': row[7],
+            'assigned_to': row[8],
+            'assigned_agent_id': row[9],
+            'created_at': row[10],
+            'updated_at': row[11],
+            'resolved_at': row[12],
+            'resolution_notes': row[13],
+            'estimated_resolution_time': row[14],
+            'username': row[15],
+            'email': row[16],
+            'full_name': row[17]
+        }
+        for row in conn.execute(QUERY).fetchall()
+    ]
+
+
+def build_records(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = Ticket.row_factory
+    return cursor.execute(QUERY).fetchall()
+
+
+def measure(label, build, conn):
+    start = time.perf_counter()
+    tickets = build(conn)
+    elapsed = time.perf_counter() - start
+    del tickets
+
+    # Measure memory in a separate run so tracing does not skew the timing
+    tracemalloc.start()
+    tickets = build(conn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {len(tickets)} tickets  {elapsed * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.1f} MB")
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        run_migrations(conn)
+        conn.execute("INSERT INTO users (username, email, password_hash, full_name) VALUES ('u', 'u@example.com', 'x', 'User')")
+        conn.executemany('''
+            INSERT INTO complaints (ticket_id, user_id, title, description, category, priority, created_at, updated_at)
+            VALUES (?, 1, ?, ?, 'Technical', 'Medium', '2024-01-01 10:00:00', '2024-01-01 10:00:00')
+        ''', ((f"P004-{i:08X}", f"Ticket {i}", "Something is broken " * 5) for i in range(args.tickets)))
+        conn.commit()
+
+        dict_time, dict_peak = measure("dicts", build_dicts, conn)
+        record_time, record_peak = measure("records", build_records, conn)
+        print(f"records: {dict_time / record_time:.1f}x faster, {dict_peak / record_peak:.1f}x less peak memory")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: full-text ticket search latency as the ticket count grows
+
+Bulk-loads N tickets into a fresh database and times search_tickets for a
+rare, a common, a prefix and a two-word query (first page, BM25-ranked,
+with snippets), with and without filters.
+
+Usage: python benchmarks/bench_search.py [--tickets 200000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+CATEGORIES = ['Technical', 'Billing', 'Service', 'Product', 'General']
+PRIORITIES = ['Urgent', 'High', 'Medium', 'Low']
+WORDS = ['printer', 'login', 'password', 'invoice', 'refund', 'delivery', 'router', 'screen',
+         'battery', 'account', 'payment', 'network', 'email', 'update', 'crash', 'slow']
+# Filler vocabulary so the common words above are frequent but not in every ticket
+FILLER = [f"word{i}" for i in range(5000)]
+QUERIES = ['quasar', 'printer', 'pay*', 'login password']
+
+
+def make_tickets(user_id, count):
+    rng = random.Random(4)
+    for i in range(count):
+        words = rng.sample(WORDS, 2) + rng.choices(FILLER, k=10)
+        if i % 10000 == 0:
+            words.append('quasar')
+        yield {
+            'user_id': user_id,
+            'title': ' '.join(words[:3]),
+            'description': ' '.join(words) + " is not working as expected",
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'priority': PRIORITIES[i % len(PRIORITIES)],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=200000, help="Tickets to index")
+    parser.add_argument('--repeat', type=int, default=20, help="Searches per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'bench.db'))
+        user_id = database.create_user("bench", "bench@example.com", "secret", "Bench User")
+
+        start = time.perf_counter()
+        database.create_complaints_bulk(make_tickets(user_id, args.tickets))
+        print(f"indexed {args.tickets} tickets in {time.perf_counter() - start:.1f}s")
+
+        for query in QUERIES:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                hits = database.search_tickets(query)['tickets']
+            elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"{query!r:<10} {len(hits):>3} hits  {elapsed_ms:>8.2f} ms/search")
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                database.search_tickets(query, {'category': 'Billing', 'priority': 'Urgent'})
+            elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"{query!r:<10} filtered  {elapsed_ms:>8.2f} ms/search")
+
+
+if __name__ == "__main__":
+    main()
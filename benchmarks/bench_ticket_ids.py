@@ -0,0 +1,99 @@
+"""
+Benchmark: ticket insert throughput with random vs time-sortable ticket IDs
+
+Pre-fills a complaints-shaped table with N tickets (default 10M) for each ID
+scheme, then times inserting more tickets in small transactions, as the app
+does. The old scheme is ``P004-`` + 8 random hex digits (uuid4); the new one is
+ticket_ids' ULID. Random keys land on random pages of the ticket_id index, so
+once the index outgrows the page cache each insert reads pages from disk.
+
+Usage: python benchmarks/bench_ticket_ids.py [--rows 10000000] [--inserts 200000] [--dir /tmp]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_manager import DEFAULT_PRAGMAS
+from ticket_ids import TicketIdGenerator
+
+BATCH = 100          # tickets per transaction while timing
+PREFILL_CHUNK = 100000
+
+
+def random_id():
+    return f"P004-{uuid.uuid4().hex[:8].upper()}"
+
+
+def random_prefill_ids(count):
+    # Distinct but scattered 32-bit keys (multiplication by an odd constant is a
+    # bijection mod 2**32), standing in for years of uuid4-based IDs
+    for i in range(count):
+        yield f"P004-{(i * 2654435761) & 0xFFFFFFFF:08X}"
+
+
+def open_table(path):
+    conn = sqlite3.connect(path)
+    for name, value in DEFAULT_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY, ticket_id TEXT NOT NULL, title TEXT NOT NULL)")
+    return conn
+
+
+def prefill(conn, ticket_ids, count):
+    rows = ((ticket_id, "Prefilled ticket") for ticket_id in ticket_ids)
+    for _ in range(0, count, PREFILL_CHUNK):
+        chunk = [row for _, row in zip(range(PREFILL_CHUNK), rows)]
+        conn.executemany("INSERT INTO complaints (ticket_id, title) VALUES (?, ?)", chunk)
+        conn.commit()
+    # Building the index once is far faster than growing it row by row
+    conn.execute("CREATE UNIQUE INDEX idx_complaints_ticket ON complaints (ticket_id)")
+    conn.commit()
+
+
+def timed_inserts(conn, new_id, count):
+    collisions = 0
+    start = time.perf_counter()
+    for _ in range(0, count, BATCH):
+        for _ in range(BATCH):
+            cursor = conn.execute("INSERT OR IGNORE INTO complaints (ticket_id, title) VALUES (?, ?)",
+                                  (new_id(), "New ticket"))
+            collisions += cursor.rowcount == 0
+        conn.commit()
+    return count / (time.perf_counter() - start), collisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000000, help="Tickets already in the table")
+    parser.add_argument('--inserts', type=int, default=200000, help="Tickets inserted while timing")
+    parser.add_argument('--dir', default=None, help="Directory for the scratch databases")
+    args = parser.parse_args()
+
+    generator = TicketIdGenerator()
+    schemes = [
+        ("uuid4 hex[:8]", random_prefill_ids, random_id),
+        ("ULID", lambda count: (generator.new_id() for _ in range(count)), generator.new_id),
+    ]
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for label, prefill_ids, new_id in schemes:
+            conn = open_table(os.path.join(tmp, f"{label.split()[0]}.db"))
+            start = time.perf_counter()
+            prefill(conn, prefill_ids(args.rows), args.rows)
+            prefill_seconds = time.perf_counter() - start
+
+            rate, collisions = timed_inserts(conn, new_id, args.inserts)
+            print(f"{label:<14} prefill {args.rows:>9} in {prefill_seconds:6.1f}s  "
+                  f"insert {rate:>9,.0f} tickets/s  {collisions} ID collisions")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: concurrent writers with and without the single database writer
+
+Forks W worker processes (like gunicorn's sync workers) that each create
+tickets, notifications and chat turns as fast as they can for a few seconds,
+and reports total write throughput, p99 call latency and the share of calls
+that failed with "database is locked". Scenarios: every worker writing
+directly with no busy_timeout, directly with the default busy_timeout, and
+through the db_writer process with group commit.
+
+Usage: python benchmarks/bench_write_contention.py [--workers 4] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connection_manager
+import db_writer
+from database import Database
+from notifications import NotificationSystem
+
+
+def worker(db_path, seconds, results):
+    database = Database(db_path)
+    notifications = NotificationSystem(db_path)
+    user_id = database.authenticate_user('admin', 'admin123')['id']
+    writes = [
+        lambda i: database.create_complaint(user_id, f"Ticket {i}", "Load test", "Technical", "Medium"),
+        lambda i: notifications.create_notification(user_id, "Load test", f"Notification {i}"),
+        lambda i: database.save_chat_history(user_id, f"session-{os.getpid()}", f"question {i}", "answer"),
+    ]
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            writes[i % len(writes)](i)
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+        i += 1
+    results.put((latencies, errors))
+
+
+def run_scenario(label, workers, seconds, busy_timeout=None, use_writer=False):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        if busy_timeout is not None:
+            connection_manager.DEFAULT_PRAGMAS['busy_timeout'] = busy_timeout
+        Database(db_path, use_writer=False)
+
+        writer = None
+        if use_writer:
+            address = os.path.join(tmp, 'writer.sock')
+            os.environ.setdefault(db_writer.WRITER_KEY_ENV, 'bench-writer-key')
+            writer = multiprocessing.Process(target=db_writer.run_writer, args=(db_path, address), daemon=True)
+            writer.start()
+            while not os.path.exists(address):
+                time.sleep(0.01)
+            os.environ[db_writer.WRITER_SOCKET_ENV] = address
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(db_path, seconds, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        if writer is not None:
+            writer.terminate()
+            writer.join()
+            del os.environ[db_writer.WRITER_SOCKET_ENV]
+
+    latencies = sorted(latency for worker_latencies, _ in totals for latency in worker_latencies)
+    ok = len(latencies)
+    errors = sum(count for _, count in totals)
+    error_rate = errors / (ok + errors) * 100 if ok + errors else 0
+    p99 = latencies[int(ok * 0.99)] * 1000 if ok else 0
+    print(f"{label:<28} {ok / seconds:>9,.0f} writes/s   p99 {p99:7.2f} ms   {error_rate:5.1f}% locked errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent writer processes")
+    parser.add_argument('--seconds', type=float, default=5, help="Duration of each scenario")
+    args = parser.parse_args()
+
+    default_timeout = connection_manager.DEFAULT_PRAGMAS['busy_timeout']
+    run_scenario("direct, busy_timeout=0", args.workers, args.seconds, busy_timeout=0)
+    run_scenario(f"direct, busy_timeout={default_timeout}", args.workers, args.seconds, busy_timeout=default_timeout)
+    run_scenario("db_writer, group commit", args.workers, args.seconds, use_writer=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Bounded thread pool for the blocking work of async views
+
+``/ask`` and ``/create_ticket`` spend seconds in ``generate_content`` and the
+rest in SQLite, neither of which can be awaited. The async views hand that
+work to ``BlockingPool.run`` and wait on it without holding anything else:
+served through asgi.py, a process keeps hundreds of chats in flight on one
+event loop while at most ``threads`` blocking calls run at once and the rest
+wait in the pool's queue.
+
+Threads are started on first use in each process, so the pool survives
+gunicorn forking workers from a preloaded app.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POOL_THREADS_ENV = 'ASYNC_POOL_THREADS'
+# Without ASYNC_POOL_THREADS, as many blocking calls at once per process as
+# the worker threads gunicorn.conf.py is configured with
+WORKER_THREADS_ENV = 'GUNICORN_THREADS'
+DEFAULT_POOL_THREADS = 32       # gunicorn.conf.py's default for GUNICORN_THREADS
+
+
+def configured_threads():
+    """Pool size from ASYNC_POOL_THREADS, else GUNICORN_THREADS, else DEFAULT_POOL_THREADS"""
+    return int(os.getenv(POOL_THREADS_ENV) or os.getenv(WORKER_THREADS_ENV) or DEFAULT_POOL_THREADS)
+
+
+class BlockingPool:
+    def __init__(self, threads=None, cleanup=None):
+        """``cleanup()`` runs on the pool thread after every call, e.g. to release its connection"""
+        self.threads = threads or configured_threads()
+        self.cleanup = cleanup
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='blocking-pool')
+            return self._executor
+
+    def _call(self, func, args, kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if self.cleanup is not None:
+                self.cleanup()
+
+    async def run(self, func, *args, **kwargs):
+        """Await ``func(*args, **kwargs)`` run on a pool thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(self._call, func, args, kwargs))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
@@ -0,0 +1,130 @@
+"""
+Write-behind buffer for chat history
+
+``/ask`` used to commit every chat turn on the request path. Turns are now
+queued in memory and a background thread writes them in one transaction when
+``max_batch`` turns are waiting or ``interval`` seconds have passed since the
+first one was queued, so chat costs roughly one commit per batch.
+
+Turns not yet written are visible to this process through ``pending`` and are
+flushed by ``close``, which runs at interpreter exit and from gunicorn's
+``worker_exit`` hook. A batch that fails to write is kept and retried.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+CHAT_FLUSH_SIZE = 100          # flush once this many turns are waiting
+CHAT_FLUSH_INTERVAL = 1.0      # ...or this many seconds after the oldest was queued
+
+
+class ChatHistoryBuffer:
+    def __init__(self, write_batch, max_batch=CHAT_FLUSH_SIZE, interval=CHAT_FLUSH_INTERVAL):
+        """``write_batch`` persists a list of (user_id, session_id, message, response, timestamp)"""
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.interval = interval
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._turns = []
+        self._writing = []
+        self._oldest = None
+        self._closed = False
+        self._thread = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+
+    def _check_fork(self):
+        # With preload_app the buffer is created in the gunicorn master; each
+        # worker starts empty and runs its own flusher thread
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def add(self, user_id, session_id, message, response, timestamp):
+        """Queue one chat turn for writing"""
+        self._check_fork()
+        with self._condition:
+            if self._closed:
+                # Shutting down: nothing will flush later, so write through
+                self.write_batch([(user_id, session_id, message, response, timestamp)])
+                return
+            self._turns.append((user_id, session_id, message, response, timestamp))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-history-flusher", daemon=True)
+                self._thread.start()
+            if len(self._turns) >= self.max_batch:
+                self._condition.notify()
+
+    def pending(self, user_id, session_id):
+        """Turns of one chat session that are queued or still being written"""
+        self._check_fork()
+        with self._condition:
+            return [turn for turn in self._writing + self._turns if turn[0] == user_id and turn[1] == session_id]
+
+    def _take(self):
+        # Called with the condition held
+        turns, self._turns, self._oldest = self._turns, [], None
+        self._writing = turns
+        return turns
+
+    def _write(self, turns):
+        try:
+            self.write_batch(turns)
+        except Exception as e:
+            print(f"❌ Failed to save {len(turns)} chat turns, will retry: {e}")
+            with self._condition:
+                self._writing = []
+                self._turns[:0] = turns
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            return False
+        with self._condition:
+            self._writing = []
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if len(self._turns) >= self.max_batch:
+                        break
+                    if self._oldest is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._oldest + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+            with self._flush_lock:
+                with self._condition:
+                    turns = self._take()
+                if turns and not self._write(turns):
+                    time.sleep(self.interval)
+
+    def flush(self):
+        """Write every queued turn now; returns False if the write failed"""
+        self._check_fork()
+        with self._flush_lock:
+            with self._condition:
+                turns = self._take()
+            return not turns or self._write(turns)
+
+    def close(self):
+        """Stop the flusher thread and write whatever is still queued"""
+        self._check_fork()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
@@ -0,0 +1,308 @@
+"""
+Per-thread SQLite connection management for the complaint system
+
+Every thread of a gunicorn worker keeps one long-lived connection per database
+file. Pragmas (WAL journal, cache sizes, busy timeout) are applied once when the
+connection is opened instead of on every call, and connections inherited from
+the parent process after a fork are discarded and reopened lazily. Databases
+registered with ``attach`` are attached to every connection under their schema
+name, so queries can join across files.
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import urllib.parse
+import weakref
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,        # ~20 MB page cache per connection
+    'mmap_size': 268435456,      # 256 MB memory-mapped I/O
+    'busy_timeout': 5000,        # wait up to 5s for the write lock
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON'
+}
+
+# Read-only connections to snapshots (see Database.analytics_db): no journal or
+# sync settings to apply, and a larger page cache of their own for report scans
+READ_ONLY_PRAGMAS = {
+    'query_only': 'ON',
+    'cache_size': -65536,        # ~64 MB page cache per connection
+    'mmap_size': 268435456,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY'
+}
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its manager
+
+    Existing code calls ``conn.close()`` at the end of every method. For a pooled
+    connection that only releases the caller's hold on it; any transaction the
+    outermost caller left open is rolled back so the next user starts clean.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.depth = 0
+        self.attached = set()
+        # Set by the database writer while it runs a group of requests (see
+        # db_writer): each request's commit is deferred to the group's single
+        # commit and its rollback only undoes the request's own savepoint
+        self.group_savepoint = None
+        # Set when the manager is closed while the connection is in use: the
+        # connection closes when its last holder releases it
+        self.discard = False
+        self.closed = False
+
+    def commit(self):
+        if self.group_savepoint is None:
+            super().commit()
+
+    def rollback(self):
+        if self.group_savepoint is None:
+            super().rollback()
+        else:
+            self.execute(f"ROLLBACK TO {self.group_savepoint}")
+
+    def close(self):
+        self.depth = max(self.depth - 1, 0)
+        if self.depth == 0:
+            if self.in_transaction:
+                self.rollback()
+            if self.discard:
+                self.really_close()
+
+    def release(self):
+        """Drop every outstanding hold and discard uncommitted work"""
+        self.depth = 0
+        if self.in_transaction:
+            self.rollback()
+        if self.discard:
+            self.really_close()
+
+    def really_close(self):
+        super().close()
+        self.closed = True
+
+
+# The GroupTransaction running on this thread, if any
+_groups = threading.local()
+
+
+class GroupTransaction:
+    """One write transaction over every database file a group of writer requests touches
+
+    While active on a thread, each read-write connection the thread gets joins
+    it: ``BEGIN IMMEDIATE`` runs on first use, the connection's commits and
+    rollbacks are deferred to the group (see PooledConnection.group_savepoint)
+    and the group holds it open until the end. Every request runs inside a
+    savepoint on every joined file, so a failing request is undone in the main
+    file and all shards alike. The group commits once every request has run,
+    with every file's write lock already held, so all files commit or, if
+    anything fails before that, none do; only an I/O error during the commits
+    themselves can leave them apart.
+    """
+
+    def __init__(self, savepoint):
+        self.savepoint = savepoint
+        self.connections = []
+        self._in_request = False
+
+    def __enter__(self):
+        _groups.current = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _groups.current = None
+        for conn in self.connections:
+            # Anything not committed by commit() is discarded
+            conn.group_savepoint = None
+            conn.release()
+        self.connections = []
+
+    def join(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        if self._in_request:
+            conn.execute(f"SAVEPOINT {self.savepoint}")
+        conn.group_savepoint = self.savepoint
+        conn.depth += 1     # held until the group ends
+        self.connections.append(conn)
+
+    def begin_request(self):
+        for conn in self.connections:
+            conn.execute(f"SAVEPOINT {self.savepoint}")
+        self._in_request = True
+
+    def rollback_request(self):
+        for conn in self.connections:
+            conn.execute(f"ROLLBACK TO {self.savepoint}")
+
+    def end_request(self):
+        for conn in self.connections:
+            conn.execute(f"RELEASE {self.savepoint}")
+        self._in_request = False
+
+    def commit(self):
+        for conn in self.connections:
+            conn.group_savepoint = None
+            conn.commit()
+
+
+def current_group():
+    return getattr(_groups, 'current', None)
+
+
+@contextlib.contextmanager
+def outside_group():
+    """Let this thread open and commit transactions of its own, e.g. to migrate a new shard file"""
+    group = current_group()
+    _groups.current = None
+    try:
+        yield
+    finally:
+        _groups.current = group
+
+
+class ConnectionManager:
+    def __init__(self, db_path, pragmas=None, read_only=False):
+        """With read_only, files are opened with ``mode=ro`` and READ_ONLY_PRAGMAS"""
+        self.db_path = db_path
+        self.read_only = read_only
+        self.pragmas = dict(READ_ONLY_PRAGMAS if read_only else DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.attachments = {}
+        self.closed = False
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _check_fork(self):
+        # A connection must never cross a fork: the child drops the inherited
+        # handles without closing them and opens its own on first use
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def attach(self, schema, path):
+        """Attach another database file to every connection as ``schema``"""
+        self.attachments[schema] = path
+
+    def _attach_missing(self, conn):
+        for schema, path in self.attachments.items():
+            if schema not in conn.attached:
+                if self.read_only:
+                    conn.execute(f"ATTACH DATABASE ? AS {schema}", (self._uri(path),))
+                else:
+                    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                    conn.execute(f"PRAGMA {schema}.journal_mode = {self.pragmas.get('journal_mode', 'WAL')}")
+                conn.attached.add(schema)
+
+    def _uri(self, path):
+        return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+
+    def connect(self):
+        """Open a new connection with the configured pragmas applied"""
+        busy_timeout = int(self.pragmas.get('busy_timeout', 5000))
+        if self.read_only:
+            # Nothing is written through these, so close() may close an idle
+            # one from whichever thread replaces the snapshot
+            conn = sqlite3.connect(self._uri(self.db_path), timeout=busy_timeout / 1000,
+                                   factory=PooledConnection, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=busy_timeout / 1000, factory=PooledConnection)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        self._attach_missing(conn)
+        return conn
+
+    def get_connection(self):
+        """Get this thread's connection, opening it on first use"""
+        self._check_fork()
+        conn = getattr(self._local, 'conn', None)
+        with self._lock:
+            # Taken under the lock so close() never closes a connection in use
+            if conn is not None and not conn.closed:
+                conn.depth += 1
+            else:
+                conn = None
+        if conn is None:
+            conn = self.connect()
+            conn.discard = self.closed
+            conn.depth += 1
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+        elif conn.depth == 1 and len(conn.attached) < len(self.attachments):
+            # Attached after this connection was opened (ATTACH cannot run
+            # inside a transaction, so only the outermost caller does it)
+            self._attach_missing(conn)
+        group = current_group()
+        if group is not None and not self.read_only and conn not in group.connections:
+            group.join(conn)
+        return conn
+
+    def release(self):
+        """Release this thread's connection at the end of a request"""
+        self._check_fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.release()
+
+    def close_all(self):
+        """Close every connection opened by this process"""
+        self._check_fork()
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            try:
+                conn.really_close()
+            except sqlite3.ProgrammingError:
+                # Connection belongs to another thread; it closes when that thread exits
+                pass
+        self._local = threading.local()
+
+    def close(self):
+        """Close every connection for good, e.g. when a snapshot is replaced
+
+        Idle connections are closed now and ones in use when their holder
+        releases them; any opened afterwards close on release too.
+        """
+        self._check_fork()
+        with self._lock:
+            self.closed = True
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+            for conn in connections:
+                conn.discard = True
+                if conn.depth == 0 and not conn.closed:
+                    try:
+                        conn.really_close()
+                    except sqlite3.ProgrammingError:
+                        # Another thread's read-write connection; dropped with this
+                        # manager's thread-local state below
+                        pass
+        self._local = threading.local()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path):
+    """Get the process-wide manager for a database file"""
+    key = db_path if db_path == ':memory:' else os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,144 @@
+"""
+Incrementally maintained per-day rollups for time-series analytics
+
+``daily_ticket_stats`` keeps, per calendar day, the number of tickets created,
+the number resolved and the summed resolution time (seconds) of those resolved
+that day. Triggers on complaints update them in the ticket's own transaction.
+Rollups record history: deleting (or archiving) a ticket does not rewrite the
+days it was counted in.
+
+``daily_chat_stats`` keeps a HyperLogLog sketch of the chat sessions seen each
+day, updated from Python when chat turns are saved.
+
+Date-range analytics then read one row per day instead of scanning tickets.
+The triggers read the day and epoch columns generated on complaints (see
+timestamps.py); rebuilds derive the same values from the stored strings because
+archived rows do not carry those columns.
+"""
+
+from hyperloglog import HyperLogLog
+from timestamps import EPOCH_SQL
+
+FIRST_DAY = '0000-01-01'
+LAST_DAY = '9999-12-31'
+
+# Resolution time from the stored strings, equal to resolved_epoch - created_epoch
+RESOLUTION_SECONDS_SQL = f"({EPOCH_SQL.format(column='{row}.resolved_at')} - {EPOCH_SQL.format(column='{row}.created_at')})"
+
+
+def rebuild_rollups(cursor, complaints='complaints', chat_history='chat_history'):
+    """Recompute both rollup tables from the source rows (run in a write transaction)
+
+    ``complaints`` and ``chat_history`` name the tables or subqueries to read,
+    so archived rows can be included.
+    """
+    cursor.execute("DELETE FROM daily_ticket_stats")
+    cursor.execute(f'''
+        INSERT INTO daily_ticket_stats (day, created)
+        SELECT DATE(created_at), COUNT(*) FROM {complaints}
+        WHERE DATE(created_at) IS NOT NULL
+        GROUP BY DATE(created_at)
+    ''')
+    cursor.execute(f'''
+        INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+        SELECT DATE(c.resolved_at), COUNT(*), SUM({RESOLUTION_SECONDS_SQL.format(row='c')})
+        FROM {complaints} c
+        WHERE DATE(c.resolved_at) IS NOT NULL
+        GROUP BY DATE(c.resolved_at)
+        ON CONFLICT (day) DO UPDATE SET
+            resolved = excluded.resolved,
+            resolution_seconds_sum = excluded.resolution_seconds_sum
+    ''')
+
+    sketches = {}
+    cursor.execute(f"SELECT DISTINCT DATE(timestamp), session_id FROM {chat_history} WHERE DATE(timestamp) IS NOT NULL")
+    for day, session_id in cursor.fetchall():
+        sketches.setdefault(day, HyperLogLog()).add(session_id)
+
+    cursor.execute("DELETE FROM daily_chat_stats")
+    cursor.executemany(
+        "INSERT INTO daily_chat_stats (day, sessions_sketch) VALUES (?, ?)",
+        [(day, sketch.to_bytes()) for day, sketch in sketches.items()]
+    )
+
+
+def add_inserted_rollups(cursor, first_id):
+    """Fold complaints with id >= first_id into daily_ticket_stats
+
+    The bulk-load counterpart of the insert trigger, run once per chunk.
+    """
+    cursor.execute('''
+        INSERT INTO daily_ticket_stats (day, created)
+        SELECT created_day, COUNT(*) FROM complaints
+        WHERE id >= ? AND created_day IS NOT NULL
+        GROUP BY created_day
+        ON CONFLICT (day) DO UPDATE SET created = created + excluded.created
+    ''', (first_id,))
+    cursor.execute('''
+        INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+        SELECT resolved_day, COUNT(*), SUM(resolved_epoch - created_epoch)
+        FROM complaints
+        WHERE id >= ? AND resolved_day IS NOT NULL
+        GROUP BY resolved_day
+        ON CONFLICT (day) DO UPDATE SET
+            resolved = resolved + excluded.resolved,
+            resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum
+    ''', (first_id,))
+
+
+def record_chat_sessions(cursor, sessions_by_day):
+    """Fold chat session ids into the per-day sketches
+
+    ``sessions_by_day`` maps a 'YYYY-MM-DD' day to an iterable of session ids.
+    A day's sketch is only rewritten when one of its registers actually changed,
+    so repeated turns of an already-counted session cost a single read.
+    """
+    for day, session_ids in sessions_by_day.items():
+        cursor.execute("SELECT sessions_sketch FROM daily_chat_stats WHERE day = ?", (day,))
+        row = cursor.fetchone()
+        sketch = HyperLogLog.from_bytes(row[0] if row else None)
+
+        changed = False
+        for session_id in session_ids:
+            changed = sketch.add(session_id) or changed
+
+        if changed or not row:
+            cursor.execute('''
+                INSERT INTO daily_chat_stats (day, sessions_sketch) VALUES (?, ?)
+                ON CONFLICT (day) DO UPDATE SET sessions_sketch = excluded.sessions_sketch
+            ''', (day, sketch.to_bytes()))
+
+
+def get_ticket_totals(cursor, start_day=FIRST_DAY, end_day=LAST_DAY):
+    """Sum the ticket rollups over an inclusive day range"""
+    cursor.execute('''
+        SELECT COALESCE(SUM(created), 0), COALESCE(SUM(resolved), 0), COALESCE(SUM(resolution_seconds_sum), 0)
+        FROM daily_ticket_stats
+        WHERE day BETWEEN ? AND ?
+    ''', (start_day, end_day))
+    created, resolved, resolution_seconds = cursor.fetchone()
+    return {
+        'created': created,
+        'resolved': resolved,
+        'avg_resolution_seconds': resolution_seconds / resolved if resolved else 0
+    }
+
+
+def get_created_by_day(cursor, start_day, end_day):
+    """Tickets created per day over an inclusive range, newest day first"""
+    cursor.execute('''
+        SELECT day, created
+        FROM daily_ticket_stats
+        WHERE day BETWEEN ? AND ? AND created > 0
+        ORDER BY day DESC
+    ''', (start_day, end_day))
+    return dict(cursor.fetchall())
+
+
+def get_chat_sessions(cursor, start_day, end_day):
+    """Approximate distinct chat sessions over an inclusive day range"""
+    cursor.execute("SELECT sessions_sketch FROM daily_chat_stats WHERE day BETWEEN ? AND ?", (start_day, end_day))
+    sketch = HyperLogLog()
+    for (blob,) in cursor.fetchall():
+        sketch.merge(HyperLogLog.from_bytes(blob))
+    return sketch.count()
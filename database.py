@@ -1,147 +1,284 @@
 import sqlite3
 import hashlib
-import uuid
+import random
 from datetime import datetime, timedelta
 import os
+import json
+import base64
+import threading
+import time
+import heapq
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from connection_manager import ConnectionManager, get_connection_manager, outside_group
+from migrations import run_migrations, get_schema_version, SCHEMA_VERSION, PRIORITY_RANKS, PRIORITY_RANK_SQL, LAST_PRIORITY_RANK
+from migrations import BULK_LOAD_MODE, ARCHIVE_MODE
+import ticket_counters
+from ticket_counters import read_counters, rebuild_counters, agent_names
+import daily_rollups
+import agent_workload
+import ticket_search
+import events
+import archive
+import ticket_ids
+import sharding
+import snapshots
+from aggregate_cache import AggregateCache
+from records import Ticket, TicketUpdate, Agent, SearchHit
+from chat_buffer import ChatHistoryBuffer
+from db_writer import mutation, offline, client_from_env
+
+# Category to agent specialization mapping used for auto-assignment
+CATEGORY_SPECIALIZATIONS = {
+    'Technical': 'Technical Support',
+    'Billing': 'Billing & Finance',
+    'Service': 'Customer Service',
+    'Product': 'Product Support',
+    'General': 'Escalation Management'  # Default fallback
+}
+FALLBACK_SPECIALIZATION = 'Escalation Management'
+
+# Estimated resolution time by priority
+RESOLUTION_TIMES = {
+    'Urgent': '2-4 hours',
+    'High': '1-2 days',
+    'Medium': '3-5 days',
+    'Low': '5-7 days'
+}
+DEFAULT_RESOLUTION_TIME = '5-7 days'
+
+BULK_REQUIRED_FIELDS = ['user_id', 'title', 'description', 'category', 'priority']
+BULK_CHUNK_SIZE = 2000
+
+# Export types and the tickets each one covers
+EXPORT_FILTERS = {
+    'active': ("status != 'Resolved'", 'created_at'),
+    'resolved': ("status = 'Resolved'", 'updated_at'),
+    'all': ('1', 'created_at')
+}
+EXPORT_COLUMNS = 'ticket_id, title, description, category, priority, status, assigned_to, created_at, updated_at, resolution_notes'
+EXPORT_BATCH_SIZE = 500     # rows fetched per step while streaming an export
+
+# Ticket search filters and the column each one matches
+SEARCH_FILTERS = {
+    'status': 'c.status',
+    'priority': 'c.priority',
+    'category': 'c.category',
+    'agent_id': 'c.assigned_agent_id'
+}
+
+def encode_page_cursor(ticket):
+    """Encode the sort key of the last ticket on a page as an opaque cursor"""
+    key = [PRIORITY_RANKS.get(ticket['priority'], LAST_PRIORITY_RANK), ticket['created_at'], ticket['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_page_cursor(cursor):
+    """Decode a cursor produced by encode_page_cursor"""
+    try:
+        rank, created_at, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(rank), str(created_at), int(last_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor")
+
+def fetch_in_batches(cursor, batch_size):
+    """Yield the rows of an executed cursor, fetching ``batch_size`` at a time"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def encode_search_cursor(hit):
+    """Encode the rank of the last search hit on a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([hit.score, hit.id]).encode()).decode()
+
+def decode_search_cursor(cursor):
+    """Decode a cursor produced by encode_search_cursor"""
+    try:
+        score, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(last_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid search cursor")
+
+# Database files this process has already found initialized at SCHEMA_VERSION
+_initialized_databases = set()
+
+def invalidates_aggregates(method):
+    """Drop the cached analytics once this ticket or agent write returns (see aggregate_cache)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.aggregates.invalidate()
+    
+    return wrapper
 
 class Database:
-    def __init__(self, db_path="complaints.db"):
+    # Name the database writer serves this class under (see db_writer)
+    WRITER_TARGET = 'database'
+    
+    def __init__(self, db_path="complaints.db", archive_path=None, use_writer=True, read_only=False):
         self.db_path = db_path
-        self.init_db()
+        self.archive_path = archive_path or archive.default_archive_path(db_path)
+        self.read_only = read_only
+        if read_only:
+            # Snapshots for reporting: mode=ro, query_only and their own page cache.
+            # Not shared process-wide, so a replaced snapshot's connections go with it
+            self.connections = ConnectionManager(db_path, read_only=True)
+        else:
+            self.connections = get_connection_manager(db_path)
+        self.connections.attach(archive.SCHEMA, self.archive_path)
+        # Methods marked @mutation go through the writer process in writer mode
+        self.writer = client_from_env() if use_writer else None
+        # Snapshots take no chat turns, so they get no buffer or exit hook
+        self.chat_buffer = None if read_only else self._create_chat_buffer()
+        # Analytics and workload results, kept until tickets or agents change
+        self.aggregates = AggregateCache(self._aggregate_version)
+        self._replica = None
+        self._replica_path = None
+        self._replica_checked = None
+        self._replica_lock = threading.Lock()
+        if not read_only:
+            self.ensure_initialized()
+    
+    def _create_chat_buffer(self):
+        return ChatHistoryBuffer(self.save_chat_turns)
+    
+    def close(self):
+        """Write out queued chat turns and close this database's connections
+        
+        A snapshot's connections are its own and are closed for good; the live
+        file's are shared process-wide and reopen on next use.
+        """
+        if self.chat_buffer is not None:
+            self.chat_buffer.close()
+        if self.read_only:
+            self.connections.close()
+        else:
+            self.connections.close_all()
+    
+    def _init_key(self):
+        return os.path.abspath(self.db_path), os.path.abspath(self.archive_path)
+    
+    def ensure_initialized(self):
+        """Run init_db unless this database file is already at SCHEMA_VERSION
+        
+        init_db records the version in both the hot and the archive file once
+        migrations, archive columns and seed data are in place, so workers and
+        scripts opening an initialized database only read two pragmas, and each
+        process checks each file once.
+        """
+        if self.db_path == ':memory:':
+            self.init_db()
+            return
+        
+        key = self._init_key()
+        if key in _initialized_databases:
+            return
+        
+        # A shard first opened by a writer request migrates in transactions of
+        # its own, not inside the request's group
+        with outside_group():
+            conn = self.get_connection()
+            archive_version = conn.execute(f"PRAGMA {archive.SCHEMA}.user_version").fetchone()[0]
+            current = get_schema_version(conn) == SCHEMA_VERSION and archive_version == SCHEMA_VERSION
+            conn.close()
+            
+            if current:
+                _initialized_databases.add(key)
+            else:
+                self.init_db()
     
+    @invalidates_aggregates
     def recreate_database(self):
-        """Recreate the entire database with fresh schema"""
-        import os
+        """Recreate the entire database with fresh schema, keeping a snapshot of the old one"""
         if os.path.exists(self.db_path):
-            os.remove(self.db_path)
+            snapshot, _ = self.create_snapshot()
+            print(f"⚠️  Previous database saved in snapshot {snapshot}")
+        self._remove_files()
         self.init_db()
     
+    def _remove_files(self):
+        self.connections.close_all()
+        _initialized_databases.discard(self._init_key())
+        for path in (self.db_path, self.archive_path):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    
+    def snapshot_files(self):
+        """The database files a snapshot copies"""
+        return [self.db_path, self.archive_path]
+    
+    def event_files(self):
+        """The database files whose events table records ticket changes (see events)"""
+        return [self.db_path]
+    
+    def create_snapshot(self, snapshot_dir=None, pages=snapshots.BACKUP_PAGES):
+        """Copy the live database files into a new snapshot without blocking writers (see snapshots)
+        
+        Returns (snapshot path, pages copied).
+        """
+        return snapshots.create_snapshot(
+            self.snapshot_files(), snapshot_dir or snapshots.default_snapshot_dir(self.db_path), pages
+        )
+    
+    def open_snapshot(self, snapshot=None):
+        """A read-only Database over a snapshot (the newest unless given), or None when there is none"""
+        snapshot = snapshot or snapshots.latest_snapshot(snapshots.default_snapshot_dir(self.db_path))
+        if snapshot is None:
+            return None
+        return Database(os.path.join(snapshot, os.path.basename(self.db_path)),
+                        os.path.join(snapshot, os.path.basename(self.archive_path)),
+                        use_writer=False, read_only=True)
+    
+    def analytics_db(self):
+        """The Database admin reports and exports read from
+        
+        The newest snapshot no older than snapshots.REPLICA_MAX_AGE, opened
+        read-only, so report scans never share connections or locks with ticket
+        writes; this database itself when there is none. Looks for a newer
+        snapshot at most every snapshots.REPLICA_CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        with self._replica_lock:
+            if self._replica_checked is None or now - self._replica_checked >= snapshots.REPLICA_CHECK_INTERVAL:
+                self._replica_checked = now
+                latest = snapshots.latest_snapshot(snapshots.default_snapshot_dir(self.db_path),
+                                                   max_age=snapshots.REPLICA_MAX_AGE)
+                if latest != self._replica_path:
+                    # Requests still reading the old snapshot finish first; its
+                    # connections close as they release them
+                    if self._replica is not None:
+                        self._replica.close()
+                    self._replica = self.open_snapshot(latest) if latest else None
+                    self._replica_path = latest
+            return self._replica or self
+    
     def get_connection(self):
-        # Always create a fresh connection to avoid cached schema issues
-        conn = sqlite3.connect(self.db_path)
-        # Ensure foreign keys are enabled
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
-    
-    def migrate_database(self, cursor):
-        """Handle database migrations for schema updates"""
-        try:
-            # Check if complaints table exists and has correct columns
-            cursor.execute("PRAGMA table_info(complaints)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'user_id' not in columns and len(columns) > 0:
-                # Old schema detected, need to migrate
-                print("Migrating database schema...")
-                
-                # Drop old tables and recreate with correct schema
-                cursor.execute("DROP TABLE IF EXISTS complaints")
-                cursor.execute("DROP TABLE IF EXISTS chat_history")
-                cursor.execute("DROP TABLE IF EXISTS admin_actions")
-                cursor.execute("DROP TABLE IF EXISTS agent_responses")
-                
-                print("Old tables dropped, will recreate with correct schema")
-                
-        except Exception as e:
-            print(f"Migration check failed, proceeding with normal init: {e}")
+        # Reuse this thread's long-lived connection; pragmas (WAL, foreign keys,
+        # busy timeout) are applied once when it is first opened
+        return self.connections.get_connection()
+    
+    def release_connection(self):
+        """Discard any uncommitted work left on this thread's connection"""
+        self.connections.release()
     
     def init_db(self):
-        """Initialize database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Check if we need to migrate existing tables
-        self.migrate_database(cursor)
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                phone TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_admin BOOLEAN DEFAULT FALSE
-            )
-        ''')
-        
-        # Complaints table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS complaints (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticket_id TEXT UNIQUE NOT NULL,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                category TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                status TEXT DEFAULT 'Registered',
-                assigned_to TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                resolved_at TIMESTAMP,
-                resolution_notes TEXT,
-                estimated_resolution_time TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+        """Apply pending migrations, sync the archive schema and seed default users
         
-        # Chat history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                session_id TEXT,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+        Returns the list of migration versions applied.
+        """
+        conn = self.get_connection()
         
-        # Admin actions log
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS admin_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                admin_id INTEGER NOT NULL,
-                action_type TEXT NOT NULL,
-                target_id TEXT,
-                description TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (admin_id) REFERENCES users (id)
-            )
-        ''')
+        # Bring the schema up to date (forward-only, tracked in user_version)
+        applied = run_migrations(conn)
         
-        # Agents table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS agents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT,
-                specialization TEXT NOT NULL,
-                description TEXT,
-                status TEXT DEFAULT 'Active',
-                assigned_tickets INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Agent responses table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS agent_responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticket_id TEXT NOT NULL,
-                agent_id INTEGER NOT NULL,
-                response_text TEXT NOT NULL,
-                response_type TEXT DEFAULT 'Update',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (agent_id) REFERENCES agents (id),
-                FOREIGN KEY (ticket_id) REFERENCES complaints (ticket_id)
-            )
-        ''')
+        # Archive tables follow the hot tables' columns
+        conn.execute("BEGIN IMMEDIATE")
+        archive.ensure_archive_schema(conn.cursor())
+        conn.commit()
         
         # Create default admin user
         self.create_default_admin()
@@ -149,8 +286,13 @@ class Database:
         # Create default agents
         self.create_default_agents()
         
-        conn.commit()
+        # Recorded last, so an interrupted init is repeated by the next process
+        conn.execute(f"PRAGMA {archive.SCHEMA}.user_version = {SCHEMA_VERSION}")
         conn.close()
+        
+        if self.db_path != ':memory:':
+            _initialized_databases.add(self._init_key())
+        return applied
     
     def create_default_admin(self):
         """Create default admin users"""
@@ -236,25 +378,16 @@ class Database:
         conn.close()
     
     def get_best_agent_for_category(self, category, priority):
-        """Get the best available agent for a specific category and priority"""
+        """Get the id of the best available agent for a specific category and priority"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Category to specialization mapping
-        category_mapping = {
-            'Technical': 'Technical Support',
-            'Billing': 'Billing & Finance', 
-            'Service': 'Customer Service',
-            'Product': 'Product Support',
-            'General': 'Escalation Management'  # Default fallback
-        }
-        
-        specialization = category_mapping.get(category, 'Escalation Management')
+        specialization = CATEGORY_SPECIALIZATIONS.get(category, FALLBACK_SPECIALIZATION)
         
         # For urgent/high priority, try to find agent with lowest workload in specialization
         if priority in ['Urgent', 'High']:
             cursor.execute('''
-                SELECT name, assigned_tickets
+                SELECT id, assigned_tickets
                 FROM agents
                 WHERE specialization = ? AND status = 'Active'
                 ORDER BY assigned_tickets ASC, name ASC
@@ -263,7 +396,7 @@ class Database:
         else:
             # For medium/low priority, use round-robin assignment
             cursor.execute('''
-                SELECT name, assigned_tickets
+                SELECT id, assigned_tickets
                 FROM agents
                 WHERE specialization = ? AND status = 'Active'
                 ORDER BY assigned_tickets ASC, RANDOM()
@@ -275,7 +408,7 @@ class Database:
         # If no agent found in specialization, assign to escalation manager
         if not agent:
             cursor.execute('''
-                SELECT name, assigned_tickets
+                SELECT id, assigned_tickets
                 FROM agents
                 WHERE specialization = 'Escalation Management' AND status = 'Active'
                 ORDER BY assigned_tickets ASC
@@ -288,22 +421,17 @@ class Database:
         return agent[0] if agent else None
     
     def get_category_workload_stats(self):
-        """Get workload statistics by category"""
+        """Get workload statistics by category (cached, see aggregate_cache)"""
+        return self.aggregates.get('category_workload', self._category_workload_stats)
+    
+    def _category_workload_stats(self):
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Get agent workload by specialization
-        cursor.execute('''
-            SELECT a.specialization, a.name, a.assigned_tickets,
-                   COUNT(c.id) as active_tickets
-            FROM agents a
-            LEFT JOIN complaints c ON a.name = c.assigned_to AND c.status != 'Resolved'
-            WHERE a.status = 'Active'
-            GROUP BY a.id, a.specialization, a.name, a.assigned_tickets
-            ORDER BY a.specialization, a.assigned_tickets
-        ''')
-        
-        workload_stats = cursor.fetchall()
+        # assigned_tickets is the trigger-maintained open ticket count; lifetime
+        # assignments come from the ticket counters
+        workload_stats = self._active_agent_loads(cursor)
+        total_by_agent = self._ticket_counters(cursor)['assignee']
         conn.close()
         
         # Organize by specialization
@@ -314,65 +442,108 @@ class Database:
                 stats_by_category[specialization] = []
             
             stats_by_category[specialization].append({
-                'name': row[1],
-                'total_assigned': row[2],
+                'name': row[2],
+                'total_assigned': total_by_agent.get(str(row[1]), 0),
                 'active_tickets': row[3]
             })
         
         return stats_by_category
     
-    def reassign_ticket(self, ticket_id, new_agent, admin_id, reason="Manual reassignment"):
-        """Reassign ticket to different agent"""
+    def _active_agent_loads(self, cursor):
+        """(specialization, id, name, open tickets) of active agents, least loaded first"""
+        cursor.execute('''
+            SELECT specialization, id, name, assigned_tickets
+            FROM agents
+            WHERE status = 'Active'
+            ORDER BY specialization, assigned_tickets
+        ''')
+        return cursor.fetchall()
+    
+    def _get_agent_name(self, cursor, agent_id):
+        """Display name of an agent, raising ValueError for unknown ids"""
+        cursor.execute("SELECT name FROM agents WHERE id = ?", (agent_id,))
+        row = cursor.fetchone()
+        if not row:
+            raise ValueError(f"Agent {agent_id} not found")
+        return row[0]
+    
+    def _update_ticket(self, cursor, ticket_id, assignments, params, expected_version=None, agent_id=None):
+        """Apply one UPDATE to a ticket and return a TicketUpdate (the caller commits)
+        
+        ``assignments`` is the SET list for ``params``; row_version is bumped
+        here. With ``expected_version`` the write only happens if the ticket is
+        still at that version, so a successful update is a single statement and
+        concurrent edits cannot overwrite each other. Only a missed update reads
+        the ticket again, to tell a conflict from an unknown ticket or agent
+        (ValueError).
+        """
+        conditions = ["ticket_id = ?"]
+        condition_params = [ticket_id]
+        if expected_version is not None:
+            conditions.append("row_version = ?")
+            condition_params.append(expected_version)
+        if agent_id is not None:
+            conditions.append("EXISTS (SELECT 1 FROM agents WHERE id = ?)")
+            condition_params.append(agent_id)
+        
+        cursor.execute(f'''
+            UPDATE complaints
+            SET {', '.join(assignments)}, row_version = row_version + 1
+            WHERE {' AND '.join(conditions)}
+            RETURNING {TicketUpdate.COLUMNS}
+        ''', params + condition_params)
+        rows = cursor.fetchall()
+        if rows:
+            return TicketUpdate(*rows[0])
+        
+        if agent_id is not None:
+            self._get_agent_name(cursor, agent_id)
+        cursor.execute(f"SELECT {TicketUpdate.COLUMNS} FROM complaints WHERE ticket_id = ?", (ticket_id,))
+        current = cursor.fetchone()
+        if not current:
+            raise ValueError(f"Ticket {ticket_id} not found")
+        return TicketUpdate(*current, conflict=True)
+    
+    @invalidates_aggregates
+    @mutation
+    def reassign_ticket(self, ticket_id, agent_id, admin_id, reason="Manual reassignment", expected_version=None):
+        """Reassign ticket to different agent, returning a TicketUpdate"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Get current assignment
-        cursor.execute('SELECT assigned_to FROM complaints WHERE ticket_id = ?', (ticket_id,))
-        current_agent = cursor.fetchone()
-        
-        if current_agent and current_agent[0]:
-            # Decrease old agent's count
-            cursor.execute('''
-                UPDATE agents 
-                SET assigned_tickets = assigned_tickets - 1
-                WHERE name = ? AND assigned_tickets > 0
-            ''', (current_agent[0],))
-        
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Update ticket assignment
-        cursor.execute('''
-            UPDATE complaints 
-            SET assigned_to = ?, updated_at = ?
-            WHERE ticket_id = ?
-        ''', (new_agent, current_time, ticket_id))
-        
-        # Increase new agent's count
-        cursor.execute('''
-            UPDATE agents 
-            SET assigned_tickets = assigned_tickets + 1
-            WHERE name = ?
-        ''', (new_agent,))
-        
-        # Log admin action
-        cursor.execute('''
-            INSERT INTO admin_actions (admin_id, action_type, target_id, description, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (admin_id, 'REASSIGN_TICKET', ticket_id, f"Reassigned to {new_agent}: {reason}", current_time))
-        
-        conn.commit()
-        conn.close()
+        try:
+            # Update ticket assignment (agent workloads follow via triggers)
+            result = self._update_ticket(
+                cursor, ticket_id,
+                ["assigned_agent_id = ?", "assigned_to = (SELECT name FROM agents WHERE id = ?)", "updated_at = ?"],
+                [agent_id, agent_id, current_time], expected_version, agent_id
+            )
+            
+            # Log admin action
+            if not result.conflict:
+                cursor.execute('''
+                    INSERT INTO admin_actions (admin_id, action_type, target_id, description, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (admin_id, 'REASSIGN_TICKET', ticket_id, f"Reassigned to {result.assigned_to}: {reason}", current_time))
+            
+            conn.commit()
+        finally:
+            conn.close()
+        return result
     
     def get_unassigned_tickets(self):
         """Get all unassigned tickets"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Ticket.row_factory
         
-        cursor.execute('''
-            SELECT c.*, u.username, u.email, u.full_name
+        cursor.execute(f'''
+            SELECT {Ticket.COLUMNS}
             FROM complaints c
             JOIN users u ON c.user_id = u.id
-            WHERE c.assigned_to IS NULL OR c.assigned_to = ''
+            WHERE c.assigned_agent_id IS NULL
             ORDER BY 
                 CASE c.priority 
                     WHEN 'Urgent' THEN 1
@@ -385,34 +556,13 @@ class Database:
         
         tickets = cursor.fetchall()
         conn.close()
-        
-        return [
-            {
-                'id': row[0],
-                'ticket_id': row[1],
-                'user_id': row[2],
-                'title': row[3],
-                'description': row[4],
-                'category': row[5],
-                'priority': row[6],
-                'status': row[7],
-                'assigned_to': row[8],
-                'created_at': row[9],
-                'updated_at': row[10],
-                'resolved_at': row[11],
-                'resolution_notes': row[12],
-                'estimated_resolution_time': row[13],
-                'username': row[14],
-                'email': row[15],
-                'full_name': row[16]
-            }
-            for row in tickets
-        ]
+        return tickets
     
     def hash_password(self, password):
         """Hash password using SHA256"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    @mutation
     def create_user(self, username, email, password, full_name, phone=None):
         """Create a new user"""
         conn = self.get_connection()
@@ -474,74 +624,191 @@ class Database:
         return user
     
     def generate_ticket_id(self):
-        """Generate unique ticket ID"""
-        return f"P004-{uuid.uuid4().hex[:8].upper()}"
+        """Generate unique, time-sortable ticket ID (see ticket_ids)"""
+        return ticket_ids.generator.new_id()
     
+    @invalidates_aggregates
+    @mutation
     def create_complaint(self, user_id, title, description, category, priority, auto_assign=True):
         """Create a new complaint/ticket with optional auto-assignment"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Safety check: Verify the table schema has user_id column
-        try:
-            cursor.execute("PRAGMA table_info(complaints)")
-            columns = [row[1] for row in cursor.fetchall()]
-            if 'user_id' not in columns:
-                raise Exception("Database schema error: user_id column missing from complaints table")
-        except Exception as e:
-            conn.close()
-            raise Exception(f"Database schema validation failed: {e}")
-        
         ticket_id = self.generate_ticket_id()
         
-        # Estimate resolution time based on priority
-        resolution_times = {
-            'Urgent': '2-4 hours',
-            'High': '1-2 days',
-            'Medium': '3-5 days',
-            'Low': '5-7 days'
-        }
-        
         # Auto-assign agent based on category if enabled
-        assigned_to = None
+        agent_id = None
         if auto_assign:
-            assigned_to = self.get_best_agent_for_category(category, priority)
+            agent_id = self.get_best_agent_for_category(category, priority)
+        
+        return self._insert_complaint(ticket_id, user_id, title, description, category, priority, agent_id)
+    
+    def _insert_complaint(self, ticket_id, user_id, title, description, category, priority, agent_id):
+        """Insert one new ticket, returning (ticket_id, complaint_id)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
         # Use local time instead of CURRENT_TIMESTAMP
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         cursor.execute('''
             INSERT INTO complaints 
-            (ticket_id, user_id, title, description, category, priority, assigned_to, estimated_resolution_time, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (ticket_id, user_id, title, description, category, priority, assigned_to, resolution_times.get(priority, '5-7 days'), current_time, current_time))
+            (ticket_id, user_id, title, description, category, priority, assigned_agent_id, assigned_to, estimated_resolution_time, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT name FROM agents WHERE id = ?), ?, ?, ?)
+        ''', (ticket_id, user_id, title, description, category, priority, agent_id, agent_id, RESOLUTION_TIMES.get(priority, DEFAULT_RESOLUTION_TIME), current_time, current_time))
         
         complaint_id = cursor.lastrowid
         
-        # Update agent assigned tickets count if auto-assigned
-        if assigned_to:
-            cursor.execute('''
-                UPDATE agents 
-                SET assigned_tickets = assigned_tickets + 1
-                WHERE name = ?
-            ''', (assigned_to,))
-        
         conn.commit()
         conn.close()
         
         return ticket_id, complaint_id
     
+    @invalidates_aggregates
+    @offline
+    def create_complaints_bulk(self, tickets, auto_assign=True, chunk_size=BULK_CHUNK_SIZE):
+        """Insert many tickets in chunked transactions, returning the number created
+        
+        ``tickets`` is any iterable of dicts with user_id, title, description,
+        category and priority; ticket_id, status, assigned_agent_id (or an agent
+        name in assigned_to), created_at, resolved_at and resolution_notes are
+        optional (for migrated tickets).
+        Agents are picked in memory with the same rules as
+        get_best_agent_for_category, and agent counters are written once per chunk.
+        A chunk that fails validation is rolled back; earlier chunks stay committed.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        created = 0
+        chunk = []
+        
+        try:
+            for ticket in tickets:
+                chunk.append(ticket)
+                if len(chunk) >= chunk_size:
+                    created += self._insert_complaint_chunk(cursor, chunk, auto_assign, created)
+                    conn.commit()
+                    chunk = []
+            if chunk:
+                created += self._insert_complaint_chunk(cursor, chunk, auto_assign, created)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return created
+    
+    def _insert_complaint_chunk(self, cursor, chunk, auto_assign, offset):
+        """Insert one chunk of bulk tickets in a write transaction (committed by the caller)"""
+        cursor.execute("BEGIN IMMEDIATE")
+        agent_names, agent_ids, workloads = self._load_agent_workloads(cursor)
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = []
+        
+        for position, ticket in enumerate(chunk, start=offset + 1):
+            missing = [field for field in BULK_REQUIRED_FIELDS if ticket.get(field) in (None, '')]
+            if missing:
+                raise ValueError(f"Ticket {position}: missing {', '.join(missing)}")
+            
+            priority = ticket['priority']
+            status = ticket.get('status') or 'Registered'
+            agent_id = ticket.get('assigned_agent_id') or None
+            if agent_id is None and ticket.get('assigned_to'):
+                agent_id = agent_ids.get(ticket['assigned_to'])
+                if agent_id is None:
+                    raise ValueError(f"Ticket {position}: unknown agent {ticket['assigned_to']!r}")
+            elif agent_id is not None:
+                agent_id = int(agent_id)
+                if agent_id not in agent_names:
+                    raise ValueError(f"Ticket {position}: unknown agent id {agent_id}")
+            if agent_id is None and auto_assign and status != 'Resolved':
+                agent_id = self._pick_agent(workloads, ticket['category'], priority)
+            
+            created_at = ticket.get('created_at') or current_time
+            rows.append([
+                ticket.get('ticket_id'), ticket['user_id'], ticket['title'],
+                ticket['description'], ticket['category'], priority, status, agent_id,
+                agent_names.get(agent_id), RESOLUTION_TIMES.get(priority, DEFAULT_RESOLUTION_TIME),
+                created_at, ticket.get('updated_at') or created_at, ticket.get('resolved_at') or None,
+                ticket.get('resolution_notes') or None
+            ])
+        
+        needs_id = [row for row in rows if not row[0]]
+        for row, ticket_id in zip(needs_id, ticket_ids.generator.new_ids(len(needs_id))):
+            row[0] = ticket_id
+        
+        # Counters, rollups, agent workloads, the search index and events are filled
+        # with one set-based pass per chunk rather than per-row trigger bodies. The
+        # mode row only lives in this transaction, so other writers never see it
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM complaints")
+        first_id = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO suspended_triggers (mode) VALUES (?)", (BULK_LOAD_MODE,))
+        
+        cursor.executemany('''
+            INSERT INTO complaints
+            (ticket_id, user_id, title, description, category, priority, status, assigned_agent_id,
+             assigned_to, estimated_resolution_time, created_at, updated_at, resolved_at, resolution_notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        
+        ticket_counters.add_inserted_counters(cursor, first_id)
+        daily_rollups.add_inserted_rollups(cursor, first_id)
+        agent_workload.add_inserted_workload(cursor, first_id)
+        ticket_search.add_inserted_documents(cursor, first_id)
+        events.add_inserted_events(cursor, first_id)
+        cursor.execute("DELETE FROM suspended_triggers WHERE mode = ?", (BULK_LOAD_MODE,))
+        
+        return len(rows)
+    
+    def _load_agent_workloads(self, cursor):
+        """Load agents for in-memory assignment
+        
+        Returns ({id: name}, {name: id}, {specialization: [[assigned_tickets, name, id], ...]}),
+        the last holding active agents only.
+        """
+        cursor.execute("SELECT id, name, specialization, status, assigned_tickets FROM agents ORDER BY id")
+        agent_names, agent_ids, workloads = {}, {}, {}
+        for agent_id, name, specialization, status, assigned_tickets in cursor.fetchall():
+            agent_names[agent_id] = name
+            agent_ids.setdefault(name, agent_id)
+            if status == 'Active':
+                workloads.setdefault(specialization, []).append([assigned_tickets, name, agent_id])
+        return agent_names, agent_ids, workloads
+    
+    def _pick_agent(self, workloads, category, priority):
+        """In-memory equivalent of get_best_agent_for_category that also books the ticket"""
+        specialization = CATEGORY_SPECIALIZATIONS.get(category, FALLBACK_SPECIALIZATION)
+        agents = workloads.get(specialization) or workloads.get(FALLBACK_SPECIALIZATION)
+        if not agents:
+            return None
+        
+        if priority in ['Urgent', 'High']:
+            agent = min(agents)
+        else:
+            # Round-robin among the least loaded agents
+            lowest = min(agent[0] for agent in agents)
+            agent = random.choice([agent for agent in agents if agent[0] == lowest])
+        
+        agent[0] += 1
+        return agent[2]
+    
     def get_user_complaints(self, user_id):
         """Get all complaints for a user"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
+        # Include the user's archived tickets
+        cursor.execute(f'''
             SELECT ticket_id, title, category, priority, status, created_at, estimated_resolution_time
-            FROM complaints 
-            WHERE user_id = ? 
+            FROM (
+                SELECT ticket_id, title, category, priority, status, created_at, estimated_resolution_time
+                FROM main.complaints WHERE user_id = ?
+                UNION ALL
+                SELECT ticket_id, title, category, priority, status, created_at, estimated_resolution_time
+                FROM {archive.SCHEMA}.complaints WHERE user_id = ?
+            )
             ORDER BY created_at DESC
-        ''', (user_id,))
+        ''', (user_id, user_id))
         
         complaints = cursor.fetchall()
         conn.close()
@@ -563,140 +830,281 @@ class Database:
         """Get complaint details by ticket ID"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Ticket.row_factory
+        
+        # Hot tickets first, then the archive
+        for schema in ('main', archive.SCHEMA):
+            cursor.execute(f'''
+                SELECT {Ticket.COLUMNS}
+                FROM {schema}.complaints c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.ticket_id = ?
+            ''', (ticket_id,))
+            complaint = cursor.fetchone()
+            if complaint:
+                break
         
-        cursor.execute('''
-            SELECT c.*, u.username, u.email, u.full_name
-            FROM complaints c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.ticket_id = ?
-        ''', (ticket_id,))
+        conn.close()
+        return complaint
+    
+    def get_complaints_page(self, cursor=None, limit=50, agent_id=None):
+        """Get one page of tickets in priority-then-newest order
+        
+        Uses keyset pagination: the cursor holds the sort key of the last ticket
+        of the previous page, so each page is a few index seeks (one per priority
+        level at most) regardless of how many tickets exist. Pass limit=None to
+        read every remaining ticket.
+        """
+        if cursor:
+            start_rank, last_created_at, last_id = decode_page_cursor(cursor)
+        else:
+            start_rank, last_created_at, last_id = 1, None, None
+        
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        db_cursor.row_factory = Ticket.row_factory
+        
+        tickets = []
+        for rank in range(start_rank, LAST_PRIORITY_RANK + 1):
+            conditions = [f"{PRIORITY_RANK_SQL} = ?"]
+            params = [rank]
+            
+            if agent_id is not None:
+                conditions.insert(0, "c.assigned_agent_id = ?")
+                params.insert(0, agent_id)
+            
+            # Resume after the last ticket of the previous page
+            if rank == start_rank and last_id is not None:
+                conditions.append("(c.created_at, c.id) < (?, ?)")
+                params.extend([last_created_at, last_id])
+            
+            query = f'''
+                SELECT {Ticket.COLUMNS}
+                FROM complaints c
+                JOIN users u ON c.user_id = u.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY c.created_at DESC, c.id DESC
+            '''
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit - len(tickets))
+            
+            db_cursor.execute(query, params)
+            tickets.extend(db_cursor.fetchall())
+            
+            if limit is not None and len(tickets) >= limit:
+                break
         
-        complaint = cursor.fetchone()
         conn.close()
         
-        if complaint:
-            return {
-                'id': complaint[0],
-                'ticket_id': complaint[1],
-                'user_id': complaint[2],
-                'title': complaint[3],
-                'description': complaint[4],
-                'category': complaint[5],
-                'priority': complaint[6],
-                'status': complaint[7],
-                'assigned_to': complaint[8],
-                'created_at': complaint[9],
-                'updated_at': complaint[10],
-                'resolved_at': complaint[11],
-                'resolution_notes': complaint[12],
-                'estimated_resolution_time': complaint[13],
-                'username': complaint[14],
-                'email': complaint[15],
-                'full_name': complaint[16]
-            }
-        return None
+        next_cursor = None
+        if limit is not None and tickets and len(tickets) >= limit:
+            next_cursor = encode_page_cursor(tickets[-1])
+        
+        return {
+            'tickets': tickets,
+            'next_cursor': next_cursor
+        }
     
-    def get_all_complaints_admin(self):
-        """Get all complaints for admin dashboard"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def search_tickets(self, query, filters=None, cursor=None, limit=20):
+        """Full-text search over ticket text and agent responses
+        
+        Matches every word of ``query`` (a trailing ``*`` makes the last one a
+        prefix) and ranks all matches by BM25, best first.
+        ``filters`` may narrow by status, priority, category or agent_id. Pages
+        are keyset-paginated on (score, id); snippets are only computed for the
+        tickets on the page.
+        """
+        match = ticket_search.build_match_query(query)
+        if match is None:
+            raise ValueError("Search query has no searchable words")
+        
+        conditions = ["ticket_fts MATCH ?"]
+        params = [match]
+        for name, value in (filters or {}).items():
+            if name not in SEARCH_FILTERS:
+                raise ValueError(f"Unknown search filter: {name}")
+            if value is not None and value != '':
+                conditions.append(f"{SEARCH_FILTERS[name]} = ?")
+                params.append(value)
+        
+        # Score every match inside the index and keep only the page's worth in
+        # the sort; complaints is joined while ranking only when filtering
+        ranked_sql = f'''
+            SELECT * FROM (
+                SELECT ticket_fts.rowid AS id, {ticket_search.BM25_SQL} AS score
+                FROM ticket_fts
+                {'JOIN complaints c ON c.id = ticket_fts.rowid' if len(conditions) > 1 else ''}
+                WHERE {' AND '.join(conditions)}
+            )
+        '''
+        if cursor:
+            ranked_sql += " WHERE (score, id) > (?, ?)"
+            params.extend(decode_search_cursor(cursor))
+        params.append(limit)
+        query_sql = f'''
+            SELECT {SearchHit.COLUMNS}, ranked.score
+            FROM ({ranked_sql} ORDER BY score, id LIMIT ?) ranked
+            JOIN complaints c ON c.id = ranked.id
+            ORDER BY ranked.score, ranked.id
+        '''
         
-        cursor.execute('''
-            SELECT c.*, u.username, u.email, u.full_name
-            FROM complaints c
-            JOIN users u ON c.user_id = u.id
-            ORDER BY 
-                CASE c.priority 
-                    WHEN 'Urgent' THEN 1
-                    WHEN 'High' THEN 2
-                    WHEN 'Medium' THEN 3
-                    WHEN 'Low' THEN 4
-                END,
-                c.created_at DESC
-        ''')
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        db_cursor.row_factory = SearchHit.row_factory
+        db_cursor.execute(query_sql, params)
+        hits = db_cursor.fetchall()
+        
+        if hits:
+            db_cursor.row_factory = None
+            db_cursor.execute('''
+                SELECT rowid, snippet(ticket_fts, -1, ?, ?, '…', ?)
+                FROM ticket_fts
+                WHERE ticket_fts MATCH ? AND rowid IN (SELECT value FROM json_each(?))
+            ''', (ticket_search.SNIPPET_START, ticket_search.SNIPPET_END, ticket_search.SNIPPET_TOKENS,
+                  match, json.dumps([hit.id for hit in hits])))
+            snippets = dict(db_cursor.fetchall())
+            for hit in hits:
+                hit.snippet = ticket_search.render_snippet(snippets.get(hit.id))
+        conn.close()
         
-        complaints = cursor.fetchall()
+        return {
+            'tickets': hits,
+            'next_cursor': encode_search_cursor(hits[-1]) if len(hits) >= limit else None
+        }
+    
+    @offline
+    def rebuild_search_index(self):
+        """Re-index all tickets and responses for full-text search"""
+        conn = self.get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        ticket_search.rebuild_search_index(conn.cursor())
+        conn.commit()
         conn.close()
+    
+    def get_all_complaints_admin(self, cursor=None, limit=None):
+        """Get complaints for admin dashboard (all of them unless limit is given)"""
+        return self.get_complaints_page(cursor, limit)['tickets']
+    
+    def export_complaints(self, export_type='all'):
+        """Get ticket rows for export, including archived tickets"""
+        return list(self.iter_export_rows(export_type))
+    
+    def iter_export_rows(self, export_type='all', batch_size=EXPORT_BATCH_SIZE):
+        """Yield ticket rows for export one by one, newest first, including archived tickets
         
-        return [
-            {
-                'id': row[0],
-                'ticket_id': row[1],
-                'user_id': row[2],
-                'title': row[3],
-                'description': row[4],
-                'category': row[5],
-                'priority': row[6],
-                'status': row[7],
-                'assigned_to': row[8],
-                'created_at': row[9],
-                'updated_at': row[10],
-                'resolved_at': row[11],
-                'resolution_notes': row[12],
-                'estimated_resolution_time': row[13],
-                'username': row[14],
-                'email': row[15],
-                'full_name': row[16]
-            }
-            for row in complaints
-        ]
+        The hot and archive files are each read in order through an index and
+        merged as they go, so no more than ``batch_size`` rows per file are in
+        memory whatever the size of the export. Both reads share one read
+        transaction: the export is a consistent view even while tickets change.
+        """
+        condition, order_column = EXPORT_FILTERS.get(export_type, EXPORT_FILTERS['all'])
+        order_index = EXPORT_COLUMNS.split(', ').index(order_column)
+        
+        # Only resolved tickets are archived, so active exports stay hot-only
+        sources = ['main'] if export_type == 'active' else ['main', archive.SCHEMA]
+        
+        conn = self.get_connection()
+        try:
+            streams = []
+            for schema in sources:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT {EXPORT_COLUMNS} FROM {schema}.complaints WHERE {condition} ORDER BY {order_column} DESC"
+                )
+                streams.append(fetch_in_batches(cursor, batch_size))
+            yield from heapq.merge(*streams, key=lambda row: row[order_index] or '', reverse=True)
+        finally:
+            conn.close()
     
-    def update_complaint_status(self, ticket_id, status, assigned_to=None, resolution_notes=None):
-        """Update complaint status"""
+    @invalidates_aggregates
+    @mutation
+    def update_complaint_status(self, ticket_id, status, agent_id=None, resolution_notes=None, expected_version=None):
+        """Update complaint status, reassigning it too when agent_id is given
+        
+        Returns a TicketUpdate; see _update_ticket for ``expected_version``.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
+        assignments = ["status = ?", "updated_at = ?"]
+        params = [status, current_time]
+        if agent_id is not None:
+            assignments += ["assigned_agent_id = ?", "assigned_to = (SELECT name FROM agents WHERE id = ?)"]
+            params += [agent_id, agent_id]
         if status == 'Resolved':
-            cursor.execute('''
-                UPDATE complaints 
-                SET status = ?, assigned_to = ?, resolution_notes = ?, 
-                    resolved_at = ?, updated_at = ?
-                WHERE ticket_id = ?
-            ''', (status, assigned_to, resolution_notes, current_time, current_time, ticket_id))
-        else:
-            cursor.execute('''
-                UPDATE complaints 
-                SET status = ?, assigned_to = ?, updated_at = ?
-                WHERE ticket_id = ?
-            ''', (status, assigned_to, current_time, ticket_id))
+            assignments += ["resolution_notes = ?", "resolved_at = ?"]
+            params += [resolution_notes, current_time]
         
-        conn.commit()
-        conn.close()
+        try:
+            result = self._update_ticket(cursor, ticket_id, assignments, params, expected_version, agent_id)
+            conn.commit()
+        finally:
+            conn.close()
+        return result
     
     def save_chat_history(self, user_id, session_id, message, response):
         """Save chat interaction"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Use local time instead of CURRENT_TIMESTAMP
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.save_chat_turns([(user_id, session_id, message, response, current_time)])
+    
+    def queue_chat_history(self, user_id, session_id, message, response):
+        """Queue a chat interaction to be saved with the next batch (see chat_buffer)"""
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.chat_buffer.add(user_id, session_id, message, response, current_time)
+    
+    @mutation
+    def save_chat_turns(self, turns):
+        """Save (user_id, session_id, message, response, timestamp) turns in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.executemany('''
             INSERT INTO chat_history (user_id, session_id, message, response, timestamp)
             VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, session_id, message, response, current_time))
+        ''', turns)
+        
+        # Count the sessions in each day's distinct-sessions sketch
+        sessions_by_day = {}
+        for _, session_id, _, _, timestamp in turns:
+            sessions_by_day.setdefault(timestamp[:10], set()).add(session_id)
+        daily_rollups.record_chat_sessions(cursor, sessions_by_day)
         
         conn.commit()
         conn.close()
     
     def get_chat_history(self, user_id, session_id, limit=10):
         """Get recent chat history"""
+        # Turns still in this process's write-behind buffer; taken before the
+        # query so a batch committed meanwhile is found in one place or both
+        queued = self.chat_buffer.pending(user_id, session_id) if self.chat_buffer is not None else []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT message, response, timestamp
-            FROM chat_history
-            WHERE user_id = ? AND session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (user_id, session_id, limit))
-        
-        history = cursor.fetchall()
+        # An idle session is archived whole; one resumed after that has its
+        # older turns in the archive, read when the live ones run short
+        history = []
+        for schema in ('main', archive.SCHEMA):
+            cursor.execute(f'''
+                SELECT message, response, timestamp
+                FROM {schema}.chat_history
+                WHERE user_id = ? AND session_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (user_id, session_id, limit - len(history)))
+            history += cursor.fetchall()
+            if len(history) >= limit:
+                break
         conn.close()
         
+        if queued:
+            queued = [turn[2:] for turn in reversed(queued) if turn[2:] not in history]
+            history = (queued + history)[:limit]
+        
         return [
             {
                 'message': row[0],
@@ -706,6 +1114,37 @@ class Database:
             for row in reversed(history)
         ]
     
+    def _aggregate_version(self):
+        """What cached aggregates are checked against: the ticket token, or None for a read-only copy"""
+        if self.read_only:
+            return None
+        return self.ticket_version()[0]
+    
+    def ticket_version(self):
+        """Version token of the tickets, from the latest ticket event (see events)
+        
+        Returns (token, UTC time of the change or None); the token changes whenever
+        a ticket is created or changes status, priority, category or agent.
+        """
+        conn = self.get_connection()
+        version = events.latest_event(conn.cursor(), events.TICKET)
+        conn.close()
+        return version
+    
+    def stats_version(self):
+        """Version token of get_dashboard_stats, read without computing them
+        
+        Covers ticket changes, new users, chat messages and the current day.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT MAX(id) FROM users), (SELECT MAX(id) FROM chat_history)")
+        users, chats = cursor.fetchone()
+        conn.close()
+        
+        tickets, _ = self.ticket_version()
+        return (tickets, users, chats, datetime.now().strftime('%Y-%m-%d'))
+    
     def get_dashboard_stats(self):
         """Get comprehensive statistics for admin dashboard"""
         conn = self.get_connection()
@@ -713,96 +1152,40 @@ class Database:
         
         # Get current date for local time comparisons
         today = datetime.now().strftime('%Y-%m-%d')
-        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+        week_start = (datetime.now() - timedelta(days=6)).strftime('%Y-%m-%d')
         
-        # Total complaints
-        cursor.execute("SELECT COUNT(*) FROM complaints")
-        total_complaints = cursor.fetchone()[0]
+        # Ticket totals come from the trigger-maintained counters (no table scans)
+        counters = self._ticket_counters(cursor)
+        status_stats = counters['status']
+        total_complaints = counters['total'].get('', 0)
+        resolved_complaints = status_stats.get('Resolved', 0)
+        open_complaints = sum(counters['open_priority'].values())
         
-        # Open complaints
-        cursor.execute("SELECT COUNT(*) FROM complaints WHERE status != 'Resolved'")
-        open_complaints = cursor.fetchone()[0]
-        
-        # Resolved complaints
-        cursor.execute("SELECT COUNT(*) FROM complaints WHERE status = 'Resolved'")
-        resolved_complaints = cursor.fetchone()[0]
-        
-        # Today's complaints (using local time)
-        cursor.execute("SELECT COUNT(*) FROM complaints WHERE DATE(created_at) = DATE(?)", (today,))
-        today_complaints = cursor.fetchone()[0]
-        
-        # This week's complaints (using local time)
-        cursor.execute("SELECT COUNT(*) FROM complaints WHERE created_at >= ?", (week_ago,))
-        week_complaints = cursor.fetchone()[0]
+        # Today's and this week's complaints from the daily rollups (using local time)
+        today_complaints = self._ticket_totals(cursor, today, today)['created']
+        week_complaints = self._ticket_totals(cursor, week_start, today)['created']
         
         # Priority breakdown (open tickets only)
-        cursor.execute('''
-            SELECT priority, COUNT(*) 
-            FROM complaints 
-            WHERE status != 'Resolved'
-            GROUP BY priority
-        ''')
-        priority_stats = dict(cursor.fetchall())
+        priority_stats = counters['open_priority']
         
         # Category breakdown (all tickets)
-        cursor.execute('''
-            SELECT category, COUNT(*) 
-            FROM complaints 
-            GROUP BY category
-        ''')
-        category_stats = dict(cursor.fetchall())
-        
-        # Status breakdown
-        cursor.execute('''
-            SELECT status, COUNT(*) 
-            FROM complaints 
-            GROUP BY status
-        ''')
-        status_stats = dict(cursor.fetchall())
+        category_stats = counters['category']
         
         # Recent activity (last 10 tickets)
-        cursor.execute('''
-            SELECT c.ticket_id, c.title, c.priority, c.status, c.created_at, u.full_name
-            FROM complaints c
-            JOIN users u ON c.user_id = u.id
-            ORDER BY c.created_at DESC
-            LIMIT 10
-        ''')
-        recent_tickets = [
-            {
-                'ticket_id': row[0],
-                'title': row[1],
-                'priority': row[2],
-                'status': row[3],
-                'created_at': row[4],
-                'user_name': row[5]
-            }
-            for row in cursor.fetchall()
-        ]
+        recent_tickets = self._recent_tickets(cursor, 10)
         
-        # Average resolution time
-        cursor.execute('''
-            SELECT AVG(julianday(resolved_at) - julianday(created_at)) as avg_days
-            FROM complaints 
-            WHERE resolved_at IS NOT NULL
-        ''')
-        avg_resolution_days = cursor.fetchone()[0] or 0
+        # Average resolution time (summed per day of resolution)
+        avg_resolution_days = self._ticket_totals(cursor)['avg_resolution_seconds'] / 86400
         
         # High priority urgent tickets
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM complaints 
-            WHERE priority IN ('Urgent', 'High') AND status != 'Resolved'
-        ''')
-        urgent_tickets = cursor.fetchone()[0]
+        urgent_tickets = priority_stats.get('Urgent', 0) + priority_stats.get('High', 0)
         
         # Total users
         cursor.execute("SELECT COUNT(*) FROM users WHERE is_admin = FALSE")
         total_users = cursor.fetchone()[0]
         
-        # Active chat sessions today (using local time)
-        cursor.execute("SELECT COUNT(DISTINCT session_id) FROM chat_history WHERE DATE(timestamp) = DATE(?)", (today,))
-        active_chats_today = cursor.fetchone()[0]
+        # Active chat sessions today (approximate distinct count, using local time)
+        active_chats_today = daily_rollups.get_chat_sessions(cursor, today, today)
         
         conn.close()
         
@@ -822,157 +1205,265 @@ class Database:
             'recent_tickets': recent_tickets
         }
     
-    def get_all_agents(self):
-        """Get all agents"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def _ticket_counters(self, cursor):
+        """All ticket counters as {scope: {key: count}}"""
+        return read_counters(cursor)
+    
+    def _ticket_totals(self, cursor, start_day=daily_rollups.FIRST_DAY, end_day=daily_rollups.LAST_DAY):
+        """Tickets created and resolved, and the average resolution time, over a day range"""
+        return daily_rollups.get_ticket_totals(cursor, start_day, end_day)
+    
+    def _created_by_day(self, cursor, start_day, end_day):
+        """Tickets created per day over a day range, newest day first"""
+        return daily_rollups.get_created_by_day(cursor, start_day, end_day)
+    
+    def _recent_tickets(self, cursor, limit):
+        """The newest tickets, for the dashboard's recent activity"""
         cursor.execute('''
-            SELECT id, name, email, phone, specialization, description, status, assigned_tickets
-            FROM agents
-            ORDER BY name
-        ''')
-        
-        agents = cursor.fetchall()
-        conn.close()
-        
+            SELECT c.ticket_id, c.title, c.priority, c.status, c.created_at, u.full_name
+            FROM complaints c
+            JOIN users u ON c.user_id = u.id
+            ORDER BY c.created_at DESC
+            LIMIT ?
+        ''', (limit,))
         return [
             {
-                'id': row[0],
-                'name': row[1],
-                'email': row[2],
-                'phone': row[3],
-                'specialization': row[4],
-                'description': row[5],
-                'status': row[6],
-                'assigned_tickets': row[7]
+                'ticket_id': row[0],
+                'title': row[1],
+                'priority': row[2],
+                'status': row[3],
+                'created_at': row[4],
+                'user_name': row[5]
             }
-            for row in agents
+            for row in cursor.fetchall()
         ]
     
-    def get_agent_by_id(self, agent_id):
-        """Get agent details by ID"""
+    def _status_by_created_day(self, cursor, start_day, end_day):
+        """Current status counts of the tickets created over a day range"""
+        # Range scan on the created_day index
+        cursor.execute('''
+            SELECT status, COUNT(*) FROM complaints
+            WHERE created_day BETWEEN ? AND ?
+            GROUP BY status
+        ''', (start_day, end_day))
+        return dict(cursor.fetchall())
+    
+    def get_detailed_analytics(self):
+        """Get detailed ticket analytics for the admin analytics view (cached, see aggregate_cache)"""
+        # Keyed by day: the recent activity window moves at midnight
+        today = datetime.now().strftime('%Y-%m-%d')
+        return self.aggregates.get(('detailed_analytics', today), self._detailed_analytics)
+    
+    def _detailed_analytics(self):
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT id, name, email, phone, specialization, description, status, assigned_tickets
-            FROM agents
-            WHERE id = ?
-        ''', (agent_id,))
+        counters = self._ticket_counters(cursor)
+        analytics = {}
+        
+        # Basic stats
+        total = counters['total'].get('', 0)
+        resolved = counters['status'].get('Resolved', 0)
+        analytics['basic_stats'] = {
+            'total_tickets': total,
+            'active_tickets': sum(counters['open_priority'].values()),
+            'resolved_tickets': resolved,
+            'unassigned_tickets': counters['unassigned'].get('', 0)
+        }
         
-        agent = cursor.fetchone()
+        # Priority distribution (Urgent first)
+        analytics['priority_distribution'] = dict(sorted(
+            counters['priority'].items(),
+            key=lambda item: PRIORITY_RANKS.get(item[0], LAST_PRIORITY_RANK)
+        ))
+        
+        # Category and status distribution (largest first)
+        analytics['category_distribution'] = dict(sorted(counters['category'].items(), key=lambda item: -item[1]))
+        analytics['status_distribution'] = dict(sorted(counters['status'].items(), key=lambda item: -item[1]))
+        
+        # Agent workload, counted by agent id and labelled with the current name
+        names = agent_names(cursor)
+        agent_workload = []
+        for agent, total_tickets in counters['assignee'].items():
+            active_tickets = counters['assignee_open'].get(agent, 0)
+            agent_workload.append({
+                'agent': names.get(agent, agent),
+                'total_tickets': total_tickets,
+                'active_tickets': active_tickets,
+                'resolved_tickets': total_tickets - active_tickets
+            })
+        agent_workload.sort(key=lambda row: -row['total_tickets'])
+        analytics['agent_workload'] = agent_workload
+        
+        # Recent activity (last 7 days) from the daily rollups
+        today = datetime.now().strftime('%Y-%m-%d')
+        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        analytics['recent_activity'] = self._created_by_day(cursor, week_ago, today)
+        
+        # Current status of the last 7 days' tickets
+        analytics['recent_status'] = self._status_by_created_day(cursor, week_ago, today)
+        
+        # Average resolution time in hours
+        avg_resolution_seconds = self._ticket_totals(cursor)['avg_resolution_seconds']
+        analytics['avg_resolution_time'] = round(avg_resolution_seconds / 3600, 2)
+        
+        conn.close()
+        return analytics
+    
+    @invalidates_aggregates
+    @offline
+    def rebuild_daily_rollups(self):
+        """Recompute the daily ticket and chat rollups from the source tables"""
+        conn = self.get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        daily_rollups.rebuild_rollups(
+            cursor, archive.union_sql(cursor, 'complaints'), archive.union_sql(cursor, 'chat_history')
+        )
+        conn.commit()
         conn.close()
+    
+    @invalidates_aggregates
+    @offline
+    def rebuild_ticket_counters(self):
+        """Recompute ticket_counters from the complaints table
         
-        if agent:
-            return {
-                'id': agent[0],
-                'name': agent[1],
-                'email': agent[2],
-                'phone': agent[3],
-                'specialization': agent[4],
-                'description': agent[5],
-                'status': agent[6],
-                'assigned_tickets': agent[7]
-            }
-        return None
+        Returns the (scope, key, stored, actual) buckets that had drifted.
+        """
+        conn = self.get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        drift = rebuild_counters(cursor, archive.union_sql(cursor, 'complaints'))
+        conn.commit()
+        conn.close()
+        return drift
     
-    def get_agent_by_name(self, agent_name):
-        """Get agent details by name"""
+    @invalidates_aggregates
+    @offline
+    def archive_old_records(self, ticket_age_days=archive.DEFAULT_TICKET_AGE_DAYS,
+                            chat_age_days=archive.DEFAULT_CHAT_AGE_DAYS, batch_size=archive.ARCHIVE_BATCH_SIZE):
+        """Move old resolved tickets and idle chat sessions to the archive database
+        
+        Works in transactions of ``batch_size`` tickets or sessions so the write
+        lock is never held for long. Returns (tickets moved, sessions moved).
+        """
+        resolved_before = (datetime.now() - timedelta(days=ticket_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        idle_before = (datetime.now() - timedelta(days=chat_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        if self.chat_buffer is not None:
+            self.chat_buffer.flush()
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT id, name, email, phone, specialization, description, status, assigned_tickets
-            FROM agents
-            WHERE name = ?
-        ''', (agent_name,))
+        tickets = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            # Archived tickets stay counted, and their responses leave the search
+            # index along with the ticket
+            cursor.execute("INSERT INTO suspended_triggers (mode) VALUES (?)", (ARCHIVE_MODE,))
+            moved = archive.archive_tickets(cursor, resolved_before, batch_size)
+            cursor.execute("DELETE FROM suspended_triggers WHERE mode = ?", (ARCHIVE_MODE,))
+            if moved:
+                # Ticket lists and their ETags change when tickets leave the hot file
+                events.record_ticket_change(cursor)
+            conn.commit()
+            tickets += moved
+            if moved < batch_size:
+                break
+        
+        sessions = 0
+        last_session = None
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            moved = archive.archive_chat_sessions(cursor, idle_before, batch_size, last_session)
+            conn.commit()
+            sessions += len(moved)
+            if len(moved) < batch_size:
+                break
+            last_session = moved[-1]
         
-        agent = cursor.fetchone()
         conn.close()
+        return tickets, sessions
+    
+    @offline
+    def vacuum(self):
+        """Rebuild the hot database file so pages freed by archiving are returned"""
+        conn = self.get_connection()
+        conn.execute("VACUUM main")
+        conn.close()
+    
+    @invalidates_aggregates
+    @offline
+    def reconcile_agent_workload(self):
+        """Recount agents.assigned_tickets from open tickets
         
-        if agent:
-            return {
-                'id': agent[0],
-                'name': agent[1],
-                'email': agent[2],
-                'phone': agent[3],
-                'specialization': agent[4],
-                'description': agent[5],
-                'status': agent[6],
-                'assigned_tickets': agent[7]
-            }
-        return None
+        Returns the (name, stored, actual) agents that had drifted.
+        """
+        conn = self.get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        drift = agent_workload.reconcile_workload(conn.cursor())
+        conn.commit()
+        conn.close()
+        return drift
     
-    def get_agent_tickets(self, agent_name):
-        """Get tickets assigned to a specific agent"""
+    def get_all_agents(self):
+        """Get all agents"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Agent.row_factory
         
-        cursor.execute('''
-            SELECT c.*, u.username, u.email, u.full_name
-            FROM complaints c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.assigned_to = ?
-            ORDER BY 
-                CASE c.priority 
-                    WHEN 'Urgent' THEN 1
-                    WHEN 'High' THEN 2
-                    WHEN 'Medium' THEN 3
-                    WHEN 'Low' THEN 4
-                END,
-                c.created_at DESC
-        ''', (agent_name,))
+        cursor.execute(f'''
+            SELECT {Agent.COLUMNS}
+            FROM agents
+            ORDER BY name
+        ''')
         
-        tickets = cursor.fetchall()
+        agents = cursor.fetchall()
         conn.close()
-        
-        return [
-            {
-                'id': row[0],
-                'ticket_id': row[1],
-                'user_id': row[2],
-                'title': row[3],
-                'description': row[4],
-                'category': row[5],
-                'priority': row[6],
-                'status': row[7],
-                'assigned_to': row[8],
-                'created_at': row[9],
-                'updated_at': row[10],
-                'resolved_at': row[11],
-                'resolution_notes': row[12],
-                'estimated_resolution_time': row[13],
-                'username': row[14],
-                'email': row[15],
-                'full_name': row[16]
-            }
-            for row in tickets
-        ]
+        return agents
     
-    def assign_ticket_to_agent(self, ticket_id, agent_name):
-        """Assign ticket to agent"""
+    def get_agent_by_id(self, agent_id):
+        """Get agent details by ID"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = Agent.row_factory
         
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute(f'''
+            SELECT {Agent.COLUMNS}
+            FROM agents
+            WHERE id = ?
+        ''', (agent_id,))
         
-        cursor.execute('''
-            UPDATE complaints 
-            SET assigned_to = ?, status = 'In Progress', updated_at = ?
-            WHERE ticket_id = ?
-        ''', (agent_name, current_time, ticket_id))
+        agent = cursor.fetchone()
+        conn.close()
+        return agent
+    
+    def get_agent_tickets(self, agent_id, cursor=None, limit=None):
+        """Get tickets assigned to a specific agent (all of them unless limit is given)"""
+        return self.get_complaints_page(cursor, limit, agent_id=agent_id)['tickets']
+    
+    @invalidates_aggregates
+    @mutation
+    def assign_ticket_to_agent(self, ticket_id, agent_id, expected_version=None):
+        """Assign ticket to agent and mark it In Progress, returning a TicketUpdate"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        # Update agent's assigned ticket count
-        cursor.execute('''
-            UPDATE agents 
-            SET assigned_tickets = assigned_tickets + 1
-            WHERE name = ?
-        ''', (agent_name,))
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        conn.commit()
-        conn.close()
+        try:
+            result = self._update_ticket(
+                cursor, ticket_id,
+                ["assigned_agent_id = ?", "assigned_to = (SELECT name FROM agents WHERE id = ?)",
+                 "status = 'In Progress'", "updated_at = ?"],
+                [agent_id, agent_id, current_time], expected_version, agent_id
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return result
     
+    @mutation
     def add_agent_response(self, ticket_id, agent_id, response_text, response_type='Update'):
         """Add agent response to ticket"""
         conn = self.get_connection()
@@ -988,7 +1479,7 @@ class Database:
         # Update ticket status
         cursor.execute('''
             UPDATE complaints 
-            SET updated_at = ?
+            SET updated_at = ?, row_version = row_version + 1
             WHERE ticket_id = ?
         ''', (current_time, ticket_id))
         
@@ -1000,15 +1491,19 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT ar.*, a.name, a.specialization
-            FROM agent_responses ar
-            JOIN agents a ON ar.agent_id = a.id
-            WHERE ar.ticket_id = ?
-            ORDER BY ar.created_at DESC
-        ''', (ticket_id,))
-        
-        responses = cursor.fetchall()
+        # An archived ticket's responses moved to the archive with it
+        for schema in ('main', archive.SCHEMA):
+            cursor.execute(f'''
+                SELECT ar.id, ar.ticket_id, ar.agent_id, ar.response_text, ar.response_type, ar.created_at,
+                       a.name, a.specialization
+                FROM {schema}.agent_responses ar
+                JOIN agents a ON ar.agent_id = a.id
+                WHERE ar.ticket_id = ?
+                ORDER BY ar.created_at DESC
+            ''', (ticket_id,))
+            responses = cursor.fetchall()
+            if responses:
+                break
         conn.close()
         
         return [
@@ -1025,11 +1520,523 @@ class Database:
             for row in responses
         ]
 
-# Initialize database
-db = Database()
+class ShardStore(Database):
+    """One shard file of a ShardedDatabase
+    
+    Has the full schema; users and agents are copied from the main file rather
+    than seeded.
+    """
+    
+    def __init__(self, db_path, archive_path=None, read_only=False):
+        super().__init__(db_path, archive_path, use_writer=False, read_only=read_only)
+    
+    def _create_chat_buffer(self):
+        """Chat history stays in the main file"""
+        return None
+    
+    def create_default_admin(self):
+        """Users come from the main file (see ShardedDatabase._sync_reference_data)"""
+    
+    def create_default_agents(self):
+        """Agents come from the main file (see ShardedDatabase._sync_reference_data)"""
+
+class ShardedDatabase(Database):
+    """Database with tickets partitioned across shard files (see sharding)
+    
+    Methods keep Database's signatures and results. Single-ticket reads and
+    writes go to the file holding the ticket; queries over many tickets run on
+    the main file and every shard in parallel and merge the results.
+    """
+    
+    def __init__(self, db_path="complaints.db", archive_path=None, use_writer=True, router=None, read_only=False):
+        if db_path == ':memory:':
+            raise ValueError("An in-memory database cannot be sharded")
+        self.router = router or sharding.router_from_env() or sharding.HashRouter()
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        super().__init__(db_path, archive_path, use_writer, read_only)
+        
+        for key in sorted(set(self.router.initial_keys()) | set(sharding.existing_shard_keys(self.router, db_path))):
+            self._shard(key, create=not read_only)
+    
+    def _shard(self, key, create=True):
+        """The ShardStore for ``key``, opening its file (and creating it, unless create is False)"""
+        store = self._shards.get(key)
+        if store is not None:
+            return store
+        
+        with self._lock:
+            store = self._shards.get(key)
+            if store is None:
+                path = self.router.shard_path(self.db_path, key)
+                if not create and not os.path.exists(path):
+                    return None
+                store = ShardStore(path, read_only=self.read_only)
+                if not self.read_only:
+                    self._sync_reference_data(store)
+                self._shards[key] = store
+        return store
+    
+    def close(self):
+        """Close the main file, every shard and the query pool"""
+        super().close()
+        for store in list(self._shards.values()):
+            store.close()
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def _stores(self):
+        """(key, database) for the main file and every shard"""
+        # Other processes create files for new months
+        for key in sharding.existing_shard_keys(self.router, self.db_path):
+            if key not in self._shards:
+                self._shard(key, create=not self.read_only)
+        return [(sharding.MAIN_KEY, self)] + [(key, self._shards[key]) for key in sorted(self._shards)]
+    
+    def _new_ticket_store(self, ticket_id):
+        key = self.router.shard_for(ticket_id)
+        return self._shard(key) if key is not None else self
+    
+    def _ticket_stores(self, ticket_id):
+        """Files that may hold ``ticket_id``: its routed shard first, then the others"""
+        key = self.router.shard_for(ticket_id)
+        routed = self._shard(key, create=False) if key is not None else None
+        if routed is not None:
+            yield routed
+        for _, store in self._stores():
+            if store is not routed:
+                yield store
+    
+    def _find_ticket(self, ticket_id, lookup):
+        """The first non-empty ``lookup(store)`` over the files that may hold the ticket"""
+        for store in self._ticket_stores(ticket_id):
+            result = lookup(store)
+            if result:
+                break
+        return result
+    
+    def _ticket_owner(self, ticket_id):
+        """The file holding hot ticket ``ticket_id``, or the main file if none does"""
+        for store in self._ticket_stores(ticket_id):
+            conn = store.get_connection()
+            found = conn.execute("SELECT 1 FROM complaints WHERE ticket_id = ?", (ticket_id,)).fetchone()
+            conn.close()
+            if found:
+                return store
+        # Database's methods report the missing ticket
+        return self
+    
+    def _scatter(self, function, stores=None):
+        """Run ``function(store)`` on every file (or the given (key, store) pairs) in parallel"""
+        stores = self._stores() if stores is None else stores
+        if len(stores) == 1:
+            return [function(stores[0][1])]
+        
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # Pool threads do not survive a fork: each worker starts its own
+                self._executor = ThreadPoolExecutor(sharding.MAX_PARALLEL_QUERIES, thread_name_prefix='shard-query')
+                self._executor_pid = os.getpid()
+        futures = [self._executor.submit(function, store) for _, store in stores]
+        return [future.result() for future in futures]
+    
+    def _gather(self, method, *args):
+        """Run the unsharded ``method(store, cursor, *args)`` on every file in parallel"""
+        def run(store):
+            conn = store.get_connection()
+            try:
+                return method(store, conn.cursor(), *args)
+            finally:
+                conn.close()
+        return self._scatter(run)
+    
+    def _on_every_file(self, method, *args):
+        return self._scatter(lambda store: method(store, *args))
+    
+    def _sync_reference_data(self, store):
+        """Copy users the shard has not seen yet, and every agent, from the main file"""
+        shard_conn = store.get_connection()
+        last_user_id = shard_conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE id > ?", (last_user_id,))
+        user_columns = [column[0] for column in cursor.description]
+        users = cursor.fetchall()
+        cursor.execute("SELECT * FROM agents")
+        agent_columns = [column[0] for column in cursor.description]
+        agents = cursor.fetchall()
+        conn.close()
+        
+        # Each shard counts its own open tickets in assigned_tickets
+        keep = [index for index, column in enumerate(agent_columns) if column != 'assigned_tickets']
+        agent_columns = [agent_columns[index] for index in keep]
+        agents = [[agent[index] for index in keep] for agent in agents]
+        updates = ', '.join(f"{column} = excluded.{column}" for column in agent_columns if column != 'id')
+        
+        try:
+            shard_conn.executemany(
+                f"INSERT INTO users ({', '.join(user_columns)}) VALUES ({', '.join('?' * len(user_columns))})", users
+            )
+            shard_conn.executemany(f'''
+                INSERT INTO agents ({', '.join(agent_columns)}) VALUES ({', '.join('?' * len(agent_columns))})
+                ON CONFLICT(id) DO UPDATE SET {updates}
+            ''', agents)
+            shard_conn.commit()
+        finally:
+            shard_conn.close()
+    
+    def snapshot_files(self):
+        """The main database files and every shard's"""
+        return super().snapshot_files() + [
+            path for _, store in self._stores()[1:] for path in store.snapshot_files()
+        ]
+    
+    def event_files(self):
+        """The main database file and every shard, each recording its own tickets' events"""
+        return [store.db_path for _, store in self._stores()]
+    
+    def open_snapshot(self, snapshot=None):
+        """A read-only ShardedDatabase over a snapshot (the newest unless given), or None when there is none"""
+        snapshot = snapshot or snapshots.latest_snapshot(snapshots.default_snapshot_dir(self.db_path))
+        if snapshot is None:
+            return None
+        return ShardedDatabase(os.path.join(snapshot, os.path.basename(self.db_path)),
+                               os.path.join(snapshot, os.path.basename(self.archive_path)),
+                               use_writer=False, router=self.router, read_only=True)
+    
+    @invalidates_aggregates
+    def recreate_database(self):
+        """Recreate the main file and every shard with fresh schema"""
+        super().recreate_database()
+        for _, store in self._stores()[1:]:
+            store._remove_files()
+            store.init_db()
+            self._sync_reference_data(store)
+    
+    @mutation
+    def create_user(self, username, email, password, full_name, phone=None):
+        """Create a new user and copy it to every shard"""
+        user_id = super().create_user(username, email, password, full_name, phone)
+        if user_id is not None:
+            for _, store in self._stores()[1:]:
+                self._sync_reference_data(store)
+        return user_id
+    
+    def _insert_complaint(self, ticket_id, user_id, title, description, category, priority, agent_id):
+        store = self._new_ticket_store(ticket_id)
+        args = (ticket_id, user_id, title, description, category, priority, agent_id)
+        try:
+            return Database._insert_complaint(store, *args)
+        except sqlite3.IntegrityError:
+            if store is self:
+                raise
+            # The user may have been created after this process last synced the shard
+            self._sync_reference_data(store)
+            return Database._insert_complaint(store, *args)
+    
+    @invalidates_aggregates
+    @offline
+    def create_complaints_bulk(self, tickets, auto_assign=True, chunk_size=BULK_CHUNK_SIZE):
+        """Insert many tickets into their shards, returning the number created
+        
+        Each chunk is split by shard and the parts are written in parallel.
+        Agents are picked against open tickets in every file. A chunk that fails
+        validation is rolled back in the shard that rejected it; its other
+        shards and earlier chunks stay committed.
+        """
+        for _, store in self._stores()[1:]:
+            self._sync_reference_data(store)
+        
+        created = 0
+        chunk = []
+        for ticket in tickets:
+            chunk.append(ticket)
+            if len(chunk) >= chunk_size:
+                created += self._insert_sharded_chunk(chunk, auto_assign, chunk_size)
+                chunk = []
+        if chunk:
+            created += self._insert_sharded_chunk(chunk, auto_assign, chunk_size)
+        return created
+    
+    def _insert_sharded_chunk(self, chunk, auto_assign, chunk_size):
+        conn = self.get_connection()
+        _, _, workloads = self._load_agent_workloads(conn.cursor())
+        conn.close()
+        
+        parts = {}
+        for ticket in chunk:
+            ticket = dict(ticket)
+            ticket['ticket_id'] = ticket.get('ticket_id') or self.generate_ticket_id()
+            unassigned = not ticket.get('assigned_agent_id') and not ticket.get('assigned_to')
+            if (auto_assign and unassigned and (ticket.get('status') or 'Registered') != 'Resolved'
+                    and ticket.get('category') and ticket.get('priority')):
+                ticket['assigned_agent_id'] = self._pick_agent(workloads, ticket['category'], ticket['priority'])
+            parts.setdefault(self._new_ticket_store(ticket['ticket_id']), []).append(ticket)
+        
+        created = self._scatter(
+            lambda store: Database.create_complaints_bulk(store, parts[store], auto_assign, chunk_size),
+            [(None, store) for store in parts]
+        )
+        return sum(created)
+    
+    def _open_tickets_by_agent(self):
+        """Open tickets per agent id summed over every file"""
+        def counts(store):
+            conn = store.get_connection()
+            rows = conn.execute("SELECT id, assigned_tickets FROM agents").fetchall()
+            conn.close()
+            return rows
+        
+        totals = {}
+        for rows in self._scatter(counts):
+            for agent_id, assigned_tickets in rows:
+                totals[agent_id] = totals.get(agent_id, 0) + assigned_tickets
+        return totals
+    
+    def _load_agent_workloads(self, cursor):
+        agent_names, agent_ids, workloads = super()._load_agent_workloads(cursor)
+        totals = self._open_tickets_by_agent()
+        for agents in workloads.values():
+            for agent in agents:
+                agent[0] = totals.get(agent[2], 0)
+        return agent_names, agent_ids, workloads
+    
+    def get_best_agent_for_category(self, category, priority):
+        """Get the id of the best available agent, counting open tickets in every file"""
+        conn = self.get_connection()
+        _, _, workloads = self._load_agent_workloads(conn.cursor())
+        conn.close()
+        return self._pick_agent(workloads, category, priority)
+    
+    def get_all_agents(self):
+        """Get all agents, with open tickets counted in every file"""
+        agents = super().get_all_agents()
+        totals = self._open_tickets_by_agent()
+        for agent in agents:
+            agent.assigned_tickets = totals.get(agent.id, 0)
+        return agents
+    
+    def get_agent_by_id(self, agent_id):
+        """Get agent details by ID, with open tickets counted in every file"""
+        agent = super().get_agent_by_id(agent_id)
+        if agent is not None:
+            agent.assigned_tickets = self._open_tickets_by_agent().get(agent.id, 0)
+        return agent
+    
+    def _active_agent_loads(self, cursor):
+        agents = [agent for agent in self.get_all_agents() if agent.status == 'Active']
+        agents.sort(key=lambda agent: (agent.specialization, agent.assigned_tickets))
+        return [(agent.specialization, agent.id, agent.name, agent.assigned_tickets) for agent in agents]
+    
+    def get_complaint_by_ticket_id(self, ticket_id):
+        """Get complaint details by ticket ID from the file holding it"""
+        return self._find_ticket(ticket_id, lambda store: Database.get_complaint_by_ticket_id(store, ticket_id))
+    
+    def get_ticket_responses(self, ticket_id):
+        """Get all responses for a ticket from the file holding it"""
+        return self._find_ticket(ticket_id, lambda store: Database.get_ticket_responses(store, ticket_id))
+    
+    def get_user_complaints(self, user_id):
+        """Get all complaints for a user from every file"""
+        complaints = [
+            complaint for part in self._on_every_file(Database.get_user_complaints, user_id) for complaint in part
+        ]
+        complaints.sort(key=lambda complaint: complaint['created_at'], reverse=True)
+        return complaints
+    
+    def ticket_version(self):
+        """The latest ticket event of every file"""
+        versions = self._on_every_file(Database.ticket_version)
+        return tuple(token for token, _ in versions), max((changed for _, changed in versions if changed), default=None)
+    
+    def get_unassigned_tickets(self):
+        """Get all unassigned tickets from every file"""
+        tickets = [ticket for part in self._on_every_file(Database.get_unassigned_tickets) for ticket in part]
+        tickets.sort(key=lambda ticket: (PRIORITY_RANKS.get(ticket.priority, LAST_PRIORITY_RANK), ticket.created_at))
+        return tickets
+    
+    def iter_export_rows(self, export_type='all', batch_size=EXPORT_BATCH_SIZE):
+        """Yield ticket rows for export from every file, merging the per-file streams in order"""
+        _, order_column = EXPORT_FILTERS.get(export_type, EXPORT_FILTERS['all'])
+        order_index = EXPORT_COLUMNS.split(', ').index(order_column)
+        streams = [Database.iter_export_rows(store, export_type, batch_size) for _, store in self._stores()]
+        yield from heapq.merge(*streams, key=lambda row: row[order_index] or '', reverse=True)
+    
+    def _merged_page(self, read_page, cursor, limit, sort_key, encode):
+        """Read a page from every file that is not exhausted and merge them (see sharding.merge_pages)"""
+        positions = sharding.decode_cursor(cursor) if cursor else {}
+        stores = [(key, store) for key, store in self._stores() if positions.get(key, '') is not None]
+        file_cursors = {store: positions.get(key) or None for key, store in stores}
+        
+        pages = self._scatter(lambda store: read_page(store, file_cursors[store]), stores)
+        tickets, next_cursor = sharding.merge_pages(
+            {key: page for (key, _), page in zip(stores, pages)}, positions, limit, sort_key, encode
+        )
+        return {
+            'tickets': tickets,
+            'next_cursor': next_cursor
+        }
+    
+    def get_complaints_page(self, cursor=None, limit=50, agent_id=None):
+        """Get one page of tickets in priority-then-newest order, merged from every file
+        
+        The cursor holds a keyset position per file (see get_complaints_page in Database).
+        """
+        return self._merged_page(
+            lambda store, file_cursor: Database.get_complaints_page(store, file_cursor, limit, agent_id),
+            cursor, limit,
+            lambda ticket: (PRIORITY_RANKS.get(ticket['priority'], LAST_PRIORITY_RANK),
+                            sharding.Descending(ticket['created_at']), sharding.Descending(ticket['id'])),
+            encode_page_cursor
+        )
+    
+    def search_tickets(self, query, filters=None, cursor=None, limit=20):
+        """Full-text search over every file, best matches first
+        
+        Each file ranks its own matches by BM25 (see search_tickets in Database).
+        """
+        return self._merged_page(
+            lambda store, file_cursor: Database.search_tickets(store, query, filters, file_cursor, limit),
+            cursor, limit, lambda hit: (hit.score, hit.id), encode_search_cursor
+        )
+    
+    @invalidates_aggregates
+    @mutation
+    def update_complaint_status(self, ticket_id, status, agent_id=None, resolution_notes=None, expected_version=None):
+        """Update complaint status in the file holding the ticket"""
+        return Database.update_complaint_status(
+            self._ticket_owner(ticket_id), ticket_id, status, agent_id, resolution_notes, expected_version
+        )
+    
+    @invalidates_aggregates
+    @mutation
+    def reassign_ticket(self, ticket_id, agent_id, admin_id, reason="Manual reassignment", expected_version=None):
+        """Reassign a ticket in the file holding it (the admin action is logged there too)"""
+        return Database.reassign_ticket(
+            self._ticket_owner(ticket_id), ticket_id, agent_id, admin_id, reason, expected_version
+        )
+    
+    @invalidates_aggregates
+    @mutation
+    def assign_ticket_to_agent(self, ticket_id, agent_id, expected_version=None):
+        """Assign ticket to agent in the file holding it"""
+        return Database.assign_ticket_to_agent(self._ticket_owner(ticket_id), ticket_id, agent_id, expected_version)
+    
+    @mutation
+    def add_agent_response(self, ticket_id, agent_id, response_text, response_type='Update'):
+        """Add agent response in the file holding the ticket"""
+        return Database.add_agent_response(
+            self._ticket_owner(ticket_id), ticket_id, agent_id, response_text, response_type
+        )
+    
+    def _ticket_counters(self, cursor):
+        counters = {}
+        for part in self._gather(Database._ticket_counters):
+            for scope, counts in part.items():
+                merged = counters.setdefault(scope, {})
+                for key, count in counts.items():
+                    merged[key] = merged.get(key, 0) + count
+        return counters
+    
+    def _ticket_totals(self, cursor, start_day=daily_rollups.FIRST_DAY, end_day=daily_rollups.LAST_DAY):
+        parts = self._gather(Database._ticket_totals, start_day, end_day)
+        resolved = sum(part['resolved'] for part in parts)
+        resolution_seconds = sum(part['avg_resolution_seconds'] * part['resolved'] for part in parts)
+        return {
+            'created': sum(part['created'] for part in parts),
+            'resolved': resolved,
+            'avg_resolution_seconds': resolution_seconds / resolved if resolved else 0
+        }
+    
+    def _created_by_day(self, cursor, start_day, end_day):
+        created = {}
+        for part in self._gather(Database._created_by_day, start_day, end_day):
+            for day, count in part.items():
+                created[day] = created.get(day, 0) + count
+        return dict(sorted(created.items(), reverse=True))
+    
+    def _recent_tickets(self, cursor, limit):
+        tickets = [ticket for part in self._gather(Database._recent_tickets, limit) for ticket in part]
+        tickets.sort(key=lambda ticket: ticket['created_at'], reverse=True)
+        return tickets[:limit]
+    
+    def _status_by_created_day(self, cursor, start_day, end_day):
+        statuses = {}
+        for part in self._gather(Database._status_by_created_day, start_day, end_day):
+            for status, count in part.items():
+                statuses[status] = statuses.get(status, 0) + count
+        return statuses
+    
+    @offline
+    def rebuild_search_index(self):
+        """Re-index all tickets and responses in every file"""
+        self._on_every_file(Database.rebuild_search_index)
+    
+    @invalidates_aggregates
+    @offline
+    def rebuild_daily_rollups(self):
+        """Recompute the daily rollups of every file"""
+        self._on_every_file(Database.rebuild_daily_rollups)
+    
+    @invalidates_aggregates
+    @offline
+    def rebuild_ticket_counters(self):
+        """Recompute the ticket counters of every file, returning the drifted buckets"""
+        return [bucket for drift in self._on_every_file(Database.rebuild_ticket_counters) for bucket in drift]
+    
+    @invalidates_aggregates
+    @offline
+    def archive_old_records(self, ticket_age_days=archive.DEFAULT_TICKET_AGE_DAYS,
+                            chat_age_days=archive.DEFAULT_CHAT_AGE_DAYS, batch_size=archive.ARCHIVE_BATCH_SIZE):
+        """Archive old records of every file into its own archive, returning (tickets, sessions) moved"""
+        moved = self._on_every_file(Database.archive_old_records, ticket_age_days, chat_age_days, batch_size)
+        return sum(tickets for tickets, _ in moved), sum(sessions for _, sessions in moved)
+    
+    @offline
+    def vacuum(self):
+        """Rebuild every hot database file"""
+        self._on_every_file(Database.vacuum)
+    
+    @invalidates_aggregates
+    @offline
+    def reconcile_agent_workload(self):
+        """Recount agents.assigned_tickets in every file, returning the drifted agents"""
+        return [agent for drift in self._on_every_file(Database.reconcile_agent_workload) for agent in drift]
+
+def open_database(db_path="complaints.db", archive_path=None, use_writer=True):
+    """Open ``db_path`` as a Database, or a ShardedDatabase when DB_SHARD_BY or DB_SHARDS is set"""
+    router = sharding.router_from_env()
+    if router is None:
+        return Database(db_path, archive_path, use_writer)
+    return ShardedDatabase(db_path, archive_path, use_writer, router)
+
+# The app's database, opened on first use: importing this module (as manage.py
+# and the other scripts do for their own --db) touches no file
+_db = None
+_db_lock = threading.Lock()
+
+def get_db():
+    """The process-wide Database for complaints.db, opened and migrated on first use"""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = open_database()
+        return _db
+
+def __getattr__(name):
+    # ``from database import db`` keeps working, opening the database at that point
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def reinitialize_global_db():
     """Reinitialize the global database instance"""
-    global db
-    db = Database()
-    return db
+    global _db
+    with _db_lock:
+        _db = open_database()
+        return _db
@@ -0,0 +1,313 @@
+"""
+Optional single-writer mode for the complaint database
+
+SQLite allows one writer at a time per file. With several gunicorn workers each
+committing its own tickets, notifications and chat turns, bursts of writes
+queue on the file lock and, past ``busy_timeout``, fail with "database is
+locked". In writer mode one process owns every write: ``Database`` and
+``NotificationSystem`` methods marked ``@mutation`` send the call over a local
+Unix socket to the writer and wait for its result, while reads stay in the
+worker.
+
+The writer applies requests in groups: whatever has queued up while the
+previous group was committing runs in one ``BEGIN IMMEDIATE`` transaction, each
+request inside its own savepoint, followed by one commit (group commit). A
+request that raises is rolled back to its savepoint and its exception is
+returned to the caller, without affecting the rest of the group.
+
+Writer mode is enabled by setting ``DB_WRITER_SOCKET`` to the socket path; the
+writer is started by gunicorn's ``on_starting`` hook or with
+``python manage.py writer``. Calls fall back to writing directly if the writer
+is not reachable, fails authentication, or serves a different database file.
+
+Requests and replies are pickles, so both ends authenticate each other with
+``DB_WRITER_KEY`` (or ``SECRET_KEY``) before anything is unpickled, and the
+socket lives in a directory only this user can write to (by default
+``default_socket``, next to the database), bound under ``umask(0o077)``.
+
+Maintenance marked ``@offline`` (bulk imports, archiving, rebuilds) commits in
+transactions of its own, which a group cannot hold, so it is not routed: it
+runs from manage.py with the writer stopped and refuses to start while the
+writer serves its database.
+"""
+
+import functools
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+from connection_manager import GroupTransaction
+
+WRITER_SOCKET_ENV = 'DB_WRITER_SOCKET'
+WRITER_KEY_ENV = 'DB_WRITER_KEY'
+MAX_GROUP_SIZE = 256        # requests committed together at most
+
+REQUEST_SAVEPOINT = 'writer_request'
+
+# Returned by WriterClient.call when the caller should write directly
+LOCAL = object()
+
+
+def default_socket(db_path):
+    """complaints.db -> .complaints-writer/writer.sock, a private directory next to the database"""
+    root = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), f".{root}-writer", 'writer.sock')
+
+
+def writer_authkey():
+    """The shared secret workers and the writer authenticate with, or None when none is set"""
+    key = os.getenv(WRITER_KEY_ENV) or os.getenv('SECRET_KEY')
+    return key.encode() if key else None
+
+
+def mutation(method):
+    """Route calls to this method through the writer process, when one is configured
+
+    The instance needs ``writer`` (a WriterClient or None), ``db_path`` and a
+    ``WRITER_TARGET`` name the writer serves it under.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.writer is not None:
+            result = self.writer.call(self.db_path, self.WRITER_TARGET, method.__name__, args, kwargs)
+            if result is not LOCAL:
+                return result
+        return method(self, *args, **kwargs)
+
+    wrapper.writer_mutation = True
+    return wrapper
+
+
+class WriterRunning(RuntimeError):
+    """Raised by @offline methods while the writer serves their database"""
+
+
+def offline(method):
+    """Refuse to run this method while the writer serves the instance's database
+
+    For maintenance that takes the write lock in transactions of its own; run
+    it with the writer stopped.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.writer is not None and self.writer.serves(self.db_path):
+            raise WriterRunning(f"Stop the database writer at {self.writer.address} before {method.__name__}")
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class WriterClient:
+    """Per-thread connections from one process to the writer"""
+
+    def __init__(self, address, authkey=None):
+        """``authkey`` defaults to writer_authkey()"""
+        self.address = address
+        self.authkey = authkey
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._warned = False
+
+    def _connect(self):
+        if os.getpid() != self._pid:
+            self._reset()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            authkey = self.authkey or writer_authkey()
+            try:
+                if authkey is None:
+                    raise AuthenticationError(f"no ${WRITER_KEY_ENV} or $SECRET_KEY set")
+                # Authenticates the writer too: a socket bound by anyone else is not used
+                conn = Client(self.address, family='AF_UNIX', authkey=authkey)
+                served_path = conn.recv()
+            except (OSError, EOFError, AuthenticationError) as e:
+                if not self._warned:
+                    print(f"⚠️  Database writer at {self.address} unavailable ({e}), writing directly")
+                    self._warned = True
+                return None, None
+            self._local.conn = conn
+            self._local.served_path = served_path
+        return conn, self._local.served_path
+
+    def serves(self, db_path):
+        """Whether the writer is running and serves ``db_path``"""
+        conn, served_path = self._connect()
+        return conn is not None and served_path == os.path.abspath(db_path)
+
+    def call(self, db_path, target, name, args, kwargs):
+        """Run ``target.name(*args, **kwargs)`` in the writer and return its result
+
+        Returns LOCAL, having sent nothing, when the writer is unreachable or
+        serves another database file. Exceptions raised by the call are
+        re-raised here.
+        """
+        conn, served_path = self._connect()
+        if conn is None or served_path != os.path.abspath(db_path):
+            return LOCAL
+
+        try:
+            conn.send((target, name, args, kwargs))
+            ok, value = conn.recv()
+        except (OSError, EOFError):
+            # The request may or may not have been applied: never retry it
+            self._local.conn = None
+            conn.close()
+            raise ConnectionError(f"Lost connection to the database writer during {target}.{name}")
+        if not ok:
+            raise value
+        return value
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_from_env():
+    """The process-wide WriterClient for DB_WRITER_SOCKET, or None when writer mode is off"""
+    address = os.getenv(WRITER_SOCKET_ENV)
+    if not address:
+        return None
+    with _clients_lock:
+        client = _clients.get(address)
+        if client is None:
+            client = _clients[address] = WriterClient(address)
+        return client
+
+
+class WriterServer:
+    def __init__(self, address, db_path, targets, max_group_size=MAX_GROUP_SIZE, authkey=None):
+        """``targets`` maps WRITER_TARGET names to instances created with use_writer=False
+
+        ``authkey`` defaults to writer_authkey().
+        """
+        self.address = address
+        self.db_path = os.path.abspath(db_path)
+        self.targets = targets
+        self.authkey = authkey
+        self.max_group_size = max_group_size
+        self._requests = queue.Queue()
+        self._listener = None
+        self.groups = 0         # transactions committed
+        self.requests = 0       # requests applied in them
+
+    def serve_forever(self):
+        """Accept worker connections and apply their writes until the process ends"""
+        self.authkey = self.authkey or writer_authkey()
+        if self.authkey is None:
+            raise RuntimeError(f"Set ${WRITER_KEY_ENV} or $SECRET_KEY: requests are pickles and must be authenticated")
+
+        # Nobody else may bind, replace or remove the socket
+        directory = os.path.dirname(os.path.abspath(self.address))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        status = os.stat(directory)
+        if status.st_uid != os.getuid() or status.st_mode & 0o022:
+            raise PermissionError(f"{directory} must belong to this user and not be writable by others")
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        # Only this user may connect, from the moment the socket exists
+        umask = os.umask(0o077)
+        try:
+            self._listener = Listener(self.address, family='AF_UNIX')
+        finally:
+            os.umask(umask)
+
+        threading.Thread(target=self._write_loop, name='db-writer', daemon=True).start()
+        print(f"✅ Database writer for {self.db_path} listening on {self.address}")
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._read_requests, args=(conn,), daemon=True).start()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+
+    def _read_requests(self, conn):
+        # Authenticated here rather than in accept(), so a slow or wrong client
+        # never holds up the others
+        try:
+            deliver_challenge(conn, self.authkey)
+            answer_challenge(conn, self.authkey)
+            conn.send(self.db_path)
+            while True:
+                self._requests.put((conn, conn.recv()))
+        except (OSError, EOFError, AuthenticationError):
+            conn.close()
+
+    def _write_loop(self):
+        # Everything that queued up while the last group committed forms the next one
+        while True:
+            group = [self._requests.get()]
+            while len(group) < self.max_group_size:
+                try:
+                    group.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            replies = self.run_group([request for _, request in group])
+            for (conn, _), reply in zip(group, replies):
+                try:
+                    conn.send(reply)
+                except (OSError, EOFError):
+                    pass  # the worker went away; its read thread cleans up
+                except Exception as e:
+                    conn.send((False, RuntimeError(f"Unpicklable result: {e}")))
+
+    def _dispatch(self, target, name, args, kwargs):
+        method = getattr(self.targets.get(target), name, None)
+        if not getattr(method, 'writer_mutation', False):
+            raise ValueError(f"{target}.{name} is not a database mutation")
+        return method(*args, **kwargs)
+
+    def run_group(self, requests):
+        """Apply (target, name, args, kwargs) requests in one transaction
+
+        The transaction spans every file the requests write, shards included
+        (see connection_manager.GroupTransaction). Returns an (ok, result or
+        exception) reply per request.
+        """
+        replies = []
+        with GroupTransaction(REQUEST_SAVEPOINT) as group:
+            try:
+                # The main file joins first, so its write lock is taken before any shard's
+                next(iter(self.targets.values())).connections.get_connection().close()
+                for request in requests:
+                    group.begin_request()
+                    try:
+                        replies.append((True, self._dispatch(*request)))
+                    except Exception as e:
+                        group.rollback_request()
+                        replies.append((False, e))
+                    group.end_request()
+                group.commit()
+                self.groups += 1
+                self.requests += len(requests)
+            except Exception as e:
+                # Nothing in the group was committed
+                return [(False, e)] * len(requests)
+        return replies
+
+
+def run_writer(db_path, address, archive_path=None):
+    """Serve writes for ``db_path`` on ``address`` (blocks; run in its own process)"""
+    from database import Database, open_database
+    from notifications import NotificationSystem
+
+    database = open_database(db_path, archive_path, use_writer=False)
+    targets = {
+        Database.WRITER_TARGET: database,
+        NotificationSystem.WRITER_TARGET: NotificationSystem(db_path, use_writer=False),
+    }
+    server = WriterServer(address, db_path, targets)
+    try:
+        server.serve_forever()
+    finally:
+        database.chat_buffer.close()
+        server.close()
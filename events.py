@@ -0,0 +1,319 @@
+"""
+Server-sent events for notifications and live dashboard statistics
+
+Dashboards used to poll the notification and stats endpoints every few seconds
+from every open tab. Instead, triggers append a row to ``events`` whenever a
+notification is created, read or deleted, and whenever a ticket is created or
+changes status, priority, category or agent, in the same transaction as the
+change. Each worker process runs one ``EventHub`` thread while it has
+subscribers: it asks SQLite for ``PRAGMA data_version`` on its own connection
+to every database file, which changes only when another connection (in any
+process, including the db_writer) has committed, and reads the new event rows
+only then. Notification events push the user's unread count to their streams;
+ticket events push freshly computed dashboard stats to admin streams, once per
+batch of changes however many tabs are open.
+
+``/api/events`` holds one text/event-stream response per tab, which needs
+gunicorn's threaded workers (see gunicorn.conf.py). Each open stream holds one
+of the worker's threads, so a worker serves at most ``max_streams`` at once
+(half its threads by default, MAX_EVENT_STREAMS) and turns further tabs away
+with a 503; their pages poll instead, and the rest of the threads stay free
+for ordinary requests. Served through asgi.py, streams wait on the event loop
+(``stream_async``) and hold no thread, so they are not limited. Streams end after STREAM_LIFETIME seconds and the
+browser reconnects on its own; every new stream starts with the current
+state, so nothing is lost in between. Workers with no open stream run no hub
+thread and make no queries.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from blocking_pool import WORKER_THREADS_ENV, DEFAULT_POOL_THREADS
+
+POLL_INTERVAL = 0.5         # seconds between data_version checks in a worker with subscribers
+HEARTBEAT_INTERVAL = 15     # seconds between keep-alive comments on an idle stream
+STREAM_LIFETIME = 300       # seconds before a stream ends and the browser reconnects
+RECONNECT_DELAY_MS = 3000   # sent as the stream's retry interval
+FULL_RETRY_MS = 60000       # retry interval sent with a 503 when a worker's streams are full
+SUBSCRIBER_BACKLOG = 100    # undelivered messages kept per stream
+MAX_STREAMS_ENV = 'MAX_EVENT_STREAMS'
+
+NOTIFICATION = 'notification'
+TICKET = 'ticket'
+
+
+def stream_limit():
+    """Streams a worker serves at once: MAX_EVENT_STREAMS, else half of GUNICORN_THREADS"""
+    threads = int(os.getenv(WORKER_THREADS_ENV) or DEFAULT_POOL_THREADS)
+    return int(os.getenv(MAX_STREAMS_ENV) or max(threads // 2, 1))
+
+
+class StreamsFull(RuntimeError):
+    """Raised by EventHub.subscribe when the process already serves max_streams streams"""
+
+
+def record_ticket_change(cursor):
+    """Record one ticket event for a change no trigger sees, such as archiving tickets"""
+    cursor.execute(f"INSERT INTO events (kind, user_id, subject) VALUES ('{TICKET}', NULL, NULL)")
+
+
+def add_inserted_events(cursor, first_id):
+    """Record one ticket event for the complaints with id >= first_id
+
+    The bulk-load counterpart of the insert trigger, run once per chunk: a
+    single event is enough to refresh the stats.
+    """
+    cursor.execute(f'''
+        INSERT INTO events (kind, user_id, subject)
+        SELECT '{TICKET}', NULL, NULL WHERE EXISTS (SELECT 1 FROM complaints WHERE id >= ?)
+    ''', (first_id,))
+
+
+def latest_event(cursor, kind, user_id=None):
+    """(id, created_at) of the newest event of ``kind``, for ``user_id`` if given, or (0, None)
+
+    A cheap version token for data the kind covers: ticket events are found by
+    walking back from the newest row, a user's by idx_events_user_kind.
+    """
+    if user_id is None:
+        cursor.execute("SELECT id, created_at FROM events WHERE kind = ? ORDER BY id DESC LIMIT 1", (kind,))
+    else:
+        cursor.execute(
+            "SELECT id, created_at FROM events WHERE user_id = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+            (user_id, kind)
+        )
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+
+def format_event(name, data, dumps=json.dumps):
+    """One message of a text/event-stream"""
+    return f"event: {name}\ndata: {dumps(data)}\n\n"
+
+
+class Subscription:
+    """One open event stream, read by the request thread serving it"""
+
+    holds_thread = True
+
+    def __init__(self, user_id, is_admin):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.messages = queue.Queue(SUBSCRIBER_BACKLOG)
+
+    def put(self, name, data):
+        try:
+            self.messages.put_nowait((name, data))
+        except queue.Full:
+            pass  # a stalled client; it gets the current state when it reconnects
+
+
+class AsyncSubscription(Subscription):
+    """One open event stream served on an event loop (see asgi), which no thread waits on"""
+
+    holds_thread = False
+
+    def __init__(self, user_id, is_admin, loop):
+        super().__init__(user_id, is_admin)
+        self.loop = loop
+        self.messages = asyncio.Queue(SUBSCRIBER_BACKLOG)
+
+    def put(self, name, data):
+        try:
+            self.loop.call_soon_threadsafe(self._put, (name, data))
+        except RuntimeError:
+            pass  # the loop is closed: the stream is gone
+
+    def _put(self, message):
+        try:
+            self.messages.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+
+class _Source:
+    """The hub's connection to one database file and its position in the events"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA query_only = ON")
+        self.version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def read_new_events(self):
+        """Events committed since the last read, or [] without touching the tables if nothing was committed"""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version:
+            return []
+        self.version = version
+        rows = self.conn.execute(
+            "SELECT id, kind, user_id FROM events WHERE id > ? ORDER BY id", (self.last_id,)
+        ).fetchall()
+        if rows:
+            self.last_id = rows[-1][0]
+        return rows
+
+
+class EventHub:
+    """Per-process fan-out of database events to open streams
+
+    ``files`` returns the database files to watch, ``unread_count(user_id)``
+    and ``stats()`` build the pushed state. At most ``max_streams``
+    subscriptions that hold a request thread are open at once (None for no
+    limit); ones served on an event loop are not counted. With
+    ``background=False`` no thread is started and ``poll`` must be called
+    directly.
+    """
+
+    def __init__(self, files, unread_count, stats, poll_interval=POLL_INTERVAL, background=True, max_streams=None):
+        self.files = files
+        self.unread_count = unread_count
+        self.stats = stats
+        self.poll_interval = poll_interval
+        self.background = background
+        self.max_streams = max_streams
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()           # guards _subscribers and _thread
+        self._poll_lock = threading.Lock()      # guards _sources
+        self._subscribers = set()
+        self._sources = {}
+        self._thread = None
+
+    def _watch_files(self):
+        """Open a source for every file not watched yet; only events committed from now on are pushed"""
+        for path in self.files():
+            if path not in self._sources:
+                self._sources[path] = _Source(path)
+
+    def _close_sources(self):
+        for source in self._sources.values():
+            source.conn.close()
+        self._sources = {}
+
+    def subscribe(self, user_id, is_admin=False, loop=None):
+        """Open a stream for a user; its first messages are the current state
+
+        With ``loop``, messages are handed to that event loop for
+        ``stream_async``. Raises StreamsFull when max_streams streams already
+        hold a thread.
+        """
+        if os.getpid() != self._pid:
+            # Forked from the preloading gunicorn master: no thread came along
+            self._reset()
+
+        subscription = AsyncSubscription(user_id, is_admin, loop) if loop else Subscription(user_id, is_admin)
+        with self._lock:
+            if subscription.holds_thread and self.max_streams is not None:
+                open_streams = sum(other.holds_thread for other in self._subscribers)
+                if open_streams >= self.max_streams:
+                    raise StreamsFull(f"{open_streams} event streams already open")
+            self._subscribers.add(subscription)
+        try:
+            # Watch before reading the state, so no change falls in between
+            with self._poll_lock:
+                self._watch_files()
+            subscription.put('notifications', {'unread_count': self.unread_count(user_id)})
+            if is_admin:
+                subscription.put('stats', self.stats())
+        except Exception:
+            self.unsubscribe(subscription)
+            raise
+
+        with self._lock:
+            if self.background and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    # Idle: stop polling until the next stream opens
+                    self._thread = None
+                    with self._poll_lock:
+                        self._close_sources()
+                    return
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                print(f"⚠️  Event hub poll failed: {e}")
+
+    def poll(self):
+        """Push state for the events committed since the last poll, returning how many were read"""
+        rows = []
+        with self._poll_lock:
+            # Files created since the last poll (a new month's shard) start being watched
+            self._watch_files()
+            for source in self._sources.values():
+                rows.extend(source.read_new_events())
+        if rows:
+            self._dispatch(rows)
+        return len(rows)
+
+    def _dispatch(self, rows):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        users = {user_id for _, kind, user_id in rows if kind == NOTIFICATION}
+        for user_id in users:
+            streams = [subscription for subscription in subscribers if subscription.user_id == user_id]
+            if streams:
+                count = self.unread_count(user_id)
+                for subscription in streams:
+                    subscription.put('notifications', {'unread_count': count})
+
+        admins = [subscription for subscription in subscribers if subscription.is_admin]
+        if admins and any(kind == TICKET for _, kind, _ in rows):
+            stats = self.stats()
+            for subscription in admins:
+                subscription.put('stats', stats)
+
+    def stream(self, subscription, dumps=json.dumps, lifetime=STREAM_LIFETIME, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield the text/event-stream for a subscription until ``lifetime`` runs out or the client leaves"""
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            deadline = time.monotonic() + lifetime
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    name, data = subscription.messages.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(name, data, dumps)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription, dumps=json.dumps, lifetime=STREAM_LIFETIME, heartbeat=HEARTBEAT_INTERVAL):
+        """``stream`` for an AsyncSubscription, waiting on the event loop instead of a thread"""
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            deadline = time.monotonic() + lifetime
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    name, data = await asyncio.wait_for(subscription.messages.get(), min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(name, data, dumps)
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,133 @@
+"""
+Streaming ticket exports
+
+Exports are written while they are read: ``Database.iter_export_rows`` steps
+through the tickets a batch at a time, and the writers here turn those rows
+into CSV, NDJSON or Parquet chunks that Flask sends with chunked transfer
+encoding. Neither side ever holds the whole export, so memory use stays the
+same for ten tickets or ten million, and the first bytes leave long before
+gunicorn's worker timeout.
+
+Parquet needs the optional ``pyarrow`` package; it is written one row group at a
+time, each group sent as soon as it is complete.
+"""
+
+import csv
+import io
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FIELDS = [
+    'ticket_id', 'title', 'description', 'category', 'priority', 'status',
+    'assigned_to', 'created_at', 'updated_at', 'resolution_notes'
+]
+CHUNK_ROWS = 500            # CSV / NDJSON rows per chunk sent
+ROW_GROUP_SIZE = 10000      # rows per Parquet row group
+
+# format: (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def export_record(row):
+    """One exported ticket as a dict, from a row of database.EXPORT_COLUMNS"""
+    record = dict(zip(EXPORT_FIELDS, row))
+    record['assigned_to'] = record['assigned_to'] or 'Unassigned'
+    record['resolution_notes'] = record['resolution_notes'] or 'N/A'
+    return record
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, chunk_rows=CHUNK_ROWS):
+    """Yield CSV text for ``rows``, header first, ``chunk_rows`` rows per chunk"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield output.getvalue()
+    for chunk in _chunks(rows, chunk_rows):
+        output.seek(0)
+        output.truncate()
+        writer.writerows(export_record(row) for row in chunk)
+        yield output.getvalue()
+
+
+def iter_ndjson(rows, chunk_rows=CHUNK_ROWS):
+    """Yield one JSON object per line for ``rows``, ``chunk_rows`` lines per chunk"""
+    for chunk in _chunks(rows, chunk_rows):
+        yield ''.join(json.dumps(export_record(row)) + '\n' for row in chunk)
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last drain"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(rows, row_group_size=ROW_GROUP_SIZE):
+    """Yield a Parquet file for ``rows``, one row group (and its bytes) at a time"""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export needs the pyarrow package")
+
+    schema = pyarrow.schema([(field, pyarrow.string()) for field in EXPORT_FIELDS])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in _chunks(rows, row_group_size):
+        records = [export_record(row) for row in chunk]
+        columns = {field: [record[field] for record in records] for field in EXPORT_FIELDS}
+        writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+        yield sink.drain()
+    # The footer, with the row group offsets, comes last
+    writer.close()
+    yield sink.drain()
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'parquet': iter_parquet,
+}
+
+
+def parquet_available():
+    return pyarrow is not None
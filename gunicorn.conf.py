@@ -6,7 +6,16 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.getenv('WEB_CONCURRENCY', '4'))
-worker_class = "sync"
+# Threaded workers: each open /api/events stream holds a thread, not a whole worker
+worker_class = "gthread"
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+wsgi_app = "app:app"
+
+# ASGI_MODE=1: uvicorn workers serving asgi:app, where /ask and /create_ticket
+# wait on the event loop instead of holding a thread (see asgi)
+if os.getenv('ASGI_MODE') == '1':
+    worker_class = "uvicorn.workers.UvicornWorker"
+    wsgi_app = "asgi:app"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -32,6 +41,43 @@ user = None
 group = None
 tmp_upload_dir = None
 
+# Server hooks
+def on_starting(server):
+    """Start the single database writer and the snapshot scheduler when configured"""
+    import multiprocessing
+    import db_writer
+    import snapshots
+    
+    address = os.getenv(db_writer.WRITER_SOCKET_ENV)
+    if address:
+        server.db_writer = multiprocessing.Process(
+            target=db_writer.run_writer, args=("complaints.db", address),
+            name='db-writer', daemon=True
+        )
+        server.db_writer.start()
+    
+    # Periodic online snapshots (see snapshots)
+    interval = os.getenv(snapshots.SNAPSHOT_INTERVAL_ENV)
+    if interval:
+        server.snapshot_scheduler = multiprocessing.Process(
+            target=snapshots.run_scheduler, args=("complaints.db", float(interval)),
+            name='db-snapshots', daemon=True
+        )
+        server.snapshot_scheduler.start()
+
+def on_exit(server):
+    """Stop the database writer and snapshot scheduler once the workers are gone"""
+    for name in ('db_writer', 'snapshot_scheduler'):
+        process = getattr(server, name, None)
+        if process is not None:
+            process.terminate()
+            process.join()
+
+def worker_exit(server, worker):
+    """Write any chat history still queued in the exiting worker"""
+    from database import db
+    db.chat_buffer.close()
+
 # SSL (if needed)
 # keyfile = "/path/to/keyfile"
 # certfile = "/path/to/certfile"
\ No newline at end of file
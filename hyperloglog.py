@@ -0,0 +1,66 @@
+"""
+Minimal HyperLogLog sketch for approximate distinct counts
+
+Used by the daily chat rollups to count distinct chat sessions per day without
+keeping every session id. The sketch serializes to a small fixed-size blob that
+can be stored in SQLite and merged across days.
+"""
+
+import hashlib
+import math
+
+DEFAULT_PRECISION = 10  # 1024 registers, ~3% standard error, exact-ish for small counts
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError("Register blob does not match sketch precision")
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, blob, precision=DEFAULT_PRECISION):
+        """Load a sketch from a stored blob (None gives an empty sketch)"""
+        return cls(precision, blob if blob else None)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        """Add a value, returning True if the sketch changed"""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        for index, rank in enumerate(other.registers):
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def count(self):
+        """Estimate the number of distinct values added"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -rank for rank in self.registers)
+
+        # Small-range correction: linear counting while registers are still empty
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+
+        return int(round(estimate))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the P-004 Complaint Management System
+
+Usage: python manage.py [--db complaints.db] <command> [options]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from database import open_database, BULK_CHUNK_SIZE
+from migrations import SCHEMA_VERSION
+import archive
+import db_writer
+import snapshots
+
+
+def init_database(database, args):
+    """Apply pending migrations, sync the archive schema and seed default users"""
+    applied = database.init_db()
+    if applied:
+        print(f"✅ Applied migrations {', '.join(map(str, applied))}")
+    print(f"✅ {database.db_path} is initialized at schema version {SCHEMA_VERSION}")
+    return 0
+
+
+def rebuild_counters(database, args):
+    """Recompute the ticket_counters table and report any drift that was fixed"""
+    drift = database.rebuild_ticket_counters()
+    if not drift:
+        print("✅ ticket_counters is consistent with complaints")
+        return 0
+
+    print(f"⚠️  Fixed {len(drift)} drifted counters:")
+    for scope, key, stored, actual in drift:
+        print(f"  {scope}[{key!r}]: {stored} -> {actual}")
+    return 0
+
+
+def rebuild_rollups(database, args):
+    """Recompute the per-day ticket and chat rollups"""
+    database.rebuild_daily_rollups()
+    print("✅ Daily rollups rebuilt")
+    return 0
+
+
+def rebuild_search(database, args):
+    """Re-index all ticket text for full-text search"""
+    database.rebuild_search_index()
+    print("✅ Search index rebuilt")
+    return 0
+
+
+def reconcile_workload(database, args):
+    """Recount each agent's open tickets and report any drift that was fixed"""
+    drift = database.reconcile_agent_workload()
+    if not drift:
+        print("✅ Agent workloads match their open tickets")
+        return 0
+
+    print(f"⚠️  Fixed {len(drift)} drifted agent workloads:")
+    for name, stored, actual in drift:
+        print(f"  {name}: {stored} -> {actual}")
+    return 0
+
+
+def archive_records(database, args):
+    """Move old resolved tickets and idle chat sessions to the archive database"""
+    tickets, sessions = database.archive_old_records(args.ticket_days, args.chat_days, args.batch_size)
+    print(f"✅ Archived {tickets} tickets resolved over {args.ticket_days} days ago "
+          f"and {sessions} chat sessions idle for {args.chat_days} days to {database.archive_path}")
+    if args.vacuum:
+        database.vacuum()
+        print("✅ Hot database compacted")
+    return 0
+
+
+def run_writer(database, args):
+    """Serve all database writes from this process (see db_writer)"""
+    try:
+        address = args.socket or os.getenv(db_writer.WRITER_SOCKET_ENV) or db_writer.default_socket(database.db_path)
+        db_writer.run_writer(database.db_path, address, database.archive_path)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def take_snapshot(database, args):
+    """Copy the live database files into a new snapshot (see snapshots)"""
+    snapshot_dir = args.dir or snapshots.default_snapshot_dir(database.db_path)
+    if args.every:
+        try:
+            snapshots.run_scheduler(database.db_path, args.every, snapshot_dir, args.keep)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    start = time.perf_counter()
+    snapshot, pages = database.create_snapshot(snapshot_dir, args.pages)
+    print(f"✅ Snapshot written to {snapshot} ({pages} pages in {time.perf_counter() - start:.2f}s)")
+    for path in snapshots.prune_snapshots(snapshot_dir, args.keep):
+        print(f"  Removed old snapshot {path}")
+    return 0
+
+
+def read_ticket_file(handle, file_format, default_user_id=None):
+    """Stream ticket dicts from a CSV (header row) or NDJSON file"""
+    if file_format == 'csv':
+        rows = csv.DictReader(handle)
+    else:
+        rows = (json.loads(line) for line in handle if line.strip())
+
+    for row in rows:
+        if default_user_id is not None and not row.get('user_id'):
+            row['user_id'] = default_user_id
+        yield row
+
+
+def import_tickets(database, args):
+    """Bulk-load tickets from a CSV or NDJSON file"""
+    file_format = args.format
+    if file_format is None:
+        file_format = 'ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    handle = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        tickets = read_ticket_file(handle, file_format, args.user_id)
+        created = database.create_complaints_bulk(tickets, auto_assign=not args.no_assign, chunk_size=args.chunk_size)
+    except (ValueError, KeyError, sqlite3.IntegrityError) as e:
+        print(f"❌ Import stopped: {e}")
+        return 1
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+    elapsed = time.perf_counter() - start
+    rate = created / elapsed if elapsed else created
+    print(f"✅ Imported {created} tickets in {elapsed:.2f}s ({rate:,.0f} tickets/s)")
+    return 0
+
+
+def add_import_arguments(parser):
+    parser.add_argument('path', help="CSV or NDJSON file to import ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help="Input format (default: from the file extension)")
+    parser.add_argument('--user-id', type=int, help="User id for rows that do not name one")
+    parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE, help=f"Tickets per transaction (default: {BULK_CHUNK_SIZE})")
+    parser.add_argument('--no-assign', action='store_true', help="Leave tickets without an agent unassigned")
+
+
+def add_writer_arguments(parser):
+    parser.add_argument('--socket', help=f"Unix socket to listen on (default: ${db_writer.WRITER_SOCKET_ENV}, "
+                                          f"or writer.sock in a private directory next to the database)")
+
+
+def add_snapshot_arguments(parser):
+    parser.add_argument('--dir', help=f"Snapshot directory (default: ${snapshots.SNAPSHOT_DIR_ENV} or snapshots/ next to the database)")
+    parser.add_argument('--keep', type=int, default=snapshots.DEFAULT_KEEP,
+                        help=f"Snapshots to keep, oldest removed first (default: {snapshots.DEFAULT_KEEP})")
+    parser.add_argument('--pages', type=int, default=snapshots.BACKUP_PAGES,
+                        help=f"Pages copied per backup step (default: {snapshots.BACKUP_PAGES})")
+    parser.add_argument('--every', type=float, help="Keep running and take a snapshot every this many seconds")
+
+
+def add_archive_arguments(parser):
+    parser.add_argument('--ticket-days', type=int, default=archive.DEFAULT_TICKET_AGE_DAYS,
+                        help=f"Archive tickets resolved this many days ago (default: {archive.DEFAULT_TICKET_AGE_DAYS})")
+    parser.add_argument('--chat-days', type=int, default=archive.DEFAULT_CHAT_AGE_DAYS,
+                        help=f"Archive chat sessions idle this many days (default: {archive.DEFAULT_CHAT_AGE_DAYS})")
+    parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+                        help=f"Tickets or sessions per transaction (default: {archive.ARCHIVE_BATCH_SIZE})")
+    parser.add_argument('--vacuum', action='store_true', help="Compact the hot database afterwards to return freed pages")
+
+
+COMMANDS = {
+    'init': (init_database, "Create or upgrade the database schema and seed default users (run before starting workers)"),
+    'rebuild-counters': (rebuild_counters, "Recompute dashboard counters from the complaints table"),
+    'rebuild-rollups': (rebuild_rollups, "Recompute the daily ticket and chat rollups"),
+    'rebuild-search': (rebuild_search, "Re-index ticket text and agent responses for full-text search"),
+    'reconcile-workload': (reconcile_workload, "Recount agents' open tickets and fix any drift"),
+    'import-tickets': (import_tickets, "Bulk-import tickets from a CSV or NDJSON file"),
+    'archive': (archive_records, "Move old resolved tickets and idle chat sessions to the archive database"),
+    'snapshot': (take_snapshot, "Take an online snapshot of the database files without blocking writers"),
+    'writer': (run_writer, f"Run the single database writer; workers use it when ${db_writer.WRITER_SOCKET_ENV} is set"),
+}
+
+# Extra arguments for commands that take them
+COMMAND_ARGUMENTS = {
+    'import-tickets': add_import_arguments,
+    'archive': add_archive_arguments,
+    'snapshot': add_snapshot_arguments,
+    'writer': add_writer_arguments,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="P-004 Complaint Management System maintenance commands")
+    parser.add_argument('--db', default="complaints.db", help="Path to the SQLite database (default: complaints.db)")
+    parser.add_argument('--archive-db', help="Path to the archive database (default: <db>_archive.db)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, (handler, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name in COMMAND_ARGUMENTS:
+            COMMAND_ARGUMENTS[name](subparser)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    handler = COMMANDS[args.command][0]
+    try:
+        return handler(open_database(args.db, args.archive_db), args)
+    except db_writer.WriterRunning as e:
+        # Imports, archiving and rebuilds commit on their own (see db_writer.offline)
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
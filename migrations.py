@@ -0,0 +1,817 @@
+"""
+Forward-only schema migrations for the complaint system
+
+The applied version is stored in SQLite's ``PRAGMA user_version``. Each migration
+runs in its own write transaction together with the version bump, so a crash
+leaves the database at the last fully applied version. Migrations never drop
+data: add new migrations to the end of MIGRATIONS instead of editing old ones.
+
+Each migration applies SQL written out in this module, never the current
+helpers in ticket_counters, daily_rollups, agent_workload, ticket_search or
+events: those follow the latest schema, while a released migration must keep
+doing exactly what it did. Changing a trigger means a new migration that
+replaces it.
+"""
+
+from hyperloglog import HyperLogLog
+
+LEGACY_TABLES = ['complaints', 'chat_history', 'admin_actions', 'agent_responses']
+
+# Sort key for ticket listings. Queries must use this exact expression so SQLite
+# can match it against the expression indexes created below.
+PRIORITY_RANKS = {'Urgent': 1, 'High': 2, 'Medium': 3, 'Low': 4}
+PRIORITY_RANK_SQL = "CASE priority WHEN 'Urgent' THEN 1 WHEN 'High' THEN 2 WHEN 'Medium' THEN 3 WHEN 'Low' THEN 4 ELSE 5 END"
+LAST_PRIORITY_RANK = 5
+
+
+def _preserve_legacy_tables(cursor):
+    """Move tables from the pre-user_id schema aside instead of dropping them"""
+    cursor.execute("PRAGMA table_info(complaints)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if columns and 'user_id' not in columns:
+        print("Old complaints schema detected, keeping it as *_legacy tables...")
+        for table in LEGACY_TABLES:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cursor.fetchone():
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+
+
+def _baseline_schema(cursor):
+    """Create the original tables if they do not exist yet"""
+    _preserve_legacy_tables(cursor)
+
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            phone TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_admin BOOLEAN DEFAULT FALSE
+        )
+    ''')
+
+    # Complaints table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS complaints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id TEXT UNIQUE NOT NULL,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT DEFAULT 'Registered',
+            assigned_to TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP,
+            resolution_notes TEXT,
+            estimated_resolution_time TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Chat history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            session_id TEXT,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Admin actions log
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admin_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            action_type TEXT NOT NULL,
+            target_id TEXT,
+            description TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (admin_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Agents table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT,
+            specialization TEXT NOT NULL,
+            description TEXT,
+            status TEXT DEFAULT 'Active',
+            assigned_tickets INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Agent responses table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agent_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id TEXT NOT NULL,
+            agent_id INTEGER NOT NULL,
+            response_text TEXT NOT NULL,
+            response_type TEXT DEFAULT 'Update',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (agent_id) REFERENCES agents (id),
+            FOREIGN KEY (ticket_id) REFERENCES complaints (ticket_id)
+        )
+    ''')
+
+    # Notifications table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            type TEXT DEFAULT 'info',
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+
+def _hot_query_indexes(cursor):
+    """Secondary indexes for the dashboard, ticket, chat and notification queries"""
+    # User dashboard: WHERE user_id = ? ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints (user_id, created_at)")
+    # Agent pages and unassigned lists: WHERE assigned_to = ? / IS NULL
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_assigned_created ON complaints (assigned_to, created_at)")
+    # Status filters and open-ticket breakdowns by priority
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_status_priority ON complaints (status, priority)")
+    # Recent tickets and time-window counts
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_created ON complaints (created_at)")
+    # Chat context: WHERE user_id = ? AND session_id = ? ORDER BY timestamp DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (user_id, session_id, timestamp)")
+    # Ticket detail page: WHERE ticket_id = ? ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_responses_ticket ON agent_responses (ticket_id, created_at)")
+    # Notification list and unread badge: WHERE user_id = ? AND is_read = ? ORDER BY created_at
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications (user_id, is_read, created_at)")
+    # Agent routing: WHERE specialization = ? AND status = 'Active' ORDER BY assigned_tickets
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agents_routing ON agents (specialization, status, assigned_tickets)")
+
+
+def _priority_order_indexes(cursor):
+    """Indexes matching the priority-then-newest ticket listing order"""
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_complaints_priority_order ON complaints (({PRIORITY_RANK_SQL}), created_at, id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_complaints_agent_priority_order ON complaints (assigned_to, ({PRIORITY_RANK_SQL}), created_at, id)")
+
+
+# Counter buckets as of migration 4: (scope, key expression, condition)
+# evaluated against the NEW / OLD row
+_V4_COUNTER_DIMENSIONS = [
+    ('total', "''", None),
+    ('status', "COALESCE({row}.status, '')", None),
+    ('priority', "{row}.priority", None),
+    ('open_priority', "{row}.priority", "{row}.status != 'Resolved'"),
+    ('category', "{row}.category", None),
+    ('unassigned', "''", "({row}.assigned_to IS NULL OR {row}.assigned_to = '')"),
+    ('assignee', "COALESCE({row}.assigned_to, 'Unassigned')", None),
+    ('assignee_open', "COALESCE({row}.assigned_to, 'Unassigned')", "{row}.status != 'Resolved'"),
+]
+_V4_COUNTED_COLUMNS = ['status', 'priority', 'category', 'assigned_to']
+
+
+def _counter_upserts(dimensions, row, delta):
+    statements = []
+    for scope, key_expr, condition in dimensions:
+        where = condition.format(row=row) if condition else '1'
+        statements.append(f'''
+            INSERT INTO ticket_counters (scope, key, count)
+            SELECT '{scope}', {key_expr.format(row=row)}, {delta} WHERE {where}
+            ON CONFLICT (scope, key) DO UPDATE SET count = count + excluded.count;''')
+    return ''.join(statements)
+
+
+def _create_counter_triggers(cursor, dimensions, counted_columns):
+    for name in ['complaints_counters_insert', 'complaints_counters_delete', 'complaints_counters_update']:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_insert AFTER INSERT ON complaints
+        BEGIN {_counter_upserts(dimensions, 'NEW', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_delete AFTER DELETE ON complaints
+        BEGIN {_counter_upserts(dimensions, 'OLD', -1)}
+        END
+    ''')
+    changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in counted_columns)
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_update AFTER UPDATE OF {', '.join(counted_columns)} ON complaints
+        WHEN {changed}
+        BEGIN {_counter_upserts(dimensions, 'OLD', -1)} {_counter_upserts(dimensions, 'NEW', 1)}
+        END
+    ''')
+
+
+def _seed_counters(cursor, dimensions):
+    cursor.execute("DELETE FROM ticket_counters")
+    for scope, key_expr, condition in dimensions:
+        key_sql = key_expr.format(row='c')
+        where = condition.format(row='c') if condition else '1'
+        cursor.execute(f'''
+            INSERT INTO ticket_counters (scope, key, count)
+            SELECT '{scope}', {key_sql}, COUNT(*)
+            FROM complaints c
+            WHERE {where}
+            GROUP BY {key_sql}
+        ''')
+
+
+def _ticket_counters(cursor):
+    """Counter table kept exact by triggers, seeded from the existing tickets"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_counters (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID
+    ''')
+    _create_counter_triggers(cursor, _V4_COUNTER_DIMENSIONS, _V4_COUNTED_COLUMNS)
+    _seed_counters(cursor, _V4_COUNTER_DIMENSIONS)
+
+
+def _daily_rollups(cursor):
+    """Per-day ticket and chat rollups, seeded from the existing rows"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_ticket_stats (
+            day TEXT PRIMARY KEY,
+            created INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            resolution_seconds_sum REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_chat_stats (
+            day TEXT PRIMARY KEY,
+            sessions_sketch BLOB
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER complaints_rollup_insert AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO daily_ticket_stats (day, created)
+            SELECT DATE(NEW.created_at), 1 WHERE DATE(NEW.created_at) IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT DATE(NEW.resolved_at), 1, 1 * (julianday(NEW.resolved_at) - julianday(NEW.created_at)) * 86400
+            WHERE DATE(NEW.resolved_at) IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_rollup_resolved AFTER UPDATE OF resolved_at ON complaints
+        WHEN OLD.resolved_at IS NOT NEW.resolved_at
+        BEGIN
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT DATE(OLD.resolved_at), -1, -1 * (julianday(OLD.resolved_at) - julianday(OLD.created_at)) * 86400
+            WHERE DATE(OLD.resolved_at) IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT DATE(NEW.resolved_at), 1, 1 * (julianday(NEW.resolved_at) - julianday(NEW.created_at)) * 86400
+            WHERE DATE(NEW.resolved_at) IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+        END
+    ''')
+
+    cursor.execute("DELETE FROM daily_ticket_stats")
+    cursor.execute('''
+        INSERT INTO daily_ticket_stats (day, created)
+        SELECT DATE(created_at), COUNT(*) FROM complaints
+        WHERE DATE(created_at) IS NOT NULL
+        GROUP BY DATE(created_at)
+    ''')
+    cursor.execute('''
+        INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+        SELECT DATE(resolved_at), COUNT(*), SUM((julianday(resolved_at) - julianday(created_at)) * 86400)
+        FROM complaints
+        WHERE DATE(resolved_at) IS NOT NULL
+        GROUP BY DATE(resolved_at)
+        ON CONFLICT (day) DO UPDATE SET
+            resolved = excluded.resolved,
+            resolution_seconds_sum = excluded.resolution_seconds_sum
+    ''')
+
+    sketches = {}
+    cursor.execute("SELECT DISTINCT DATE(timestamp), session_id FROM chat_history WHERE DATE(timestamp) IS NOT NULL")
+    for day, session_id in cursor.fetchall():
+        sketches.setdefault(day, HyperLogLog()).add(session_id)
+    cursor.execute("DELETE FROM daily_chat_stats")
+    cursor.executemany(
+        "INSERT INTO daily_chat_stats (day, sessions_sketch) VALUES (?, ?)",
+        [(day, sketch.to_bytes()) for day, sketch in sketches.items()]
+    )
+
+
+def _agent_workload(cursor):
+    """Keep agents.assigned_tickets as the trigger-maintained count of open tickets"""
+    # Workload triggers update agents by name for every assignment change
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agents_name ON agents (name)")
+
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_insert AFTER INSERT ON complaints
+        WHEN NEW.assigned_to IS NOT NULL
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + 1
+            WHERE name = NEW.assigned_to AND NEW.status IS NOT 'Resolved';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_delete AFTER DELETE ON complaints
+        WHEN OLD.assigned_to IS NOT NULL
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + -1
+            WHERE name = OLD.assigned_to AND OLD.status IS NOT 'Resolved';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_update AFTER UPDATE OF status, assigned_to ON complaints
+        WHEN OLD.assigned_to IS NOT NEW.assigned_to
+          OR (OLD.status IS NOT 'Resolved') IS NOT (NEW.status IS NOT 'Resolved')
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + -1
+            WHERE name = OLD.assigned_to AND OLD.status IS NOT 'Resolved';
+            UPDATE agents SET assigned_tickets = assigned_tickets + 1
+            WHERE name = NEW.assigned_to AND NEW.status IS NOT 'Resolved';
+        END
+    ''')
+
+    cursor.execute('''
+        UPDATE agents SET assigned_tickets = (
+            SELECT COUNT(*) FROM complaints c
+            WHERE c.assigned_to = agents.name AND c.status IS NOT 'Resolved'
+        )
+    ''')
+
+
+def _agent_id_references(cursor):
+    """Reference agents from complaints by id; assigned_to keeps the display name"""
+    cursor.execute("ALTER TABLE complaints ADD COLUMN assigned_agent_id INTEGER REFERENCES agents (id)")
+    cursor.execute('''
+        UPDATE complaints
+        SET assigned_agent_id = (SELECT MIN(a.id) FROM agents a WHERE a.name = complaints.assigned_to)
+        WHERE assigned_to IS NOT NULL AND assigned_to != ''
+    ''')
+
+    # Agent pages, unassigned lists and workload queries now filter by id
+    cursor.execute("DROP INDEX IF EXISTS idx_complaints_assigned_created")
+    cursor.execute("DROP INDEX IF EXISTS idx_complaints_agent_priority_order")
+    cursor.execute("DROP INDEX IF EXISTS idx_agents_name")
+    cursor.execute("CREATE INDEX idx_complaints_agent_created ON complaints (assigned_agent_id, created_at)")
+    cursor.execute(f"CREATE INDEX idx_complaints_agent_priority_order ON complaints (assigned_agent_id, ({PRIORITY_RANK_SQL}), created_at, id)")
+
+    # Keep the denormalized display name in step when an agent is renamed
+    cursor.execute('''
+        CREATE TRIGGER agents_rename_display AFTER UPDATE OF name ON agents
+        WHEN OLD.name IS NOT NEW.name
+        BEGIN
+            UPDATE complaints SET assigned_to = NEW.name WHERE assigned_agent_id = NEW.id;
+        END
+    ''')
+
+    # Workload triggers follow the agent id instead of the name
+    for name in ['complaints_workload_insert', 'complaints_workload_delete', 'complaints_workload_update']:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_insert AFTER INSERT ON complaints
+        WHEN NEW.assigned_agent_id IS NOT NULL
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + 1
+            WHERE id = NEW.assigned_agent_id AND NEW.status IS NOT 'Resolved';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_delete AFTER DELETE ON complaints
+        WHEN OLD.assigned_agent_id IS NOT NULL
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + -1
+            WHERE id = OLD.assigned_agent_id AND OLD.status IS NOT 'Resolved';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_workload_update AFTER UPDATE OF status, assigned_agent_id ON complaints
+        WHEN OLD.assigned_agent_id IS NOT NEW.assigned_agent_id
+          OR (OLD.status IS NOT 'Resolved') IS NOT (NEW.status IS NOT 'Resolved')
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + -1
+            WHERE id = OLD.assigned_agent_id AND OLD.status IS NOT 'Resolved';
+            UPDATE agents SET assigned_tickets = assigned_tickets + 1
+            WHERE id = NEW.assigned_agent_id AND NEW.status IS NOT 'Resolved';
+        END
+    ''')
+
+    cursor.execute('''
+        UPDATE agents SET assigned_tickets = (
+            SELECT COUNT(*) FROM complaints c
+            WHERE c.assigned_agent_id = agents.id AND c.status IS NOT 'Resolved'
+        )
+    ''')
+
+
+# Concatenated agent responses of a ticket, as indexed by migration 8
+_V8_RESPONSES_SQL = "(SELECT group_concat(response_text, ' ') FROM agent_responses WHERE ticket_id = {ticket_id})"
+
+
+def _v8_refresh_responses(ticket_id):
+    return f'''
+            UPDATE ticket_fts SET responses = {_V8_RESPONSES_SQL.format(ticket_id=ticket_id)}
+            WHERE rowid = (SELECT id FROM complaints WHERE ticket_id = {ticket_id});'''
+
+
+def _ticket_search(cursor):
+    """FTS5 index over ticket text and agent responses, seeded from existing rows"""
+    # No porter stemmer: FTS5 stems prefix terms too, so "pay*" would become
+    # "pai*" and miss "payment"
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5(
+            title, description, resolution_notes, responses,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_fts_insert AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO ticket_fts (rowid, title, description, resolution_notes, responses)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.resolution_notes,
+                    {_V8_RESPONSES_SQL.format(ticket_id='NEW.ticket_id')});
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_fts_update AFTER UPDATE OF title, description, resolution_notes ON complaints
+        WHEN OLD.title IS NOT NEW.title OR OLD.description IS NOT NEW.description
+          OR OLD.resolution_notes IS NOT NEW.resolution_notes
+        BEGIN
+            UPDATE ticket_fts SET title = NEW.title, description = NEW.description,
+                                  resolution_notes = NEW.resolution_notes
+            WHERE rowid = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_fts_delete AFTER DELETE ON complaints
+        BEGIN
+            DELETE FROM ticket_fts WHERE rowid = OLD.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER agent_responses_fts_insert AFTER INSERT ON agent_responses
+        BEGIN {_v8_refresh_responses('NEW.ticket_id')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER agent_responses_fts_update AFTER UPDATE OF ticket_id, response_text ON agent_responses
+        BEGIN {_v8_refresh_responses('OLD.ticket_id')} {_v8_refresh_responses('NEW.ticket_id')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER agent_responses_fts_delete AFTER DELETE ON agent_responses
+        BEGIN {_v8_refresh_responses('OLD.ticket_id')}
+        END
+    ''')
+
+    cursor.execute(f'''
+        INSERT INTO ticket_fts (rowid, title, description, resolution_notes, responses)
+        SELECT c.id, c.title, c.description, c.resolution_notes, {_V8_RESPONSES_SQL.format(ticket_id='c.ticket_id')}
+        FROM complaints c
+    ''')
+    cursor.execute("INSERT INTO ticket_fts (ticket_fts) VALUES ('optimize')")
+
+
+def _epoch_time_columns(cursor):
+    """Integer epoch and day columns derived from the stored timestamp strings"""
+    # The epoch treats the local wall-clock string as UTC (see timestamps)
+    cursor.execute("ALTER TABLE complaints ADD COLUMN created_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', created_at) AS INTEGER)) VIRTUAL")
+    cursor.execute("ALTER TABLE complaints ADD COLUMN resolved_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', resolved_at) AS INTEGER)) VIRTUAL")
+    cursor.execute("ALTER TABLE complaints ADD COLUMN created_day TEXT GENERATED ALWAYS AS (DATE(created_at)) VIRTUAL")
+    cursor.execute("ALTER TABLE complaints ADD COLUMN resolved_day TEXT GENERATED ALWAYS AS (DATE(resolved_at)) VIRTUAL")
+
+    # Archiving: WHERE status = 'Resolved' AND resolved_epoch < ? ORDER BY resolved_epoch
+    cursor.execute("CREATE INDEX idx_complaints_status_resolved ON complaints (status, resolved_epoch)")
+    # Per-day windows: WHERE created_day BETWEEN ? AND ? grouped by status
+    cursor.execute("CREATE INDEX idx_complaints_created_day ON complaints (created_day, status)")
+
+    # Rollup triggers read the day and epoch columns instead of parsing strings
+    cursor.execute("DROP TRIGGER IF EXISTS complaints_rollup_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS complaints_rollup_resolved")
+    cursor.execute('''
+        CREATE TRIGGER complaints_rollup_insert AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO daily_ticket_stats (day, created)
+            SELECT NEW.created_day, 1 WHERE NEW.created_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT NEW.resolved_day, 1, 1 * (NEW.resolved_epoch - NEW.created_epoch)
+            WHERE NEW.resolved_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_rollup_resolved AFTER UPDATE OF resolved_at ON complaints
+        WHEN OLD.resolved_at IS NOT NEW.resolved_at
+        BEGIN
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT OLD.resolved_day, -1, -1 * (OLD.resolved_epoch - OLD.created_epoch)
+            WHERE OLD.resolved_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT NEW.resolved_day, 1, 1 * (NEW.resolved_epoch - NEW.created_epoch)
+            WHERE NEW.resolved_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+        END
+    ''')
+
+
+def _ticket_row_version(cursor):
+    """Version counter bumped by every ticket update, for compare-and-swap writes"""
+    cursor.execute("ALTER TABLE complaints ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+
+
+def _resolved_export_index(cursor):
+    """Index that streams resolved-ticket exports in order without a sort"""
+    # Resolved export: WHERE status = 'Resolved' ORDER BY updated_at DESC
+    cursor.execute("CREATE INDEX idx_complaints_resolved_updated ON complaints (status, updated_at) WHERE status = 'Resolved'")
+
+
+def _change_events(cursor):
+    """Trigger-recorded ticket and notification changes, for the server-sent event streams"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            user_id INTEGER,
+            subject TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_events_insert AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('ticket', NEW.user_id, NEW.ticket_id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER complaints_events_update AFTER UPDATE OF status, priority, category, assigned_to ON complaints
+        WHEN OLD.status IS NOT NEW.status OR OLD.priority IS NOT NEW.priority
+          OR OLD.category IS NOT NEW.category OR OLD.assigned_to IS NOT NEW.assigned_to
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('ticket', NEW.user_id, NEW.ticket_id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER notifications_events_insert AFTER INSERT ON notifications
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('notification', NEW.user_id, NEW.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER notifications_events_update AFTER UPDATE OF is_read ON notifications
+        WHEN OLD.is_read IS NOT NEW.is_read
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('notification', NEW.user_id, NEW.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER notifications_events_delete AFTER DELETE ON notifications
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('notification', OLD.user_id, OLD.id);
+        END
+    ''')
+    # Keep the newest 10000 events, pruning every 1000
+    cursor.execute('''
+        CREATE TRIGGER events_prune AFTER INSERT ON events
+        WHEN NEW.id % 1000 = 0
+        BEGIN
+            DELETE FROM events WHERE id <= NEW.id - 10000;
+        END
+    ''')
+
+
+def _event_version_index(cursor):
+    """Index for a user's latest notification event, used as an ETag"""
+    cursor.execute("CREATE INDEX idx_events_user_kind ON events (user_id, kind)")
+
+
+# Modes set in suspended_triggers for the length of one write transaction
+BULK_LOAD_MODE = 'bulk_load'    # bulk inserts fold each chunk in with one set-based pass
+ARCHIVE_MODE = 'archive'        # archived rows stay counted and leave the search index with their ticket
+
+_V14_BULK_LOAD_GUARD = "NOT EXISTS (SELECT 1 FROM suspended_triggers WHERE mode = 'bulk_load')"
+_V14_ARCHIVE_GUARD = "NOT EXISTS (SELECT 1 FROM suspended_triggers WHERE mode = 'archive')"
+
+
+def _suspendable_triggers(cursor):
+    """Per-row triggers that bulk loads and archiving switch off with a mode row instead of DDL"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS suspended_triggers (
+            mode TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    ''')
+    for name in ['complaints_counters_insert', 'complaints_counters_delete', 'complaints_rollup_insert',
+                 'complaints_workload_insert', 'complaints_fts_insert', 'complaints_events_insert',
+                 'agent_responses_fts_delete']:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_insert AFTER INSERT ON complaints
+        WHEN {_V14_BULK_LOAD_GUARD}
+        BEGIN {_counter_upserts(_V4_COUNTER_DIMENSIONS, 'NEW', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_delete AFTER DELETE ON complaints
+        WHEN {_V14_ARCHIVE_GUARD}
+        BEGIN {_counter_upserts(_V4_COUNTER_DIMENSIONS, 'OLD', -1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_rollup_insert AFTER INSERT ON complaints
+        WHEN {_V14_BULK_LOAD_GUARD}
+        BEGIN
+            INSERT INTO daily_ticket_stats (day, created)
+            SELECT NEW.created_day, 1 WHERE NEW.created_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            INSERT INTO daily_ticket_stats (day, resolved, resolution_seconds_sum)
+            SELECT NEW.resolved_day, 1, 1 * (NEW.resolved_epoch - NEW.created_epoch)
+            WHERE NEW.resolved_day IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET
+                resolved = resolved + excluded.resolved,
+                resolution_seconds_sum = resolution_seconds_sum + excluded.resolution_seconds_sum;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_workload_insert AFTER INSERT ON complaints
+        WHEN NEW.assigned_agent_id IS NOT NULL AND {_V14_BULK_LOAD_GUARD}
+        BEGIN
+            UPDATE agents SET assigned_tickets = assigned_tickets + 1
+            WHERE id = NEW.assigned_agent_id AND NEW.status IS NOT 'Resolved';
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_fts_insert AFTER INSERT ON complaints
+        WHEN {_V14_BULK_LOAD_GUARD}
+        BEGIN
+            INSERT INTO ticket_fts (rowid, title, description, resolution_notes, responses)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.resolution_notes,
+                    {_V8_RESPONSES_SQL.format(ticket_id='NEW.ticket_id')});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_events_insert AFTER INSERT ON complaints
+        WHEN {_V14_BULK_LOAD_GUARD}
+        BEGIN
+            INSERT INTO events (kind, user_id, subject) VALUES ('ticket', NEW.user_id, NEW.ticket_id);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER agent_responses_fts_delete AFTER DELETE ON agent_responses
+        WHEN {_V14_ARCHIVE_GUARD}
+        BEGIN {_v8_refresh_responses('OLD.ticket_id')}
+        END
+    ''')
+
+
+# Counter buckets as of migration 15: agents keyed by id instead of name
+_V15_AGENT_DIMENSIONS = [
+    ('unassigned', "''", "{row}.assigned_agent_id IS NULL"),
+    ('assignee', "COALESCE(CAST({row}.assigned_agent_id AS TEXT), '')", None),
+    ('assignee_open', "COALESCE(CAST({row}.assigned_agent_id AS TEXT), '')", "{row}.status != 'Resolved'"),
+]
+_V15_COUNTER_DIMENSIONS = _V4_COUNTER_DIMENSIONS[:5] + _V15_AGENT_DIMENSIONS
+_V15_COUNTED_COLUMNS = ['status', 'priority', 'category', 'assigned_agent_id']
+
+
+def _counters_by_agent_id(cursor):
+    """Count agent buckets by assigned_agent_id, so renames and shared names keep exact counts"""
+    for name in ['complaints_counters_insert', 'complaints_counters_delete', 'complaints_counters_update']:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_insert AFTER INSERT ON complaints
+        WHEN {_V14_BULK_LOAD_GUARD}
+        BEGIN {_counter_upserts(_V15_COUNTER_DIMENSIONS, 'NEW', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_delete AFTER DELETE ON complaints
+        WHEN {_V14_ARCHIVE_GUARD}
+        BEGIN {_counter_upserts(_V15_COUNTER_DIMENSIONS, 'OLD', -1)}
+        END
+    ''')
+    changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in _V15_COUNTED_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER complaints_counters_update AFTER UPDATE OF {', '.join(_V15_COUNTED_COLUMNS)} ON complaints
+        WHEN {changed}
+        BEGIN {_counter_upserts(_V15_COUNTER_DIMENSIONS, 'OLD', -1)} {_counter_upserts(_V15_COUNTER_DIMENSIONS, 'NEW', 1)}
+        END
+    ''')
+
+    # Archived tickets stay counted: recount from the archive too once it exists
+    source = 'main.complaints'
+    cursor.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'")
+    if cursor.fetchone():
+        cursor.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = 'complaints'")
+        if cursor.fetchone():
+            source = '''(
+                SELECT assigned_agent_id, status FROM main.complaints
+                UNION ALL SELECT assigned_agent_id, status FROM archive.complaints
+            )'''
+    cursor.execute("DELETE FROM ticket_counters WHERE scope IN ('unassigned', 'assignee', 'assignee_open')")
+    for scope, key_expr, condition in _V15_AGENT_DIMENSIONS:
+        key_sql = key_expr.format(row='c')
+        where = condition.format(row='c') if condition else '1'
+        cursor.execute(f'''
+            INSERT INTO ticket_counters (scope, key, count)
+            SELECT '{scope}', {key_sql}, COUNT(*)
+            FROM {source} c
+            WHERE {where}
+            GROUP BY {key_sql}
+        ''')
+
+
+# (version, description, function) - append only, never renumber
+MIGRATIONS = [
+    (1, "baseline schema", _baseline_schema),
+    (2, "indexes for hot queries", _hot_query_indexes),
+    (3, "priority order indexes for keyset pagination", _priority_order_indexes),
+    (4, "trigger-maintained ticket counters", _ticket_counters),
+    (5, "daily ticket and chat rollups", _daily_rollups),
+    (6, "trigger-maintained agent workload", _agent_workload),
+    (7, "reference agents by id from complaints", _agent_id_references),
+    (8, "full-text search over tickets", _ticket_search),
+    (9, "epoch and day columns for time filters", _epoch_time_columns),
+    (10, "row version for optimistic ticket updates", _ticket_row_version),
+    (11, "partial index for streamed resolved exports", _resolved_export_index),
+    (12, "change events for server-sent event streams", _change_events),
+    (13, "index for per-user event versions", _event_version_index),
+    (14, "suspendable triggers for bulk loads and archiving", _suspendable_triggers),
+    (15, "ticket counters keyed by agent id", _counters_by_agent_id),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Get the schema version recorded in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply all pending migrations, returning the list of versions applied"""
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+
+        # Take the write lock first so concurrent workers apply each step once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+
+            print(f"Applying migration {version}: {description}")
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+
+    if applied:
+        conn.execute("PRAGMA optimize")
+
+    return applied
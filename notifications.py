@@ -1,36 +1,26 @@
 import sqlite3
 from datetime import datetime
 import uuid
+from connection_manager import get_connection_manager
+from db_writer import mutation, client_from_env
+from records import Notification
+import events
 
 class NotificationSystem:
-    def __init__(self, db_path="complaints.db"):
+    # Name the database writer serves this class under (see db_writer)
+    WRITER_TARGET = 'notifications'
+    
+    def __init__(self, db_path="complaints.db", use_writer=True):
         self.db_path = db_path
-        self.init_db()
+        self.connections = get_connection_manager(db_path)
+        # Methods marked @mutation go through the writer process in writer mode
+        self.writer = client_from_env() if use_writer else None
+        # The notifications table is created by migrations.py when Database opens the file
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
-    def init_db(self):
-        """Initialize database with notifications table"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Notifications table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                message TEXT NOT NULL,
-                type TEXT DEFAULT 'info',
-                is_read BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        return self.connections.get_connection()
     
+    @mutation
     def create_notification(self, user_id, title, message, notification_type="info"):
         """Create a new notification for a specific user"""
         conn = self.get_connection()
@@ -50,6 +40,7 @@ class NotificationSystem:
         conn.close()
         return notification_id
     
+    @mutation
     def create_broadcast(self, title, message, notification_type="info", exclude_ids=None):
         """Create a notification for all users, optionally excluding specific users"""
         conn = self.get_connection()
@@ -62,6 +53,7 @@ class NotificationSystem:
             cursor.execute("SELECT id FROM users")
         
         user_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
         
         # Create notification for each user
         notification_ids = []
@@ -71,6 +63,7 @@ class NotificationSystem:
         
         return notification_ids
     
+    @mutation
     def create_admin_notification(self, title, message, notification_type="info"):
         """Create a notification for all admin users"""
         conn = self.get_connection()
@@ -79,6 +72,7 @@ class NotificationSystem:
         # Get all admin user IDs
         cursor.execute("SELECT id FROM users WHERE is_admin = TRUE")
         admin_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
         
         # Create notification for each admin
         notification_ids = []
@@ -107,7 +101,7 @@ class NotificationSystem:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        query = "SELECT id, title, message, type, is_read, created_at FROM notifications WHERE user_id = ?"
+        query = f"SELECT {Notification.COLUMNS} FROM notifications WHERE user_id = ?"
         params = [user_id]
         
         if only_unread:
@@ -116,22 +110,14 @@ class NotificationSystem:
         query += " ORDER BY created_at DESC LIMIT ?"
         params.append(limit)
         
+        cursor.row_factory = notification_row_factory
         cursor.execute(query, params)
-        
-        notifications = []
-        for row in cursor.fetchall():
-            notifications.append({
-                "id": row[0],
-                "title": row[1],
-                "message": row[2],
-                "type": row[3],
-                "read": bool(row[4]),
-                "time": format_timestamp(row[5])
-            })
+        notifications = cursor.fetchall()
         
         conn.close()
         return notifications
     
+    @mutation
     def mark_as_read(self, notification_id):
         """Mark a notification as read"""
         conn = self.get_connection()
@@ -141,6 +127,7 @@ class NotificationSystem:
         conn.commit()
         conn.close()
     
+    @mutation
     def mark_all_as_read(self, user_id):
         """Mark all notifications as read for a specific user"""
         conn = self.get_connection()
@@ -150,6 +137,7 @@ class NotificationSystem:
         conn.commit()
         conn.close()
     
+    @mutation
     def delete_notification(self, notification_id):
         """Delete a specific notification"""
         conn = self.get_connection()
@@ -170,6 +158,17 @@ class NotificationSystem:
         conn.close()
         return count
     
+    def notification_version(self, user_id):
+        """Version token of a user's notifications: (latest event id, its UTC time or None)
+        
+        Changes whenever one of the user's notifications is created, read or deleted.
+        """
+        conn = self.get_connection()
+        version = events.latest_event(conn.cursor(), events.NOTIFICATION, user_id)
+        conn.close()
+        return version
+    
+    @mutation
     def delete_old_notifications(self, days=30):
         """Delete notifications older than specified days"""
         conn = self.get_connection()
@@ -179,6 +178,10 @@ class NotificationSystem:
         conn.commit()
         conn.close()
 
+def notification_row_factory(cursor, row):
+    """Build a Notification from a `SELECT {Notification.COLUMNS}` row"""
+    return Notification(row[0], row[1], row[2], row[3], bool(row[4]), format_timestamp(row[5]))
+
 def format_timestamp(timestamp):
     """Format timestamp into a human-readable string"""
     try:
@@ -0,0 +1,143 @@
+"""
+Compact record types for rows returned by Database and NotificationSystem
+
+Records are slotted dataclasses built straight from cursor rows by sqlite3 row
+factories, replacing the per-row dicts that were assembled by hand from
+``row[0]`` ... ``row[16]``. They support attribute access (``ticket.title``) as
+well as the item access (``ticket['title']``, ``ticket.get('title')``) that
+templates and routes used with the old dicts, and Flask's JSON provider
+serializes them as objects with the same keys.
+"""
+
+from dataclasses import dataclass, fields, asdict
+from typing import Optional
+
+
+class Record:
+    __slots__ = ()
+
+    # SELECT list producing the record's fields in declaration order
+    COLUMNS = ''
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        return cls(*row)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [field.name for field in fields(self)]
+
+    def to_dict(self):
+        return asdict(self)
+
+
+COMPLAINT_FIELDS = [
+    'id', 'ticket_id', 'user_id', 'title', 'description', 'category', 'priority', 'status',
+    'assigned_to', 'assigned_agent_id', 'created_at', 'updated_at', 'resolved_at', 'resolution_notes',
+    'estimated_resolution_time', 'row_version'
+]
+
+
+@dataclass(slots=True)
+class Ticket(Record):
+    """A complaint joined with the submitting user's details"""
+    id: int
+    ticket_id: str
+    user_id: int
+    title: str
+    description: str
+    category: str
+    priority: str
+    status: str
+    assigned_to: Optional[str]  # agent display name
+    assigned_agent_id: Optional[int]
+    created_at: str
+    updated_at: str
+    resolved_at: Optional[str]
+    resolution_notes: Optional[str]
+    estimated_resolution_time: Optional[str]
+    row_version: int  # pass back as expected_version to update without clobbering
+    username: str
+    email: str
+    full_name: str
+
+    # Use with `FROM complaints c JOIN users u ON c.user_id = u.id`
+    COLUMNS = ', '.join([f'c.{name}' for name in COMPLAINT_FIELDS] + ['u.username', 'u.email', 'u.full_name'])
+
+
+@dataclass(slots=True)
+class TicketUpdate(Record):
+    """Outcome of a compare-and-swap ticket update
+
+    After a successful update the fields describe the ticket as written. On a
+    conflict nothing was written and they describe the ticket's current state,
+    which the caller had not seen.
+    """
+    ticket_id: str
+    user_id: int
+    status: str
+    assigned_agent_id: Optional[int]
+    assigned_to: Optional[str]
+    row_version: int
+    conflict: bool = False
+
+    # Selected or RETURNING from `complaints`
+    COLUMNS = 'ticket_id, user_id, status, assigned_agent_id, assigned_to, row_version'
+
+
+@dataclass(slots=True)
+class Agent(Record):
+    id: int
+    name: str
+    email: str
+    phone: Optional[str]
+    specialization: str
+    description: Optional[str]
+    status: str
+    assigned_tickets: int
+
+    COLUMNS = 'id, name, email, phone, specialization, description, status, assigned_tickets'
+
+
+@dataclass(slots=True)
+class Notification(Record):
+    """A notification in the shape served by /api/notifications"""
+    id: str
+    title: str
+    message: str
+    type: str
+    read: bool
+    time: str
+
+    # Rows need read/time conversion; see notifications.notification_row_factory
+    COLUMNS = 'id, title, message, type, is_read, created_at'
+
+
+@dataclass(slots=True)
+class SearchHit(Record):
+    """A ticket matched by full-text search, best matches having the lowest score"""
+    id: int
+    ticket_id: str
+    title: str
+    category: str
+    priority: str
+    status: str
+    assigned_to: Optional[str]
+    assigned_agent_id: Optional[int]
+    created_at: str
+    score: float
+    snippet: Optional[str] = None
+
+    # Selected from `complaints c` with the BM25 score appended by the query
+    COLUMNS = 'c.id, c.ticket_id, c.title, c.category, c.priority, c.status, c.assigned_to, c.assigned_agent_id, c.created_at'
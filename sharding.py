@@ -0,0 +1,194 @@
+"""
+Horizontal partitioning of tickets across SQLite files
+
+One database file admits one writer at a time and grows into one large backup.
+With sharding enabled, tickets live in shard files next to the main database:
+each shard has the full schema, so a ticket's agent responses, counters, daily
+rollups, search index entries and agent workload stay in the same file as the
+ticket and are maintained by that file's triggers. Users and agents are owned by
+the main file and copied to every shard, so ticket queries keep their joins;
+chat history, notifications and logins never leave the main file.
+
+Tickets are routed by their ID:
+
+- ``hash``: ``DB_SHARDS`` files (``complaints_shard0.db`` ...), picked by a
+  CRC32 of the ticket ID.
+- ``month``: one file per UTC creation month (``complaints_2025_01.db`` ...),
+  read from the ULID timestamp in the ticket ID (see ticket_ids). A month's
+  file is created by its first ticket.
+
+Lookups by ticket ID try the routed shard first and then the other files, so
+tickets stay reachable after the shard count grows, and tickets created before
+sharding was enabled stay in the main file. Queries over many tickets (pages,
+search, exports, dashboard statistics) run on every file in parallel and merge
+the results; their cursors hold one position per file.
+
+Sharding is enabled by setting ``DB_SHARD_BY`` (``hash`` or ``month``) or
+``DB_SHARDS`` (hash sharding over that many files); see database.open_database.
+"""
+
+import base64
+import json
+import os
+import re
+import time
+import zlib
+
+import ticket_ids
+
+SHARD_BY_ENV = 'DB_SHARD_BY'
+SHARDS_ENV = 'DB_SHARDS'
+DEFAULT_SHARDS = 4
+MAX_PARALLEL_QUERIES = 8    # threads per process for scatter-gather reads
+
+# Cursor key of the main file's tickets
+MAIN_KEY = 'main'
+
+
+class HashRouter:
+    """Spread tickets over a fixed number of files by a stable hash of the ticket ID"""
+
+    name = 'hash'
+
+    def __init__(self, count=DEFAULT_SHARDS):
+        if count < 1:
+            raise ValueError("Hash sharding needs at least one shard")
+        self.count = count
+
+    def shard_for(self, ticket_id):
+        # crc32 rather than hash(): it is the same in every process
+        return str(zlib.crc32(ticket_id.encode()) % self.count)
+
+    def shard_path(self, db_path, key):
+        root, ext = os.path.splitext(db_path)
+        return f"{root}_shard{key}{ext or '.db'}"
+
+    def initial_keys(self):
+        """Shards opened (and created) up front"""
+        return [str(index) for index in range(self.count)]
+
+    def key_pattern(self):
+        return r'shard(\d+)'
+
+
+class MonthRouter:
+    """One file per UTC month of ticket creation"""
+
+    name = 'month'
+
+    def shard_for(self, ticket_id):
+        # Legacy IDs carry no timestamp; they are only found by searching every file
+        timestamp = ticket_ids.id_timestamp(ticket_id)
+        if timestamp is None:
+            return None
+        return time.strftime('%Y_%m', time.gmtime(timestamp))
+
+    def shard_path(self, db_path, key):
+        root, ext = os.path.splitext(db_path)
+        return f"{root}_{key}{ext or '.db'}"
+
+    def initial_keys(self):
+        return []
+
+    def key_pattern(self):
+        return r'(\d{4}_\d{2})'
+
+
+ROUTERS = {
+    'hash': HashRouter,
+    'month': MonthRouter,
+}
+
+
+def router_from_env():
+    """The router configured by DB_SHARD_BY / DB_SHARDS, or None when sharding is off"""
+    shard_by = os.getenv(SHARD_BY_ENV, '').strip().lower()
+    shards = os.getenv(SHARDS_ENV, '').strip()
+    if not shard_by and not shards:
+        return None
+
+    shard_by = shard_by or 'hash'
+    if shard_by not in ROUTERS:
+        raise ValueError(f"{SHARD_BY_ENV} must be one of: {', '.join(ROUTERS)}")
+    if shard_by == 'hash':
+        return HashRouter(int(shards) if shards else DEFAULT_SHARDS)
+    return MonthRouter()
+
+
+def existing_shard_keys(router, db_path):
+    """Keys of the shard files that exist next to ``db_path``, sorted"""
+    directory = os.path.dirname(os.path.abspath(db_path))
+    root, ext = os.path.splitext(os.path.basename(db_path))
+    pattern = re.compile(re.escape(root) + '_' + router.key_pattern() + re.escape(ext or '.db') + '$')
+    keys = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            keys.append(match.group(1))
+    return sorted(keys)
+
+
+def encode_cursor(positions):
+    """Encode per-file cursors ({key: cursor, '' to start from the top, None once exhausted})"""
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(positions, dict) or not all(
+            isinstance(value, (str, type(None))) for value in positions.values()):
+        raise ValueError("Invalid cursor")
+    return positions
+
+
+class Descending:
+    """Sort key wrapper that orders values largest first"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def merge_pages(pages, positions, limit, sort_key, encode):
+    """Merge per-file pages into one page, returning (items, next cursor)
+
+    ``pages`` maps file keys to the {'tickets', 'next_cursor'} page each file
+    returned when read from ``positions[key]`` (missing or '': from the start).
+    Items are ordered by ``sort_key``, ties broken by file; ``encode(item)``
+    is the file-level cursor that resumes after that item. A file whose page
+    was used up and had no next page is marked exhausted in the cursor.
+    """
+    merged = sorted(
+        ((sort_key(item), key, index) for key, page in pages.items() for index, item in enumerate(page['tickets']))
+    )
+    if limit is not None:
+        merged = merged[:limit]
+
+    used = {}
+    for _, key, index in merged:
+        used[key] = index + 1
+
+    next_positions = dict(positions)
+    for key, page in pages.items():
+        count = used.get(key, 0)
+        if count == len(page['tickets']) and page['next_cursor'] is None:
+            next_positions[key] = None
+        elif count:
+            next_positions[key] = encode(page['tickets'][count - 1])
+        else:
+            next_positions[key] = positions.get(key, '')
+
+    items = [pages[key]['tickets'][index] for _, key, index in merged]
+    more = any(value is not None for value in next_positions.values())
+    return items, encode_cursor(next_positions) if more else None
@@ -0,0 +1,142 @@
+"""
+Online snapshots of the complaint database
+
+A snapshot is a directory holding a consistent copy of each database file (the
+hot file, its archive and any ticket shards), taken while the application keeps
+serving. Files are copied with SQLite's online backup API a few hundred pages
+per step, pausing between steps, so no step holds the database for long; in WAL
+mode readers never block writers in the first place. A step that finds the file
+changed by another connection restarts the copy, and a copy that keeps
+restarting under a steady write load finishes in a single pass instead.
+
+Snapshots are written under ``<name>.partial`` and renamed when complete, so a
+directory without the suffix is always whole. Each file is a standalone
+rollback-journal database: a snapshot can be restored by copying its files over
+the stopped application's files, or opened read-only with
+``Database.open_snapshot``; ``Database.analytics_db`` serves admin reports and
+exports from the newest one, keeping their scans off the live file.
+
+Files of one snapshot are copied one after another, so a ticket archived or a
+shard written during the snapshot may be seen in one file and not another.
+"""
+
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+SNAPSHOT_DIR_ENV = 'SNAPSHOT_DIR'
+SNAPSHOT_INTERVAL_ENV = 'SNAPSHOT_INTERVAL'     # seconds between scheduled snapshots
+DEFAULT_KEEP = 7                # snapshots kept by prune_snapshots
+BACKUP_PAGES = 256              # pages copied per backup step
+STEP_PAUSE = 0.005              # seconds to sleep between steps
+MAX_RESTARTS = 3                # stepped copies restarted by writes before copying in one pass
+REPLICA_CHECK_INTERVAL = 30     # seconds between looks for a newer snapshot to report from
+REPLICA_MAX_AGE = 3600          # older snapshots are not used for reports
+
+PARTIAL_SUFFIX = '.partial'
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def default_snapshot_dir(db_path):
+    """$SNAPSHOT_DIR, or snapshots/ next to the database"""
+    return os.getenv(SNAPSHOT_DIR_ENV) or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'snapshots')
+
+
+def backup_file(source_path, target_path, pages=BACKUP_PAGES, pause=STEP_PAUSE):
+    """Copy one live database file to ``target_path``, returning the number of pages copied"""
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+    copied = {'total': 0, 'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        # remaining grows again when a write restarted the copy
+        if copied['remaining'] is not None and remaining > copied['remaining']:
+            copied['restarts'] += 1
+            if copied['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        copied['total'], copied['remaining'] = total, remaining
+        if remaining:
+            time.sleep(pause)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            # One step reads a single consistent version; in WAL mode writers carry on meanwhile
+            source.backup(target)
+            copied['total'] = target.execute("PRAGMA page_count").fetchone()[0]
+        # A snapshot is one self-contained file, with no -wal beside it
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        source.close()
+    return copied['total']
+
+
+def create_snapshot(paths, snapshot_dir, pages=BACKUP_PAGES):
+    """Copy the database files in ``paths`` into a new snapshot, returning (snapshot path, pages copied)"""
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    snapshot = os.path.join(snapshot_dir, name)
+    partial = snapshot + PARTIAL_SUFFIX
+    os.makedirs(partial)
+
+    copied = 0
+    try:
+        for path in paths:
+            if os.path.exists(path):
+                copied += backup_file(path, os.path.join(partial, os.path.basename(path)), pages)
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    os.rename(partial, snapshot)
+    return snapshot, copied
+
+
+def list_snapshots(snapshot_dir):
+    """Complete snapshots in ``snapshot_dir``, oldest first"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return [
+        os.path.join(snapshot_dir, name) for name in sorted(os.listdir(snapshot_dir))
+        if not name.endswith(PARTIAL_SUFFIX) and os.path.isdir(os.path.join(snapshot_dir, name))
+    ]
+
+
+def latest_snapshot(snapshot_dir, max_age=None):
+    """The newest complete snapshot (finished less than ``max_age`` seconds ago, if given), or None"""
+    snapshots = list_snapshots(snapshot_dir)
+    if not snapshots:
+        return None
+    if max_age is not None and time.time() - os.path.getmtime(snapshots[-1]) > max_age:
+        return None
+    return snapshots[-1]
+
+
+def prune_snapshots(snapshot_dir, keep=DEFAULT_KEEP):
+    """Delete all but the newest ``keep`` snapshots, returning the paths removed"""
+    snapshots = list_snapshots(snapshot_dir)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in removed:
+        shutil.rmtree(path)
+    return removed
+
+
+def run_scheduler(db_path, interval, snapshot_dir=None, keep=DEFAULT_KEEP):
+    """Take a snapshot of ``db_path`` every ``interval`` seconds (blocks; run in its own process)"""
+    from database import open_database
+
+    database = open_database(db_path, use_writer=False)
+    snapshot_dir = snapshot_dir or default_snapshot_dir(db_path)
+    while True:
+        try:
+            snapshot, pages = database.create_snapshot(snapshot_dir)
+            prune_snapshots(snapshot_dir, keep)
+            print(f"✅ Snapshot {snapshot} ({pages} pages)")
+        except (OSError, sqlite3.Error) as e:
+            print(f"❌ Snapshot of {db_path} failed: {e}")
+        time.sleep(interval)
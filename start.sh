@@ -1,2 +1,2 @@
 #!/bin/bash
-gunicorn --bind 0.0.0.0:$PORT --workers 4 app:app
\ No newline at end of file
+python manage.py init && gunicorn --bind 0.0.0.0:$PORT --workers 4
\ No newline at end of file
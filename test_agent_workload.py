@@ -0,0 +1,50 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+
+def workloads(test_db):
+    return {agent.name: agent.assigned_tickets for agent in test_db.get_all_agents()}
+
+def agent_id(test_db, name):
+    return next(agent.id for agent in test_db.get_all_agents() if agent.name == name)
+
+def test_workload_follows_open_tickets(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("work", "work@example.com", "secret", "Work User")
+    
+    ticket_id, _ = test_db.create_complaint(user_id, "Cannot log in", "Error 500", "Technical", "Urgent")
+    assert workloads(test_db)['G. Leena'] == 1
+    
+    assert test_db.reassign_ticket(ticket_id, agent_id(test_db, 'Lakshmi'), admin_id=1).assigned_to == 'Lakshmi'
+    assert workloads(test_db)['G. Leena'] == 0
+    assert workloads(test_db)['Lakshmi'] == 1
+    
+    test_db.update_complaint_status(ticket_id, 'In Progress')
+    assert workloads(test_db)['Lakshmi'] == 1
+    
+    test_db.update_complaint_status(ticket_id, 'Resolved', resolution_notes="Fixed")
+    assert workloads(test_db)['Lakshmi'] == 0
+    
+    test_db.update_complaint_status(ticket_id, 'In Progress')
+    assert workloads(test_db)['Lakshmi'] == 1
+    
+    conn = test_db.get_connection()
+    conn.execute("DELETE FROM complaints WHERE ticket_id = ?", (ticket_id,))
+    conn.commit()
+    conn.close()
+    assert set(workloads(test_db).values()) == {0}
+
+def test_reconcile_reports_and_fixes_drift(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("work", "work@example.com", "secret", "Work User")
+    test_db.create_complaint(user_id, "Refund", "Charged twice", "Billing", "High")
+    assert test_db.reconcile_agent_workload() == []
+    
+    conn = test_db.get_connection()
+    conn.execute("UPDATE agents SET assigned_tickets = 7 WHERE name = 'B. Balu'")
+    conn.commit()
+    conn.close()
+    
+    assert test_db.reconcile_agent_workload() == [('B. Balu', 7, 1)]
+    assert workloads(test_db)['B. Balu'] == 1
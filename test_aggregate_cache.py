@@ -0,0 +1,69 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+from aggregate_cache import AggregateCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_analytics_are_served_from_cache_until_tickets_change(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    user_id = test_db.create_user("cache", "cache@example.com", "secret", "Cache User")
+    test_db.create_complaint(user_id, "First", "Text", "Technical", "High")
+    
+    analytics = test_db.get_detailed_analytics()
+    workload = test_db.get_category_workload_stats()
+    assert test_db.get_detailed_analytics() is analytics
+    assert test_db.get_category_workload_stats() is workload
+    assert test_db.aggregates.stats()['hits'] == 2
+    
+    # Writes through this Database drop the cached results
+    ticket_id, _ = test_db.create_complaint(user_id, "Second", "Text", "Billing", "Low")
+    analytics = test_db.get_detailed_analytics()
+    assert analytics['basic_stats']['total_tickets'] == 2
+    test_db.update_complaint_status(ticket_id, 'Resolved')
+    assert test_db.get_detailed_analytics()['basic_stats']['resolved_tickets'] == 1
+    
+    # Writes from another process show up through the ticket version
+    test_db.aggregates.check_interval = 0
+    other = Database(path)
+    other.create_complaint(user_id, "Third", "Text", "General", "Medium")
+    assert test_db.get_detailed_analytics()['basic_stats']['total_tickets'] == 3
+    
+    stats = test_db.aggregates.stats()
+    assert stats['invalidations'] == 3
+    assert stats['hit_ratio'] == round(stats['hits'] / (stats['hits'] + stats['misses']), 4)
+
+def test_entries_expire_and_stale_results_are_not_stored():
+    clock = FakeClock()
+    version = [1]
+    cache = AggregateCache(lambda: version[0], ttl=10, check_interval=1, clock=clock)
+    computed = []
+    
+    def compute():
+        computed.append(clock.now)
+        return len(computed)
+    
+    assert cache.get('key', compute) == 1
+    clock.now = 9
+    assert cache.get('key', compute) == 1
+    clock.now = 10
+    assert cache.get('key', compute) == 2
+    
+    # A new version is only read once the check interval has passed
+    version[0] = 2
+    assert cache.get('key', compute) == 2
+    clock.now = 11
+    assert cache.get('key', compute) == 3
+    
+    # A result computed across an invalidation is returned but not kept
+    assert cache.get('other', lambda: cache.invalidate() or 'stale') == 'stale'
+    assert cache.stats()['entries'] == 0
+    assert cache.get('other', lambda: 'fresh') == 'fresh'
+    assert cache.get('other', compute) == 'fresh'
@@ -0,0 +1,89 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+
+def backdate(test_db, sql, params=()):
+    conn = test_db.get_connection()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+def hot_count(test_db, table):
+    conn = test_db.get_connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+    conn.close()
+    return count
+
+def test_resolved_tickets_and_idle_chats_move_to_the_archive(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    assert test_db.archive_path == str(tmp_path / "test_archive.db")
+    user_id = test_db.create_user("old", "old@example.com", "secret", "Old User")
+    
+    old_ticket, _ = test_db.create_complaint(user_id, "Router reboot loop", "Keeps restarting", "Technical", "High")
+    open_ticket, _ = test_db.create_complaint(user_id, "Invoice missing", "No invoice for May", "Billing", "Low")
+    agent_id = test_db.get_complaint_by_ticket_id(old_ticket)['assigned_agent_id']
+    test_db.add_agent_response(old_ticket, agent_id, "Firmware updated")
+    test_db.update_complaint_status(old_ticket, 'Resolved', resolution_notes="Fixed")
+    backdate(test_db, "UPDATE complaints SET resolved_at = '2020-01-02 00:00:00' WHERE ticket_id = ?", (old_ticket,))
+    
+    test_db.save_chat_history(user_id, "old-session", "hello", "hi")
+    test_db.save_chat_history(user_id, "new-session", "hello again", "hi again")
+    backdate(test_db, "UPDATE chat_history SET timestamp = '2020-01-01 00:00:00' WHERE session_id = 'old-session'")
+    stats_before = test_db.get_dashboard_stats()
+    ticket_version = test_db.ticket_version()
+    
+    assert test_db.archive_old_records(ticket_age_days=30, chat_age_days=30, batch_size=1) == (1, 1)
+    assert test_db.archive_old_records() == (0, 0)
+    
+    assert hot_count(test_db, 'complaints') == 1
+    assert hot_count(test_db, 'agent_responses') == 0
+    assert hot_count(test_db, 'chat_history') == 1
+    
+    # Polled ticket lists see the archive run as a ticket change
+    assert test_db.ticket_version()[0] != ticket_version[0]
+    
+    # Reads fall through to the archive
+    assert test_db.get_complaint_by_ticket_id(old_ticket)['resolution_notes'] == "Fixed"
+    assert [r['response_text'] for r in test_db.get_ticket_responses(old_ticket)] == ["Firmware updated"]
+    assert [turn['message'] for turn in test_db.get_chat_history(user_id, "old-session")] == ["hello"]
+    assert {c['ticket_id'] for c in test_db.get_user_complaints(user_id)} == {old_ticket, open_ticket}
+    assert {row[0] for row in test_db.export_complaints('all')} == {old_ticket, open_ticket}
+    assert [row[0] for row in test_db.export_complaints('active')] == [open_ticket]
+    
+    # Archived tickets stay counted, also after a rebuild; they leave the hot search index
+    stats_after = test_db.get_dashboard_stats()
+    assert stats_after['total_complaints'] == stats_before['total_complaints'] == 2
+    assert stats_after['resolved_complaints'] == 1
+    assert test_db.rebuild_ticket_counters() == []
+    assert test_db.search_tickets("router")['tickets'] == []
+
+def test_archive_tables_gain_columns_added_to_hot_tables(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    backdate(test_db, "ALTER TABLE complaints ADD COLUMN channel TEXT")
+    
+    # Schema changes ship with migrations; init_db then syncs the archive tables
+    test_db.init_db()
+    conn = test_db.get_connection()
+    columns = [row[1] for row in conn.execute("PRAGMA archive.table_info(complaints)")]
+    conn.close()
+    assert columns[-1] == 'channel'
+
+def test_idle_sessions_are_archived_in_batches_and_resumed_ones_read_both_files(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    first = test_db.create_user("first", "first@example.com", "secret", "First User")
+    second = test_db.create_user("second", "second@example.com", "secret", "Second User")
+    for user_id in (first, second):
+        for session in ("a", "b", "c"):
+            test_db.save_chat_history(user_id, session, f"{session} question", f"{session} answer")
+    backdate(test_db, "UPDATE chat_history SET timestamp = '2020-01-01 00:00:00' WHERE NOT (user_id = ? AND session_id = 'b')", (first,))
+    
+    # Batches continue past the active session instead of regrouping from the start
+    assert test_db.archive_old_records(chat_age_days=30, batch_size=2) == (0, 5)
+    assert hot_count(test_db, 'chat_history') == 1
+    
+    # A resumed session keeps its archived turns in its history
+    test_db.save_chat_history(second, "a", "a follow-up", "a reply")
+    history = test_db.get_chat_history(second, "a")
+    assert [turn['message'] for turn in history] == ["a question", "a follow-up"]
+    assert [turn['message'] for turn in test_db.get_chat_history(second, "a", limit=1)] == ["a follow-up"]
@@ -0,0 +1,155 @@
+import sys
+sys.path.append('.')
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import app as app_module
+import asgi
+import blocking_pool
+import events
+from database import Database
+from notifications import NotificationSystem
+
+CHAT_LATENCY = 0.3
+
+def slow_chat(user_message, user_id=None, session_id=None):
+    time.sleep(CHAT_LATENCY)
+    return {'response': f"Echo: {user_message}", 'session_id': session_id, 'requires_ticket': False}
+
+def session_cookie(**values):
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    return f"session={serializer.dumps(values)}"
+
+async def asgi_request(method, path, body=None, cookie=''):
+    """Send one request through asgi.app, returning (status, headers, body)"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'), (b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)
+    }
+    incoming = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+    finished = asyncio.Event()
+    
+    async def receive():
+        if incoming:
+            return incoming.pop()
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+    
+    sent = []
+    async def send(message):
+        sent.append(message)
+    
+    await asgi.app(scope, receive, send)
+    finished.set()
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(message.get('body', b'') for message in sent[1:])
+
+def test_concurrent_asks_wait_on_the_event_loop(tmp_path, monkeypatch):
+    test_db = Database(str(tmp_path / "test.db"))
+    monkeypatch.setattr(app_module, 'db', test_db)
+    monkeypatch.setattr(app_module.chatbot, 'chat_with_bot', slow_chat)
+    cookie = session_cookie(user_id=1, chat_session_id='async-session')
+    
+    async def ask_many(count):
+        return await asyncio.gather(*[
+            asgi_request('POST', '/ask', {'message': f"Question {i}"}, cookie) for i in range(count)
+        ])
+    
+    start = time.perf_counter()
+    responses = asyncio.run(ask_many(20))
+    elapsed = time.perf_counter() - start
+    
+    # Twenty slow chats overlap instead of queueing behind each other
+    assert elapsed < 20 * CHAT_LATENCY / 4
+    assert [json.loads(body)['reply'] for _, _, body in responses] == [f"Echo: Question {i}" for i in range(20)]
+    assert all(b'session=' in headers[b'set-cookie'] for _, headers, _ in responses)
+    test_db.chat_buffer.flush()
+    assert len(test_db.get_chat_history(1, 'async-session', limit=50)) == 20
+
+def test_sync_routes_and_wsgi_serving_still_work(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'db', Database(str(tmp_path / "test.db")))
+    monkeypatch.setattr(app_module.chatbot, 'chat_with_bot', slow_chat)
+    
+    status, headers, body = asyncio.run(asgi_request('GET', '/health'))
+    assert status == 200 and json.loads(body)['status'] == 'healthy'
+    assert asyncio.run(asgi_request('GET', '/no-such-page'))[0] == 404
+    assert asyncio.run(asgi_request('POST', '/ask', {'message': "Hello"}))[0] == 401
+    
+    # The same async views under the WSGI app (gunicorn's default workers)
+    with app_module.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        response = client.post('/ask', json={'message': "Hello"})
+        assert response.status_code == 200
+        assert response.get_json()['reply'] == "Echo: Hello"
+
+def test_pool_is_sized_from_the_worker_thread_setting(monkeypatch):
+    monkeypatch.delenv(blocking_pool.POOL_THREADS_ENV, raising=False)
+    monkeypatch.setenv(blocking_pool.WORKER_THREADS_ENV, '8')
+    assert blocking_pool.BlockingPool().threads == 8
+    
+    monkeypatch.setenv(blocking_pool.POOL_THREADS_ENV, '64')
+    assert blocking_pool.BlockingPool().threads == 64
+
+async def open_stream(cookie, disconnect):
+    """Hold an /api/events stream through asgi.app until ``disconnect`` is set, returning the messages sent"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': '/api/events', 'raw_path': b'/api/events', 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)
+    }
+    incoming = [{'type': 'http.request', 'body': b''}]
+    
+    async def receive():
+        if incoming:
+            return incoming.pop()
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+    
+    sent = []
+    async def send(message):
+        sent.append(message)
+    
+    await asgi.app(scope, receive, send)
+    return sent
+
+def test_event_streams_wait_on_the_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    notifications = NotificationSystem(path)
+    user_id = test_db.create_user("stream", "stream@example.com", "secret", "Stream User")
+    # The thread limit only applies to streams served from request threads
+    hub = events.EventHub(test_db.event_files, notifications.get_unread_count, dict, background=False, max_streams=1)
+    monkeypatch.setattr(asgi, 'event_hub', hub)
+    monkeypatch.setattr(asgi.wsgi_app, 'executor', ThreadPoolExecutor(1))
+    cookie = session_cookie(user_id=user_id)
+    
+    async def scenario():
+        disconnect = asyncio.Event()
+        streams = [asyncio.ensure_future(open_stream(cookie, disconnect)) for _ in range(40)]
+        while len(hub._subscribers) < 40:
+            await asyncio.sleep(0.01)
+        
+        # Forty open streams and the only WSGI thread is still free
+        health = await asgi_request('GET', '/health')
+        notifications.create_notification(user_id, "Hello", "Pushed")
+        hub.poll()
+        await asyncio.sleep(0.05)
+        disconnect.set()
+        return health, await asyncio.gather(*streams)
+    
+    (status, _, _), streams = asyncio.run(scenario())
+    assert status == 200
+    for sent in streams:
+        assert sent[0]['status'] == 200
+        body = b''.join(message.get('body', b'') for message in sent[1:]).decode()
+        assert body.startswith(f"retry: {events.RECONNECT_DELAY_MS}")
+        assert 'data: {"unread_count": 0}' in body and 'data: {"unread_count": 1}' in body
+    assert not hub._subscribers
+    
+    # Without a session the view's 401 is sent as before
+    assert asyncio.run(asgi_request('GET', '/api/events'))[0] == 401
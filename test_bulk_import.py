@@ -0,0 +1,71 @@
+import sys
+sys.path.append('.')
+
+import sqlite3
+import pytest
+from database import Database
+import manage
+
+def test_bulk_create_assigns_agents_and_updates_counters(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("bulk", "bulk@example.com", "secret", "Bulk User")
+    
+    tickets = [
+        {'user_id': user_id, 'title': f"Ticket {i}", 'description': "Imported", 'category': category, 'priority': 'High'}
+        for i, category in enumerate(['Technical', 'Billing', 'Technical', 'General'] * 5)
+    ]
+    tickets.append({'user_id': user_id, 'title': "Old", 'description': "Legacy", 'category': 'Product',
+                    'priority': 'Low', 'status': 'Resolved', 'created_at': '2024-01-02 10:00:00',
+                    'resolved_at': '2024-01-03 10:00:00', 'ticket_id': 'LEGACY-1'})
+    tickets.append({'user_id': user_id, 'title': "Named", 'description': "Legacy", 'category': 'Service',
+                    'priority': 'Low', 'assigned_to': 'K. Rahul', 'ticket_id': 'LEGACY-2'})
+    
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name").fetchall()
+    
+    assert test_db.create_complaints_bulk(iter(tickets), chunk_size=7) == 22
+    
+    # Triggers are suspended by a mode row inside each chunk, never dropped
+    assert conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name").fetchall() == triggers
+    assert conn.execute("SELECT COUNT(*) FROM suspended_triggers").fetchone() == (0,)
+    conn.close()
+    
+    agents = {agent.name: agent.assigned_tickets for agent in test_db.get_all_agents()}
+    assert agents['G. Leena'] == 10
+    assert agents['B. Balu'] == 5
+    assert agents['Lakshmi'] == 5
+    assert test_db.get_complaint_by_ticket_id('LEGACY-1').assigned_to is None
+    assert test_db.get_complaint_by_ticket_id('LEGACY-2').assigned_agent_id == 3
+    assert agents['K. Rahul'] == 1
+    
+    stats = test_db.get_dashboard_stats()
+    assert stats['total_complaints'] == 22
+    assert stats['resolved_complaints'] == 1
+    assert test_db.rebuild_ticket_counters() == []
+
+def test_bulk_create_rolls_back_invalid_chunk(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("bulk", "bulk@example.com", "secret", "Bulk User")
+    tickets = [{'user_id': user_id, 'title': "Fine", 'description': "x", 'category': 'Service', 'priority': 'Low'}] * 3
+    tickets.append({'user_id': user_id, 'title': "", 'description': "x", 'category': 'Service', 'priority': 'Low'})
+    
+    with pytest.raises(ValueError, match="Ticket 4: missing title"):
+        test_db.create_complaints_bulk(tickets, chunk_size=2)
+    assert test_db.get_dashboard_stats()['total_complaints'] == 2
+    
+    # The rolled-back chunk leaves the per-row triggers in place
+    test_db.create_complaint(user_id, "After", "x", 'Service', 'Low')
+    assert test_db.get_dashboard_stats()['total_complaints'] == 3
+
+def test_import_tickets_command_reads_csv_and_ndjson(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    user_id = Database(db_path).create_user("bulk", "bulk@example.com", "secret", "Bulk User")
+    
+    csv_path = tmp_path / "tickets.csv"
+    csv_path.write_text("title,description,category,priority\nLogin fails,Cannot log in,Technical,Urgent\n")
+    ndjson_path = tmp_path / "tickets.ndjson"
+    ndjson_path.write_text(f'{{"user_id": {user_id}, "title": "Refund", "description": "Twice", "category": "Billing", "priority": "Medium"}}\n')
+    
+    assert manage.main(['--db', db_path, 'import-tickets', str(csv_path), '--user-id', str(user_id)]) == 0
+    assert manage.main(['--db', db_path, 'import-tickets', str(ndjson_path)]) == 0
+    assert Database(db_path).get_dashboard_stats()['total_complaints'] == 2
@@ -0,0 +1,54 @@
+import sys
+sys.path.append('.')
+
+from chat_buffer import ChatHistoryBuffer
+from database import Database
+
+def count_turns(test_db):
+    conn = test_db.get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0]
+    conn.close()
+    return count
+
+def test_turns_are_written_in_batches_and_flushed_on_close(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    batches = []
+    def write_batch(turns):
+        batches.append(len(turns))
+        test_db.save_chat_turns(turns)
+    test_db.chat_buffer = ChatHistoryBuffer(write_batch, max_batch=10, interval=60)
+    
+    for i in range(25):
+        test_db.queue_chat_history(1, "s1", f"question {i}", f"answer {i}")
+    
+    # Queued turns are visible to this process before they are written
+    history = test_db.get_chat_history(1, "s1", limit=3)
+    assert [turn['message'] for turn in history] == ["question 22", "question 23", "question 24"]
+    
+    test_db.chat_buffer.close()
+    assert sum(batches) == 25 and len(batches) <= 3
+    assert count_turns(test_db) == 25
+    assert test_db.chat_buffer.pending(1, "s1") == []
+    assert len(test_db.get_chat_history(1, "s1", limit=50)) == 25
+    
+    # After shutdown turns are written straight through
+    test_db.queue_chat_history(1, "s1", "late", "reply")
+    assert count_turns(test_db) == 26
+
+def test_failed_batch_is_kept_for_retry(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    attempts = []
+    def write_batch(turns):
+        attempts.append(len(turns))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        test_db.save_chat_turns(turns)
+    test_db.chat_buffer = ChatHistoryBuffer(write_batch, max_batch=100, interval=60)
+    
+    test_db.queue_chat_history(1, "s1", "hello", "hi")
+    assert test_db.chat_buffer.flush() is False
+    assert len(test_db.chat_buffer.pending(1, "s1")) == 1
+    
+    assert test_db.chat_buffer.flush() is True
+    assert count_turns(test_db) == 1
+    test_db.chat_buffer.close()
@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+sys.path.append('.')
+
+from connection_manager import ConnectionManager
+
+def test_connection_is_reused_per_thread(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    
+    conn = manager.get_connection()
+    conn.close()
+    assert manager.get_connection() is conn
+    conn.close()
+    
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+    
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    manager.close_all()
+
+def test_close_rolls_back_only_outermost_uncommitted_work(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    
+    conn = manager.get_connection()
+    conn.execute("CREATE TABLE items (name TEXT)")
+    conn.execute("INSERT INTO items VALUES ('kept')")
+    
+    # A nested caller closing its handle must not discard the outer transaction
+    nested = manager.get_connection()
+    nested.close()
+    conn.commit()
+    
+    conn.execute("INSERT INTO items VALUES ('discarded')")
+    conn.close()
+    
+    conn = manager.get_connection()
+    assert [row[0] for row in conn.execute("SELECT name FROM items")] == ['kept']
+    conn.close()
+    manager.close_all()
+
+def test_connection_is_reopened_after_fork(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    parent_conn = manager.get_connection()
+    parent_conn.close()
+    
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        child_conn = manager.get_connection()
+        os.write(write_fd, b"1" if child_conn is not parent_conn else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"1"
+    manager.close_all()
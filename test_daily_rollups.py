@@ -0,0 +1,71 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+from hyperloglog import HyperLogLog
+from timestamps import to_epoch
+
+def test_hyperloglog_estimates_distinct_counts():
+    sketch = HyperLogLog()
+    for i in range(20):
+        sketch.add(f"session-{i % 5}")
+    assert sketch.count() == 5
+    
+    large = HyperLogLog()
+    for i in range(50000):
+        large.add(i)
+    assert abs(large.count() - 50000) / 50000 < 0.1
+    
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    restored.merge(large)
+    assert restored.count() == large.count()
+
+def test_rollups_match_table_scans(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("rollup", "rollup@example.com", "secret", "Rollup User")
+    
+    ticket_ids = [test_db.create_complaint(user_id, "Title", "Description", "Service", "High")[0] for _ in range(3)]
+    test_db.update_complaint_status(ticket_ids[0], 'Resolved', None, 'Done')
+    
+    for session_id in ['a', 'b', 'a']:
+        test_db.save_chat_history(user_id, session_id, "hello", "hi")
+    
+    stats = test_db.get_dashboard_stats()
+    assert stats['today_complaints'] == 3
+    assert stats['week_complaints'] == 3
+    assert stats['active_chats_today'] == 2
+    
+    conn = test_db.get_connection()
+    before = conn.execute("SELECT * FROM daily_ticket_stats").fetchall()
+    conn.close()
+    
+    test_db.rebuild_daily_rollups()
+    
+    conn = test_db.get_connection()
+    after = conn.execute("SELECT * FROM daily_ticket_stats").fetchall()
+    conn.close()
+    assert before == after
+    assert after[0][1:3] == (3, 1)
+    assert test_db.get_dashboard_stats()['active_chats_today'] == 2
+
+def test_epoch_and_day_columns_follow_the_stored_timestamps(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("epoch", "epoch@example.com", "secret", "Epoch User")
+    ticket_id, _ = test_db.create_complaint(user_id, "Title", "Description", "Service", "High")
+    
+    conn = test_db.get_connection()
+    conn.execute('''
+        UPDATE complaints SET created_at = '2024-03-01 23:30:00', resolved_at = '2024-03-02 01:00:00'
+        WHERE ticket_id = ?
+    ''', (ticket_id,))
+    conn.commit()
+    row = conn.execute('''
+        SELECT created_day, resolved_day, resolved_epoch - created_epoch, resolved_epoch
+        FROM complaints WHERE ticket_id = ?
+    ''', (ticket_id,)).fetchone()
+    resolved = conn.execute("SELECT resolved, resolution_seconds_sum FROM daily_ticket_stats WHERE day = '2024-03-02'").fetchone()
+    conn.close()
+    
+    assert row == ('2024-03-01', '2024-03-02', 5400, to_epoch('2024-03-02 01:00:00'))
+    assert resolved == (1, 5400)
+    assert test_db.get_complaint_by_ticket_id(ticket_id)['resolved_at'] == '2024-03-02 01:00:00'
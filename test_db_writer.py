@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+sys.path.append('.')
+
+import calendar
+import pytest
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+import db_writer
+import manage
+import sharding
+import ticket_ids
+from database import Database, ShardedDatabase
+from notifications import NotificationSystem
+
+def writer_server(tmp_path, db_path):
+    targets = {
+        Database.WRITER_TARGET: Database(db_path, use_writer=False),
+        NotificationSystem.WRITER_TARGET: NotificationSystem(db_path, use_writer=False),
+    }
+    return db_writer.WriterServer(str(tmp_path / "writer.sock"), db_path, targets)
+
+def start_writer(tmp_path, db_path):
+    server = writer_server(tmp_path, db_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while server._listener is None:
+        time.sleep(0.01)
+    return server
+
+def test_group_commit_isolates_failing_requests(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    server = writer_server(tmp_path, db_path)
+    
+    replies = server.run_group([
+        ('database', 'create_user', ("grouped", "grouped@example.com", "secret", "Grouped User"), {}),
+        ('database', 'update_complaint_status', ("P004-MISSING", 'Resolved'), {}),
+        ('notifications', 'create_notification', (1, "Hello", "Grouped"), {}),
+        ('database', 'recreate_database', (), {}),
+    ])
+    
+    assert [ok for ok, _ in replies] == [True, False, True, False]
+    assert isinstance(replies[1][1], ValueError)
+    assert "not a database mutation" in str(replies[3][1])
+    assert (server.groups, server.requests) == (1, 4)
+    
+    test_db = Database(db_path, use_writer=False)
+    assert test_db.authenticate_user("grouped", "secret")['id'] == replies[0][1]
+    assert [n.message for n in NotificationSystem(db_path, use_writer=False).get_notifications(1)] == ["Grouped"]
+
+def test_mutations_go_through_the_writer_when_configured(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv(db_writer.WRITER_KEY_ENV, "writer-test-key")
+    server = start_writer(tmp_path, db_path)
+    
+    monkeypatch.setenv(db_writer.WRITER_SOCKET_ENV, server.address)
+    test_db = Database(db_path)
+    user_id = test_db.create_user("routed", "routed@example.com", "secret", "Routed User")
+    ticket_id, _ = test_db.create_complaint(user_id, "Slow VPN", "Drops every hour", "Technical", "High")
+    assert test_db.get_complaint_by_ticket_id(ticket_id).user_id == user_id
+    with pytest.raises(ValueError):
+        test_db.update_complaint_status("P004-MISSING", 'Resolved')
+    assert server.requests == 3
+    
+    # A Database for another file writes directly
+    other_db = Database(str(tmp_path / "other.db"))
+    assert other_db.create_user("local", "local@example.com", "secret", "Local User")
+    assert server.requests == 3
+    
+    # Maintenance commits on its own, so it waits for the writer to stop
+    with pytest.raises(db_writer.WriterRunning):
+        test_db.rebuild_ticket_counters()
+    assert manage.main(['--db', db_path, 'archive']) == 1
+    assert other_db.rebuild_ticket_counters() == []
+    server.close()
+
+def test_clients_without_the_key_are_refused(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv(db_writer.WRITER_KEY_ENV, "writer-test-key")
+    server = start_writer(tmp_path, db_path)
+    assert os.stat(server.address).st_mode & 0o077 == 0
+    
+    # Neither side unpickles anything from a peer with the wrong key
+    with pytest.raises(AuthenticationError):
+        Client(server.address, family='AF_UNIX', authkey=b"wrong-key")
+    impostor = db_writer.WriterClient(server.address, authkey=b"wrong-key")
+    assert impostor.call(db_path, 'database', 'create_user', ("x", "x@example.com", "secret", "X"), {}) is db_writer.LOCAL
+    assert server.requests == 0
+    
+    client = db_writer.WriterClient(server.address)
+    assert client.serves(db_path)
+    assert client.call(db_path, 'database', 'create_user', ("keyed", "keyed@example.com", "secret", "Keyed"), {})
+    assert server.requests == 1
+    server.close()
+
+def test_default_socket_is_in_a_private_directory(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    address = db_writer.default_socket(db_path)
+    assert os.path.dirname(address) == str(tmp_path / ".test-writer")
+    
+    monkeypatch.delenv(db_writer.WRITER_KEY_ENV, raising=False)
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    with pytest.raises(RuntimeError):
+        db_writer.WriterServer(address, db_path, {}).serve_forever()
+    
+    # A directory others can write to is refused
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        db_writer.WriterServer(str(shared / "writer.sock"), db_path, {}, authkey=b"key").serve_forever()
+    assert not (shared / "writer.sock").exists()
+
+class FailsAfterWriting:
+    WRITER_TARGET = 'failing'
+    writer = None
+    
+    def __init__(self, database):
+        self.database = database
+    
+    @db_writer.mutation
+    def create_then_fail(self, user_id, month):
+        create_in_month(self.database, user_id, month)
+        raise ValueError("after writing a shard")
+
+def create_in_month(database, user_id, month):
+    clock = lambda: calendar.timegm((2025, month, 15, 12, 0, 0))
+    database.generate_ticket_id = ticket_ids.TicketIdGenerator(clock=clock).new_id
+    return database.create_complaint(user_id, f"Month {month}", "Text", "General", "Medium")[0]
+
+def test_group_commit_covers_every_shard(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    test_db = ShardedDatabase(db_path, use_writer=False, router=sharding.MonthRouter())
+    user_id = test_db.create_user("shard", "shard@example.com", "secret", "Shard User")
+    targets = {Database.WRITER_TARGET: test_db, FailsAfterWriting.WRITER_TARGET: FailsAfterWriting(test_db)}
+    server = db_writer.WriterServer(str(tmp_path / "writer.sock"), db_path, targets)
+    
+    # The failing request opens a new month file inside the group
+    replies = server.run_group([
+        ('database', 'create_complaint', (user_id, "Kept", "Text", "General", "Medium"), {}),
+        ('failing', 'create_then_fail', (user_id, 3), {}),
+    ])
+    assert [ok for ok, _ in replies] == [True, False], replies
+    assert test_db.get_dashboard_stats()['total_complaints'] == 1
+    
+    # The failed request's ticket is gone from its shard; nothing was left open
+    march = test_db._shard('2025_03')
+    conn = march.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM complaints").fetchone() == (0,)
+    assert not conn.in_transaction
+    conn.close()
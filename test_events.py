@@ -0,0 +1,156 @@
+import sys
+sys.path.append('.')
+
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+import app as app_module
+from database import Database, ShardedDatabase
+from notifications import NotificationSystem
+import events
+import sharding
+
+def drain(subscription):
+    messages = []
+    while not subscription.messages.empty():
+        messages.append(subscription.messages.get_nowait())
+    return messages
+
+def make_hub(test_db, notifications):
+    return events.EventHub(test_db.event_files, notifications.get_unread_count,
+                           lambda: {'total_complaints': test_db.get_dashboard_stats()['total_complaints']},
+                           background=False)
+
+def test_changes_are_pushed_to_the_streams_that_care(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    notifications = NotificationSystem(path)
+    user_id = test_db.create_user("events", "events@example.com", "secret", "Events User")
+    other_id = test_db.create_user("other", "other@example.com", "secret", "Other User")
+    hub = make_hub(test_db, notifications)
+    
+    # New streams start with the current state
+    user_stream = hub.subscribe(user_id)
+    admin_stream = hub.subscribe(1, is_admin=True)
+    assert drain(user_stream) == [('notifications', {'unread_count': 0})]
+    assert drain(admin_stream) == [('notifications', {'unread_count': 0}), ('stats', {'total_complaints': 0})]
+    
+    # Nothing committed: nothing read, nothing sent
+    assert hub.poll() == 0
+    
+    notification_id = notifications.create_notification(user_id, "Hello", "First")
+    notifications.create_notification(other_id, "Hello", "Not yours")
+    assert hub.poll() == 2
+    assert drain(user_stream) == [('notifications', {'unread_count': 1})]
+    assert drain(admin_stream) == []
+    
+    notifications.mark_as_read(notification_id)
+    hub.poll()
+    assert drain(user_stream) == [('notifications', {'unread_count': 0})]
+    
+    # Ticket changes refresh admin stats once per poll
+    ticket_id, _ = test_db.create_complaint(user_id, "Broken", "It broke", "Technical", "High")
+    test_db.create_complaint(user_id, "Broken again", "It broke", "Technical", "Low")
+    hub.poll()
+    assert drain(admin_stream) == [('stats', {'total_complaints': 2})]
+    test_db.create_complaints_bulk([
+        {'user_id': user_id, 'title': f"Bulk {i}", 'description': "Text", 'category': "Billing", 'priority': "Low"}
+        for i in range(3)
+    ])
+    assert hub.poll() == 1
+    assert drain(admin_stream) == [('stats', {'total_complaints': 5})]
+    
+    hub.unsubscribe(admin_stream)
+    test_db.update_complaint_status(ticket_id, 'Resolved')
+    hub.poll()
+    assert drain(admin_stream) == []
+
+def test_stream_sends_state_heartbeats_and_ends(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    notifications = NotificationSystem(path)
+    hub = make_hub(test_db, notifications)
+    
+    subscription = hub.subscribe(1)
+    chunks = list(hub.stream(subscription, lifetime=0.05, heartbeat=0.01))
+    assert chunks[0] == f"retry: {events.RECONNECT_DELAY_MS}\n\n"
+    assert chunks[1] == 'event: notifications\ndata: {"unread_count": 0}\n\n'
+    assert ": keep-alive\n\n" in chunks[2:]
+    assert subscription not in hub._subscribers
+
+def test_streams_past_the_limit_leave_threads_for_other_requests(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    hub = events.EventHub(test_db.event_files, NotificationSystem(path).get_unread_count, dict,
+                          background=False, max_streams=2)
+    monkeypatch.setattr(hub, 'stream', functools.partial(hub.stream, lifetime=1.0, heartbeat=0.05))
+    monkeypatch.setattr(app_module, 'event_hub', hub)
+    
+    def get(url):
+        with app_module.app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+            response = client.get(url)
+            return response.status_code, response.get_data(as_text=True)
+    
+    # Three request threads, as in a gthread worker: two streams hold two of them
+    with ThreadPoolExecutor(3) as worker:
+        streams = [worker.submit(get, '/api/events') for _ in range(2)]
+        while len(hub._subscribers) < 2:
+            time.sleep(0.01)
+        
+        # The third stream is turned away at once, so the last thread still serves requests
+        status, body = worker.submit(get, '/api/events').result(timeout=0.5)
+        assert status == 503 and body == f"retry: {events.FULL_RETRY_MS}\n\n"
+        assert worker.submit(get, '/health').result(timeout=0.5)[0] == 200
+        assert not any(stream.done() for stream in streams)
+        
+        assert [stream.result()[0] for stream in streams] == [200, 200]
+    assert not hub._subscribers
+
+def test_sharded_ticket_events_are_read_from_every_file(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = ShardedDatabase(path, router=sharding.HashRouter(2))
+    notifications = NotificationSystem(path)
+    user_id = test_db.create_user("shard", "shard@example.com", "secret", "Shard User")
+    hub = make_hub(test_db, notifications)
+    admin_stream = hub.subscribe(1, is_admin=True)
+    drain(admin_stream)
+    
+    for i in range(4):
+        test_db.create_complaint(user_id, f"Sharded {i}", "Text", "General", "Medium")
+    assert hub.poll() == 4
+    assert drain(admin_stream) == [('stats', {'total_complaints': 4})]
+
+def test_version_tokens_change_only_with_their_data(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    notifications = NotificationSystem(path)
+    user_id = test_db.create_user("tokens", "tokens@example.com", "secret", "Token User")
+    
+    stats_version = test_db.stats_version()
+    ticket_version = test_db.ticket_version()
+    notification_version = notifications.notification_version(user_id)
+    assert notification_version == (0, None)
+    
+    # Another user's notification, a ticket response and reads leave the tokens alone
+    notifications.create_notification(1, "Admin only", "Not for this user")
+    assert notifications.notification_version(user_id) == notification_version
+    assert test_db.stats_version() == stats_version
+    
+    ticket_id, _ = test_db.create_complaint(user_id, "Token ticket", "Text", "Billing", "Low")
+    assert test_db.ticket_version() != ticket_version
+    assert test_db.stats_version() != stats_version
+    stats_version = test_db.stats_version()
+    test_db.add_agent_response(ticket_id, 1, "Looking into it")
+    assert test_db.stats_version() == stats_version
+    
+    notification_id = notifications.create_notification(user_id, "Hello", "Yours")
+    token, changed = notifications.notification_version(user_id)
+    assert token > 0 and changed is not None
+    notifications.mark_as_read(notification_id)
+    assert notifications.notification_version(user_id)[0] > token
+    
+    test_db.save_chat_history(user_id, "session", "question", "answer")
+    test_db.chat_buffer.flush()
+    assert test_db.stats_version() != stats_version
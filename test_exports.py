@@ -0,0 +1,78 @@
+import sys
+sys.path.append('.')
+
+import csv
+import io
+import json
+import pytest
+from database import Database
+import exports
+
+def set_times(test_db, ticket_id, created_at, updated_at):
+    conn = test_db.get_connection()
+    conn.execute("UPDATE complaints SET created_at = ?, updated_at = ? WHERE ticket_id = ?",
+                 (created_at, updated_at, ticket_id))
+    conn.commit()
+    conn.close()
+
+def make_tickets(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("export", "export@example.com", "secret", "Export User")
+    tickets = []
+    for day in range(1, 8):
+        ticket_id, _ = test_db.create_complaint(user_id, f"Ticket {day}", "Needs help, \"urgently\"", "Billing", "Low")
+        if day % 2:
+            test_db.update_complaint_status(ticket_id, 'Resolved', resolution_notes="Done")
+        set_times(test_db, ticket_id, f"2024-01-0{day} 10:00:00", f"2024-02-0{8 - day} 10:00:00")
+        tickets.append(ticket_id)
+    
+    # Resolved tickets from days 1 and 3 move to the archive file
+    conn = test_db.get_connection()
+    conn.execute("UPDATE complaints SET resolved_at = '2020-01-01 00:00:00' WHERE created_at < '2024-01-04'")
+    conn.commit()
+    conn.close()
+    assert test_db.archive_old_records(ticket_age_days=30, chat_age_days=30) == (2, 0)
+    return test_db, tickets
+
+def test_export_streams_hot_and_archived_tickets_in_order(tmp_path):
+    test_db, tickets = make_tickets(tmp_path)
+    
+    rows = test_db.iter_export_rows('all', batch_size=2)
+    assert not isinstance(rows, list)
+    assert [row[0] for row in rows] == tickets[::-1]
+    
+    # Resolved exports run newest resolution first: day 7 was updated earliest
+    assert [row[0] for row in test_db.iter_export_rows('resolved', batch_size=1)] == [tickets[i] for i in (0, 2, 4, 6)]
+    assert [row[0] for row in test_db.iter_export_rows('active')] == [tickets[i] for i in (5, 3, 1)]
+    assert test_db.export_complaints('all') == list(test_db.iter_export_rows('all'))
+    
+    # Walking away from a stream releases its connection
+    stream = test_db.iter_export_rows('all', batch_size=2)
+    next(stream)
+    stream.close()
+    conn = test_db.get_connection()
+    assert conn.depth == 1 and not conn.in_transaction
+    conn.close()
+
+def test_csv_and_ndjson_writers_send_rows_in_chunks(tmp_path):
+    test_db, tickets = make_tickets(tmp_path)
+    
+    chunks = list(exports.iter_csv(test_db.iter_export_rows('all'), chunk_rows=3))
+    assert len(chunks) == 4
+    records = list(csv.DictReader(io.StringIO(''.join(chunks))))
+    assert [record['ticket_id'] for record in records] == tickets[::-1]
+    assert records[0]['description'] == 'Needs help, "urgently"'
+    assert records[1]['resolution_notes'] == 'N/A'
+    
+    lines = ''.join(exports.iter_ndjson(test_db.iter_export_rows('active'), chunk_rows=2)).splitlines()
+    assert [json.loads(line)['ticket_id'] for line in lines] == [tickets[i] for i in (5, 3, 1)]
+    assert list(exports.iter_ndjson(iter([]))) == []
+
+def test_parquet_writer_emits_one_row_group_per_chunk(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    test_db, tickets = make_tickets(tmp_path)
+    
+    chunks = list(exports.iter_parquet(test_db.iter_export_rows('all'), row_group_size=3))
+    parquet_file = parquet.ParquetFile(io.BytesIO(b''.join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().column('ticket_id').to_pylist() == tickets[::-1]
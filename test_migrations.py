@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import subprocess
+import sys
+sys.path.append('.')
+
+import database
+from database import Database
+from migrations import MIGRATIONS, SCHEMA_VERSION, get_schema_version, run_migrations
+from notifications import NotificationSystem
+import manage
+
+def test_migrations_bring_new_database_to_latest_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    
+    assert run_migrations(conn) == list(range(1, SCHEMA_VERSION + 1))
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    
+    # Running again is a no-op
+    assert run_migrations(conn) == []
+    
+    plan = conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT message FROM chat_history WHERE user_id = ? AND session_id = ? ORDER BY timestamp DESC
+    ''', (1, 's')).fetchall()
+    assert 'idx_chat_history_session' in plan[0][3]
+    conn.close()
+
+def test_legacy_tables_are_kept_instead_of_dropped(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.execute("INSERT INTO complaints (title) VALUES ('old ticket')")
+    conn.commit()
+    
+    run_migrations(conn)
+    
+    assert conn.execute("SELECT title FROM complaints_legacy").fetchall() == [('old ticket',)]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(complaints)")]
+    assert 'user_id' in columns
+    conn.close()
+
+def test_agent_names_are_backfilled_to_ids(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    cursor = conn.cursor()
+    for version, _, migrate in MIGRATIONS:
+        if version < 7:
+            migrate(cursor)
+    conn.execute("PRAGMA user_version = 6")
+    conn.execute("INSERT INTO users (username, email, password_hash, full_name) VALUES ('u', 'u@example.com', 'x', 'User')")
+    conn.execute("INSERT INTO agents (name, email, specialization) VALUES ('A. Agent', 'a@example.com', 'Technical Support')")
+    conn.executemany('''
+        INSERT INTO complaints (ticket_id, user_id, title, description, category, priority, status, assigned_to)
+        VALUES (?, 1, 'Title', 'Description', 'Technical', 'High', ?, ?)
+    ''', [('T1', 'Registered', 'A. Agent'), ('T2', 'Resolved', 'A. Agent'), ('T3', 'Registered', None)])
+    conn.commit()
+    
+    # Migrations 5 and 6 as released keep rollups by date and workload by agent name
+    assert conn.execute("SELECT assigned_tickets FROM agents WHERE id = 1").fetchone() == (1,)
+    assert conn.execute("SELECT SUM(created) FROM daily_ticket_stats").fetchone() == (3,)
+    
+    assert run_migrations(conn) == list(range(7, SCHEMA_VERSION + 1))
+    
+    rows = conn.execute("SELECT ticket_id, assigned_agent_id FROM complaints ORDER BY ticket_id").fetchall()
+    assert rows == [('T1', 1), ('T2', 1), ('T3', None)]
+    assert conn.execute("SELECT assigned_tickets FROM agents WHERE id = 1").fetchone() == (1,)
+    counters = conn.execute("SELECT scope, key, count FROM ticket_counters WHERE scope LIKE 'assignee%' ORDER BY scope, key").fetchall()
+    assert counters == [('assignee', '', 1), ('assignee', '1', 2), ('assignee_open', '', 1), ('assignee_open', '1', 1)]
+    
+    # Renaming an agent updates the display name on their tickets
+    conn.execute("UPDATE agents SET name = 'A. Renamed' WHERE id = 1")
+    assert conn.execute("SELECT DISTINCT assigned_to FROM complaints WHERE assigned_agent_id = 1").fetchall() == [('A. Renamed',)]
+    
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM complaints WHERE assigned_agent_id = ?", (1,)).fetchall()
+    assert 'idx_complaints_agent' in plan[0][3]
+    conn.close()
+
+def test_initialized_database_is_opened_without_init_work(tmp_path):
+    path = str(tmp_path / "test.db")
+    Database(path)
+    
+    # A new process finds the file at SCHEMA_VERSION and does not seed it again
+    database._initialized_databases.clear()
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM users WHERE username = 'admin'")
+    conn.commit()
+    
+    test_db = Database(path)
+    assert test_db.authenticate_user('admin', 'admin123') is None
+    
+    # The explicit init command still runs every step
+    assert manage.main(['--db', path, 'init']) == 0
+    assert test_db.authenticate_user('admin', 'admin123')['is_admin']
+    conn.close()
+
+def test_notification_system_does_no_schema_work(tmp_path):
+    path = str(tmp_path / "test.db")
+    NotificationSystem(path, use_writer=False)
+    
+    # Constructing it neither opens nor creates the file; the table comes from the migrations
+    assert not (tmp_path / "test.db").exists()
+    Database(path)
+    assert NotificationSystem(path, use_writer=False).get_unread_count(1) == 0
+
+def test_manage_init_touches_only_the_given_database(tmp_path):
+    workdir = tmp_path / "workdir"
+    workdir.mkdir()
+    path = str(tmp_path / "other.db")
+    
+    # A fresh interpreter, so importing database is part of what is checked
+    script = f"import sys; sys.path.insert(0, {os.getcwd()!r}); import manage; sys.exit(manage.main(['--db', {path!r}, 'init']))"
+    subprocess.run([sys.executable, '-c', script], cwd=workdir, check=True, capture_output=True)
+    
+    assert sorted(os.listdir(workdir)) == []
+    assert sorted(name for name in os.listdir(tmp_path) if name != "workdir") == ["other.db", "other_archive.db"]
+    conn = sqlite3.connect(path)
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    conn.close()
@@ -0,0 +1,28 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+
+def test_pages_follow_priority_then_newest_order(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("pager", "pager@example.com", "secret", "Page User")
+    
+    for i, priority in enumerate(['Low', 'Urgent', 'Medium', 'High'] * 5):
+        test_db.create_complaint(user_id, f"Ticket {i}", "Description", "Technical", priority, auto_assign=False)
+    
+    expected = [ticket['ticket_id'] for ticket in test_db.get_all_complaints_admin()]
+    assert len(expected) == 20
+    
+    paged = []
+    cursor = None
+    while True:
+        page = test_db.get_complaints_page(cursor, limit=3)
+        paged.extend(ticket['ticket_id'] for ticket in page['tickets'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert paged == expected
+    
+    priorities = [ticket['priority'] for ticket in test_db.get_all_complaints_admin(limit=6)]
+    assert priorities == ['Urgent'] * 5 + ['High']
@@ -0,0 +1,29 @@
+import json
+import sys
+sys.path.append('.')
+
+from flask import Flask, render_template_string
+from database import Database
+
+def test_ticket_records_support_dict_and_attribute_access(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("record", "record@example.com", "secret", "Record User")
+    ticket_id, complaint_id = test_db.create_complaint(user_id, "Printer jam", "It jams", "Product", "Low")
+    
+    ticket = test_db.get_complaint_by_ticket_id(ticket_id)
+    assert ticket.id == ticket['id'] == complaint_id
+    assert ticket.get('full_name') == "Record User"
+    assert ticket.get('missing', 'default') == 'default'
+    assert 'assigned_to' in ticket
+    
+    app = Flask(__name__)
+    with app.app_context():
+        rendered = render_template_string("{{ t.title }}|{{ t['category'] }}|{{ agents|tojson }}",
+                                          t=ticket, agents=test_db.get_all_agents()[:1])
+        title, category, agents_json = rendered.split('|', 2)
+        assert (title, category) == ("Printer jam", "Product")
+        assert json.loads(agents_json)[0]['name'] == test_db.get_all_agents()[0].name
+        
+        payload = json.loads(app.json.dumps(ticket))
+        assert payload['ticket_id'] == ticket_id
+        assert payload['username'] == "record"
@@ -0,0 +1,105 @@
+import sys
+sys.path.append('.')
+
+import calendar
+import os
+from database import Database, ShardedDatabase
+import sharding
+import ticket_ids
+
+def test_tickets_are_routed_to_shards_and_merged_back(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = ShardedDatabase(path, router=sharding.HashRouter(3))
+    user_id = test_db.create_user("shard", "shard@example.com", "secret", "Shard User")
+    priorities = ['Urgent', 'High', 'Medium', 'Low']
+    created = [
+        test_db.create_complaint(user_id, f"Printer jam {i}", "Paper stuck", "Technical", priorities[i % 4])[0]
+        for i in range(12)
+    ]
+    
+    # Each ticket is stored only in the shard its ID hashes to
+    for ticket_id in created:
+        for key, store in test_db._stores():
+            conn = store.get_connection()
+            found = conn.execute("SELECT COUNT(*) FROM complaints WHERE ticket_id = ?", (ticket_id,)).fetchone()[0]
+            conn.close()
+            assert found == (key == test_db.router.shard_for(ticket_id))
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.db')) == [
+        'test.db', 'test_archive.db', 'test_shard0.db', 'test_shard0_archive.db',
+        'test_shard1.db', 'test_shard1_archive.db', 'test_shard2.db', 'test_shard2_archive.db'
+    ]
+    assert Database.get_complaints_page(test_db, None, None)['tickets'] == []
+    
+    ticket = test_db.get_complaint_by_ticket_id(created[5])
+    assert (ticket.username, ticket.assigned_to is not None) == ("shard", True)
+    
+    # Writes follow the ticket to its shard
+    result = test_db.update_complaint_status(created[5], 'Resolved', resolution_notes="Cleared",
+                                             expected_version=ticket.row_version)
+    assert not result.conflict
+    test_db.add_agent_response(created[5], ticket.assigned_agent_id, "Cleared the jam")
+    assert [r['response_text'] for r in test_db.get_ticket_responses(created[5])] == ["Cleared the jam"]
+    
+    # Pages keep the unsharded order and cover every ticket exactly once
+    everything = test_db.get_all_complaints_admin()
+    assert sorted(t.ticket_id for t in everything) == sorted(created)
+    assert [t.priority for t in everything] == sorted((t.priority for t in everything), key=priorities.index)
+    
+    paged, cursor = [], None
+    while True:
+        page = test_db.get_complaints_page(cursor, limit=5)
+        paged.extend(page['tickets'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert [t.ticket_id for t in paged] == [t.ticket_id for t in everything]
+    
+    stats = test_db.get_dashboard_stats()
+    assert (stats['total_complaints'], stats['resolved_complaints'], stats['today_complaints']) == (12, 1, 12)
+    assert len(stats['recent_tickets']) == 10
+    assert sum(agent.assigned_tickets for agent in test_db.get_all_agents()) == 11
+    
+    hits = test_db.search_tickets("printer", limit=4)
+    assert len(hits['tickets']) == 4
+    assert len(test_db.search_tickets("printer", cursor=hits['next_cursor'], limit=20)['tickets']) == 8
+    assert len(test_db.get_user_complaints(user_id)) == 12
+    assert test_db.rebuild_ticket_counters() == []
+
+def test_tickets_stay_reachable_when_shards_are_added(tmp_path):
+    path = str(tmp_path / "test.db")
+    plain_db = Database(path)
+    user_id = plain_db.create_user("grow", "grow@example.com", "secret", "Grow User")
+    legacy_id, _ = plain_db.create_complaint(user_id, "Before sharding", "Old ticket", "Billing", "Medium")
+    
+    two = ShardedDatabase(path, router=sharding.HashRouter(2))
+    early = [two.create_complaint(user_id, f"Early {i}", "Text", "Billing", "Low")[0] for i in range(6)]
+    
+    # A third shard changes the routing of some existing tickets
+    three = ShardedDatabase(path, router=sharding.HashRouter(3))
+    assert any(two.router.shard_for(t) != three.router.shard_for(t) for t in early)
+    for ticket_id in early + [legacy_id]:
+        assert three.get_complaint_by_ticket_id(ticket_id).ticket_id == ticket_id
+        assert not three.assign_ticket_to_agent(ticket_id, 2).conflict
+    
+    assert len(three.get_all_complaints_admin()) == 7
+    assert three.get_dashboard_stats()['total_complaints'] == 7
+    assert three.get_complaint_by_ticket_id("P004-MISSING") is None
+
+def test_month_router_creates_a_file_per_creation_month(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = ShardedDatabase(path, router=sharding.MonthRouter())
+    user_id = test_db.create_user("month", "month@example.com", "secret", "Month User")
+    
+    for month in (1, 2, 2):
+        clock = lambda: calendar.timegm((2025, month, 15, 12, 0, 0))
+        generator = ticket_ids.TicketIdGenerator(clock=clock)
+        test_db.generate_ticket_id = generator.new_id
+        test_db.create_complaint(user_id, f"Month {month}", "Text", "General", "Medium")
+    
+    assert sharding.existing_shard_keys(test_db.router, path) == ['2025_01', '2025_02']
+    assert test_db.get_dashboard_stats()['total_complaints'] == 3
+    
+    # Another process sees the month files without having created them
+    other = ShardedDatabase(path, router=sharding.MonthRouter())
+    assert [key for key, _ in other._stores()] == [sharding.MAIN_KEY, '2025_01', '2025_02']
+    assert len(other.get_user_complaints(user_id)) == 3
@@ -0,0 +1,128 @@
+import sys
+sys.path.append('.')
+
+import os
+import pytest
+import sqlite3
+import threading
+from database import Database
+import manage
+import snapshots
+
+def test_snapshot_is_a_consistent_copy_taken_while_writes_continue(tmp_path):
+    path = str(tmp_path / "test.db")
+    test_db = Database(path)
+    user_id = test_db.create_user("snap", "snap@example.com", "secret", "Snap User")
+    for i in range(200):
+        test_db.create_complaint(user_id, f"Ticket {i}", "Text " * 50, "Technical", "Medium")
+    
+    # Another thread keeps writing while the copy runs in small steps
+    done = threading.Event()
+    def keep_writing():
+        writer_db = Database(path)
+        while not done.is_set():
+            writer_db.create_complaint(user_id, "During snapshot", "Text", "Billing", "Low")
+    writer = threading.Thread(target=keep_writing)
+    writer.start()
+    try:
+        snapshot, pages = test_db.create_snapshot(str(tmp_path / "snapshots"), pages=8)
+    finally:
+        done.set()
+        writer.join()
+    
+    assert pages > 0
+    assert sorted(os.listdir(snapshot)) == ["test.db", "test_archive.db"]
+    conn = sqlite3.connect(os.path.join(snapshot, "test.db"))
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    snapshot_total = conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0]
+    counted = conn.execute("SELECT count FROM ticket_counters WHERE scope = 'total'").fetchone()[0]
+    conn.close()
+    assert snapshot_total == counted >= 200
+    
+    # The snapshot keeps its contents as the live database moves on
+    test_db.create_complaint(user_id, "After snapshot", "Text", "Billing", "Low")
+    reader = test_db.open_snapshot(snapshot)
+    assert reader.get_dashboard_stats()['total_complaints'] == snapshot_total
+    assert test_db.get_dashboard_stats()['total_complaints'] > snapshot_total
+
+def test_snapshot_command_prunes_and_recreate_keeps_a_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    snapshot_dir = str(tmp_path / "snapshots")
+    monkeypatch.setenv(snapshots.SNAPSHOT_DIR_ENV, snapshot_dir)
+    test_db = Database(path)
+    user_id = test_db.create_user("keep", "keep@example.com", "secret", "Keep User")
+    test_db.create_complaint(user_id, "Keep me", "Text", "Billing", "Low")
+    
+    for _ in range(3):
+        assert manage.main(['--db', path, 'snapshot', '--keep', '2']) == 0
+    assert len(snapshots.list_snapshots(snapshot_dir)) == 2
+    
+    test_db.recreate_database()
+    assert test_db.get_dashboard_stats()['total_complaints'] == 0
+    saved = test_db.open_snapshot()
+    assert saved.get_dashboard_stats()['total_complaints'] == 1
+    assert len(snapshots.list_snapshots(snapshot_dir)) == 3
+
+def test_reports_read_from_the_latest_snapshot_read_only(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    monkeypatch.setenv(snapshots.SNAPSHOT_DIR_ENV, str(tmp_path / "snapshots"))
+    test_db = Database(path)
+    user_id = test_db.create_user("report", "report@example.com", "secret", "Report User")
+    test_db.create_complaint(user_id, "Before snapshot", "Text", "Billing", "Low")
+    test_db.create_snapshot()
+    test_db.create_complaint(user_id, "After snapshot", "Text", "Billing", "Low")
+    
+    replica = test_db.analytics_db()
+    assert replica is not test_db and replica.read_only
+    assert replica.get_detailed_analytics()['basic_stats']['total_tickets'] == 1
+    assert len(replica.export_complaints()) == 1
+    assert test_db.get_detailed_analytics()['basic_stats']['total_tickets'] == 2
+    
+    conn = replica.get_connection()
+    assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM complaints")
+    conn.close()
+    
+    # A stale snapshot is not used: reports go back to the live database
+    monkeypatch.setattr(snapshots, 'REPLICA_MAX_AGE', -1)
+    test_db._replica_checked = None
+    assert test_db.analytics_db() is test_db
+
+def test_replaced_replica_closes_its_connections(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    monkeypatch.setenv(snapshots.SNAPSHOT_DIR_ENV, str(tmp_path / "snapshots"))
+    monkeypatch.setattr(snapshots, 'REPLICA_CHECK_INTERVAL', 0)
+    test_db = Database(path)
+    user_id = test_db.create_user("report", "report@example.com", "secret", "Report User")
+    test_db.create_complaint(user_id, "First", "Text", "Billing", "Low")
+    test_db.create_snapshot()
+    
+    old = test_db.analytics_db()
+    assert old.chat_buffer is None
+    assert old.get_detailed_analytics()['basic_stats']['total_tickets'] == 1
+    idle = old.get_connection()
+    idle.close()
+    
+    # A request still holding the old replica's connection keeps it until it releases it
+    in_use = []
+    def hold():
+        in_use.append(old.get_connection())
+    worker = threading.Thread(target=hold)
+    worker.start()
+    worker.join()
+    
+    test_db.create_complaint(user_id, "Second", "Text", "Billing", "Low")
+    test_db.create_snapshot()
+    new = test_db.analytics_db()
+    assert new is not old and new.chat_buffer is None
+    assert new.get_detailed_analytics()['basic_stats']['total_tickets'] == 2
+    
+    with pytest.raises(sqlite3.ProgrammingError):
+        idle.execute("SELECT 1")
+    assert in_use[0].execute("SELECT COUNT(*) FROM complaints").fetchone() == (1,)
+    in_use[0].close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        in_use[0].execute("SELECT 1")
+    assert len(old.connections._connections) == 0
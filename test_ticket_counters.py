@@ -0,0 +1,76 @@
+import sys
+sys.path.append('.')
+
+from database import Database
+from ticket_counters import compute_counters
+
+def stored_counters(test_db):
+    conn = test_db.get_connection()
+    rows = conn.execute("SELECT scope, key, count FROM ticket_counters WHERE count != 0").fetchall()
+    conn.close()
+    return {(scope, key): count for scope, key, count in rows}
+
+def actual_counters(test_db):
+    conn = test_db.get_connection()
+    counters = compute_counters(conn.cursor())
+    conn.close()
+    return counters
+
+def test_triggers_keep_counters_exact(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("counter", "counter@example.com", "secret", "Counter User")
+    
+    ticket_ids = []
+    for priority, category in [('Urgent', 'Technical'), ('Low', 'Billing'), ('High', 'Technical')]:
+        ticket_id, _ = test_db.create_complaint(user_id, "Title", "Description", category, priority)
+        ticket_ids.append(ticket_id)
+    
+    test_db.update_complaint_status(ticket_ids[0], 'Resolved', 1, 'Fixed')
+    test_db.reassign_ticket(ticket_ids[1], 3, user_id)
+    
+    conn = test_db.get_connection()
+    conn.execute("DELETE FROM complaints WHERE ticket_id = ?", (ticket_ids[2],))
+    conn.commit()
+    conn.close()
+    
+    assert stored_counters(test_db) == actual_counters(test_db)
+    
+    stats = test_db.get_dashboard_stats()
+    assert stats['total_complaints'] == 2
+    assert stats['open_complaints'] == 1
+    assert stats['resolved_complaints'] == 1
+    assert stats['urgent_tickets'] == 0
+    
+    analytics = test_db.get_detailed_analytics()
+    assert analytics['priority_distribution'] == {'Urgent': 1, 'Low': 1}
+    assert analytics['basic_stats']['unassigned_tickets'] == 0
+
+def test_rebuild_reports_and_fixes_drift(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("counter", "counter@example.com", "secret", "Counter User")
+    test_db.create_complaint(user_id, "Title", "Description", "Billing", "Medium")
+    assert test_db.rebuild_ticket_counters() == []
+    
+    conn = test_db.get_connection()
+    conn.execute("UPDATE ticket_counters SET count = 7 WHERE scope = 'total'")
+    conn.commit()
+    conn.close()
+    
+    assert test_db.rebuild_ticket_counters() == [('total', '', 7, 1)]
+    assert stored_counters(test_db) == actual_counters(test_db)
+
+def test_agent_counters_follow_the_id_through_renames(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("counter", "counter@example.com", "secret", "Counter User")
+    ticket_id, _ = test_db.create_complaint(user_id, "Title", "Description", "Billing", "Medium")
+    agent_id = test_db.get_complaint_by_ticket_id(ticket_id).assigned_agent_id
+    
+    conn = test_db.get_connection()
+    conn.execute("UPDATE agents SET name = 'Renamed Agent' WHERE id = ?", (agent_id,))
+    conn.commit()
+    conn.close()
+    
+    assert stored_counters(test_db)[('assignee_open', str(agent_id))] == 1
+    workload = test_db.get_detailed_analytics()['agent_workload']
+    assert workload == [{'agent': 'Renamed Agent', 'total_tickets': 1, 'active_tickets': 1, 'resolved_tickets': 0}]
+    assert stored_counters(test_db) == actual_counters(test_db)
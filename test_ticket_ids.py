@@ -0,0 +1,35 @@
+import os
+import sys
+sys.path.append('.')
+
+from ticket_ids import TicketIdGenerator, id_timestamp
+
+def test_ids_are_prefixed_and_strictly_increasing():
+    now = [1700000000.0]
+    generator = TicketIdGenerator(clock=lambda: now[0])
+    
+    ids = generator.new_ids(1000)
+    now[0] -= 5  # clock stepping back must not break the order
+    ids += generator.new_ids(10)
+    now[0] += 60
+    ids.append(generator.new_id())
+    
+    assert all(ticket_id.startswith("P004-") and len(ticket_id) == 31 for ticket_id in ids)
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert id_timestamp(ids[0]) == 1700000000.0
+    assert id_timestamp(ids[-1]) == 1700000055.0
+    assert id_timestamp("P004-1A2B3C4D") is None
+
+def test_forked_children_do_not_continue_the_parent_sequence():
+    generator = TicketIdGenerator(clock=lambda: 1700000000.0)
+    generator.new_id()
+    
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_end, generator.new_id().encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    child_id = os.read(read_end, 64).decode()
+    
+    assert child_id != generator.new_id()
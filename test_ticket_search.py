@@ -0,0 +1,76 @@
+import sys
+sys.path.append('.')
+
+import pytest
+
+from database import Database
+
+def search_ids(test_db, query, **filters):
+    return [hit.ticket_id for hit in test_db.search_tickets(query, filters)['tickets']]
+
+def test_search_index_follows_tickets_and_responses(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("search", "search@example.com", "secret", "Search User")
+    
+    printer, _ = test_db.create_complaint(user_id, "Printer offline", "The office printer shows offline", "Technical", "High")
+    billing, _ = test_db.create_complaint(user_id, "Double charge", "I was billed twice for printing credits", "Billing", "Medium")
+    
+    # Title matches outrank description matches; a trailing * matches a prefix
+    assert search_ids(test_db, "print") == []
+    assert search_ids(test_db, "print*") == [printer, billing]
+    assert search_ids(test_db, "printer offline") == [printer]
+    assert search_ids(test_db, "print*", category="Billing") == [billing]
+    
+    test_db.add_agent_response(billing, 1, "Refund issued for the duplicate invoice")
+    assert search_ids(test_db, "invoice") == [billing]
+    
+    test_db.update_complaint_status(printer, 'Resolved', resolution_notes="Replaced the toner cartridge")
+    assert search_ids(test_db, "toner") == [printer]
+    assert search_ids(test_db, "toner", status="Registered") == []
+    
+    conn = test_db.get_connection()
+    conn.execute("DELETE FROM agent_responses")
+    conn.execute("DELETE FROM complaints WHERE ticket_id = ?", (printer,))
+    conn.commit()
+    conn.close()
+    assert search_ids(test_db, "invoice") == []
+    assert search_ids(test_db, "toner") == []
+    
+    test_db.create_complaints_bulk([
+        {'user_id': user_id, 'title': f"Scanner jam {i}", 'description': "Paper stuck",
+         'category': "Technical", 'priority': "Low"}
+        for i in range(5)
+    ])
+    page = test_db.search_tickets("scanner", limit=3)
+    assert len(page['tickets']) == 3
+    rest = test_db.search_tickets("scanner", cursor=page['next_cursor'], limit=3)
+    assert len(rest['tickets']) == 2 and rest['next_cursor'] is None
+    assert not {hit.id for hit in page['tickets']} & {hit.id for hit in rest['tickets']}
+
+def test_search_input_is_never_parsed_as_fts_syntax(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("search", "search@example.com", "secret", "Search User")
+    ticket_id, _ = test_db.create_complaint(user_id, "<b>Login</b> fails", "NOT working AND broken", "Technical", "High")
+    
+    [hit] = test_db.search_tickets('login "AND (fails')['tickets']
+    assert hit.ticket_id == ticket_id
+    assert '<mark>Login</mark>' in hit.snippet and '&lt;b&gt;' in hit.snippet
+    
+    with pytest.raises(ValueError):
+        test_db.search_tickets('"*()')
+    with pytest.raises(ValueError):
+        test_db.search_tickets("login", {'user_id': 1})
+    with pytest.raises(ValueError):
+        test_db.search_tickets("login", cursor="bad")
+
+def test_best_match_is_ranked_first_however_many_newer_tickets_match(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("search", "search@example.com", "secret", "Search User")
+    best, _ = test_db.create_complaint(user_id, "Router router router", "Router keeps dropping", "Technical", "High")
+    test_db.create_complaints_bulk([
+        {'user_id': user_id, 'title': f"Network issue {i}", 'description': "The router light blinks sometimes",
+         'category': "Technical", 'priority': "Low"}
+        for i in range(3000)
+    ])
+    
+    assert search_ids(test_db, "router")[0] == best
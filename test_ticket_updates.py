@@ -0,0 +1,38 @@
+import sys
+sys.path.append('.')
+
+import pytest
+from database import Database
+
+def test_stale_updates_report_a_conflict_instead_of_overwriting(tmp_path):
+    test_db = Database(str(tmp_path / "test.db"))
+    user_id = test_db.create_user("cas", "cas@example.com", "secret", "Cas User")
+    ticket_id, _ = test_db.create_complaint(user_id, "Refund pending", "Still waiting", "Billing", "Medium")
+    
+    # Two admins load the ticket at the same version
+    seen = test_db.get_complaint_by_ticket_id(ticket_id).row_version
+    
+    first = test_db.update_complaint_status(ticket_id, 'Under Review', expected_version=seen)
+    assert not first.conflict
+    assert (first.status, first.row_version, first.user_id) == ('Under Review', seen + 1, user_id)
+    
+    second = test_db.update_complaint_status(ticket_id, 'Resolved', resolution_notes="Refunded", expected_version=seen)
+    assert second.conflict
+    assert (second.status, second.row_version) == ('Under Review', seen + 1)
+    assert test_db.get_complaint_by_ticket_id(ticket_id).resolved_at is None
+    
+    agent_id = test_db.get_all_agents()[0].id
+    stale = test_db.reassign_ticket(ticket_id, agent_id, admin_id=1, expected_version=seen)
+    assert stale.conflict
+    
+    reassigned = test_db.reassign_ticket(ticket_id, agent_id, admin_id=1, expected_version=second.row_version)
+    assert (reassigned.conflict, reassigned.assigned_agent_id) == (False, agent_id)
+    
+    # Without a version the update is unconditional, as before
+    assert not test_db.assign_ticket_to_agent(ticket_id, agent_id).conflict
+    assert test_db.get_complaint_by_ticket_id(ticket_id).row_version == seen + 3
+    
+    with pytest.raises(ValueError, match="Ticket"):
+        test_db.update_complaint_status("P004-MISSING", 'Resolved', expected_version=1)
+    with pytest.raises(ValueError, match="Agent"):
+        test_db.reassign_ticket(ticket_id, 999, admin_id=1)
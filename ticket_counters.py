@@ -0,0 +1,106 @@
+"""
+Trigger-maintained ticket counters
+
+``ticket_counters`` holds one row per (scope, key) with the number of complaints
+in that bucket, e.g. ('status', 'Resolved') or ('open_priority', 'Urgent').
+SQLite triggers on complaints keep every row exact inside the same transaction
+as the ticket change, so dashboard statistics become a single small read instead
+of a dozen COUNT / GROUP BY scans over the complaints table.
+"""
+
+# Agent buckets are keyed by the agent id as text ('' when unassigned), so a
+# rename or two agents sharing a name never mix counts; see agent_names
+ASSIGNEE_KEY_SQL = "COALESCE(CAST({row}.assigned_agent_id AS TEXT), '')"
+UNASSIGNED_NAME = 'Unassigned'
+
+# (scope, key expression, condition) evaluated against the NEW / OLD row.
+# Changing this list requires a migration (in migrations.py) that recreates the triggers.
+COUNTER_DIMENSIONS = [
+    ('total', "''", None),
+    ('status', "COALESCE({row}.status, '')", None),
+    ('priority', "{row}.priority", None),
+    ('open_priority', "{row}.priority", "{row}.status != 'Resolved'"),
+    ('category', "{row}.category", None),
+    ('unassigned', "''", "{row}.assigned_agent_id IS NULL"),
+    ('assignee', ASSIGNEE_KEY_SQL, None),
+    ('assignee_open', ASSIGNEE_KEY_SQL, "{row}.status != 'Resolved'"),
+]
+
+
+def compute_counters(cursor, source='complaints'):
+    """Count every bucket from scratch with one scan per dimension"""
+    counters = {}
+    for scope, key_expr, condition in COUNTER_DIMENSIONS:
+        key_sql = key_expr.format(row='c')
+        where = condition.format(row='c') if condition else '1'
+        cursor.execute(f'''
+            SELECT {key_sql}, COUNT(*)
+            FROM {source} c
+            WHERE {where}
+            GROUP BY {key_sql}
+        ''')
+        for key, count in cursor.fetchall():
+            counters[(scope, key)] = count
+    return counters
+
+
+def add_inserted_counters(cursor, first_id):
+    """Fold complaints with id >= first_id into ticket_counters
+
+    For bulk loads that suspend the per-row insert trigger while a chunk is inserted:
+    the whole chunk is counted with one grouped query per dimension instead.
+    """
+    for scope, key_expr, condition in COUNTER_DIMENSIONS:
+        key_sql = key_expr.format(row='c')
+        where = condition.format(row='c') if condition else '1'
+        cursor.execute(f'''
+            INSERT INTO ticket_counters (scope, key, count)
+            SELECT '{scope}', {key_sql}, COUNT(*)
+            FROM complaints c
+            WHERE c.id >= ? AND {where}
+            GROUP BY {key_sql}
+            ON CONFLICT (scope, key) DO UPDATE SET count = count + excluded.count
+        ''', (first_id,))
+
+
+def rebuild_counters(cursor, source='complaints'):
+    """Recompute ticket_counters from complaints, returning the drift that was fixed
+
+    Must run inside a write transaction so no ticket changes slip in between the
+    scan and the rewrite. ``source`` is the table or subquery to count (archived
+    tickets stay counted). Returns a list of (scope, key, stored, actual).
+    """
+    cursor.execute("SELECT scope, key, count FROM ticket_counters")
+    stored = {(scope, key): count for scope, key, count in cursor.fetchall()}
+    actual = compute_counters(cursor, source)
+
+    drift = []
+    for bucket in sorted(set(stored) | set(actual)):
+        stored_count = stored.get(bucket, 0)
+        actual_count = actual.get(bucket, 0)
+        if stored_count != actual_count:
+            drift.append((bucket[0], bucket[1], stored_count, actual_count))
+
+    cursor.execute("DELETE FROM ticket_counters")
+    cursor.executemany(
+        "INSERT INTO ticket_counters (scope, key, count) VALUES (?, ?, ?)",
+        [(scope, key, count) for (scope, key), count in actual.items()]
+    )
+    return drift
+
+
+def read_counters(cursor):
+    """Load all non-zero counters as {scope: {key: count}}"""
+    cursor.execute("SELECT scope, key, count FROM ticket_counters WHERE count != 0")
+    counters = {scope: {} for scope, _, _ in COUNTER_DIMENSIONS}
+    for scope, key, count in cursor.fetchall():
+        counters.setdefault(scope, {})[key] = count
+    return counters
+
+
+def agent_names(cursor):
+    """Display names for the agent bucket keys of read_counters, as {key: name}"""
+    cursor.execute("SELECT CAST(id AS TEXT), name FROM agents")
+    names = dict(cursor.fetchall())
+    names[''] = UNASSIGNED_NAME
+    return names
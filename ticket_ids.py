@@ -0,0 +1,91 @@
+"""
+Time-sortable ticket IDs
+
+Ticket IDs are ``P004-`` followed by a 26-character ULID: a 48-bit millisecond
+timestamp and 80 random bits in Crockford base32. IDs sort by creation time, so
+new tickets append to the right edge of the ``ticket_id`` index instead of
+landing on random pages, and a range of IDs is a range of creation times.
+
+Within a process IDs are strictly increasing: several IDs in the same
+millisecond (or after the clock steps back) increment the random part of the
+previous one. Across processes the 80 random bits keep IDs unique; the state is
+reseeded after a fork so gunicorn workers never continue the same sequence.
+"""
+
+import os
+import secrets
+import threading
+import time
+
+PREFIX = 'P004-'
+ENCODING = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+ULID_LENGTH = 26
+
+
+# Two base32 characters per 10-bit step halves the work of encoding an ID
+_PAIRS = [first + second for first in ENCODING for second in ENCODING]
+
+
+def _encode(value):
+    pairs = []
+    for _ in range(ULID_LENGTH // 2):
+        value, index = divmod(value, 1024)
+        pairs.append(_PAIRS[index])
+    return ''.join(reversed(pairs))
+
+
+class TicketIdGenerator:
+    def __init__(self, prefix=PREFIX, clock=time.time):
+        self.prefix = prefix
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new_id(self):
+        """Return the next ticket ID"""
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+
+            now_ms = int(self.clock() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = secrets.randbits(RANDOM_BITS)
+            elif self._last_random < RANDOM_MAX:
+                # Same millisecond or clock went back: stay monotonic
+                self._last_random += 1
+            else:
+                self._last_ms += 1
+                self._last_random = secrets.randbits(RANDOM_BITS)
+
+            value = (self._last_ms << RANDOM_BITS) | self._last_random
+            return self.prefix + _encode(value)
+
+    def new_ids(self, count):
+        """Return ``count`` increasing ticket IDs"""
+        return [self.new_id() for _ in range(count)]
+
+
+def id_timestamp(ticket_id, prefix=PREFIX):
+    """Creation time (seconds since the epoch) encoded in a ticket ID, or None for legacy IDs"""
+    ulid = ticket_id[len(prefix):] if ticket_id.startswith(prefix) else ticket_id
+    if len(ulid) != ULID_LENGTH:
+        return None
+    value = 0
+    for char in ulid.upper():
+        index = ENCODING.find(char)
+        if index < 0:
+            return None
+        value = value * 32 + index
+    return (value >> RANDOM_BITS) / 1000
+
+
+# Process-wide generator used by Database
+generator = TicketIdGenerator()
@@ -0,0 +1,75 @@
+"""
+Full-text search over tickets with SQLite FTS5
+
+``ticket_fts`` holds one document per complaint (rowid = complaints.id) with
+the ticket's title, description and resolution notes plus the concatenated
+text of its agent responses. Triggers on complaints and agent_responses keep
+it in step inside the same transaction, so searches never scan the tickets:
+MATCH walks the inverted index and BM25 ranks only the matching rows, keeping
+just a page's worth of the best in the sort.
+
+The table stores its own copy of the text (rather than reading it back from
+complaints) because the responses column is an aggregate over another table,
+which an external-content index cannot keep consistent through triggers.
+"""
+
+import html
+import re
+
+# BM25 column weights: title, description, resolution_notes, responses
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+BM25_SQL = f"bm25(ticket_fts, {', '.join(str(weight) for weight in BM25_WEIGHTS)})"
+
+# Snippet markers are control characters so the surrounding text can be
+# HTML-escaped before they are turned into <mark> tags
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+SNIPPET_TOKENS = 16
+
+RESPONSES_SQL = "(SELECT group_concat(response_text, ' ') FROM agent_responses WHERE ticket_id = {ticket_id})"
+
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def add_inserted_documents(cursor, first_id):
+    """Index complaints with id >= first_id
+
+    The bulk-load counterpart of the insert trigger, run once per chunk.
+    """
+    cursor.execute(f'''
+        INSERT INTO ticket_fts (rowid, title, description, resolution_notes, responses)
+        SELECT c.id, c.title, c.description, c.resolution_notes, {RESPONSES_SQL.format(ticket_id='c.ticket_id')}
+        FROM complaints c
+        WHERE c.id >= ?
+    ''', (first_id,))
+
+
+def rebuild_search_index(cursor):
+    """Re-index every ticket from scratch (run in a write transaction)"""
+    cursor.execute("DELETE FROM ticket_fts")
+    add_inserted_documents(cursor, 0)
+    cursor.execute("INSERT INTO ticket_fts (ticket_fts) VALUES ('optimize')")
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query that ANDs its words
+
+    Every word is quoted so user input can never be parsed as FTS5 syntax. A
+    trailing ``*`` makes the last word match as a prefix; it is opt-in because
+    FTS5 merges the doclists of every matching term for prefixes longer than
+    the prefix indexes, which is slow for common words.
+    Returns None when the text has no searchable words.
+    """
+    terms = TERM_PATTERN.findall(text or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if text.rstrip().endswith('*'):
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def render_snippet(snippet):
+    """HTML-escape a raw snippet and turn its match markers into <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
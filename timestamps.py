@@ -0,0 +1,34 @@
+"""
+Integer and per-day forms of the stored timestamps
+
+Timestamps are stored as local wall-clock ``'%Y-%m-%d %H:%M:%S'`` strings and
+keep being returned that way. Migration 9 adds virtual generated columns that
+derive an integer epoch and a ``'YYYY-MM-DD'`` day from them, so time filters,
+windows and durations compare indexed integers or days instead of calling
+``julianday()``/``DATE()`` on every row.
+
+The epoch treats the wall-clock string as UTC: differences between two
+timestamps are exact seconds, and ``to_epoch`` gives the matching value for a
+cutoff formatted the same way.
+"""
+
+import calendar
+import time
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+EPOCH_SQL = "CAST(strftime('%s', {column}) AS INTEGER)"
+DAY_SQL = "DATE({column})"
+
+# (table, column, type, expression) for the generated columns on complaints
+DERIVED_COLUMNS = [
+    ('complaints', 'created_epoch', 'INTEGER', EPOCH_SQL.format(column='created_at')),
+    ('complaints', 'resolved_epoch', 'INTEGER', EPOCH_SQL.format(column='resolved_at')),
+    ('complaints', 'created_day', 'TEXT', DAY_SQL.format(column='created_at')),
+    ('complaints', 'resolved_day', 'TEXT', DAY_SQL.format(column='resolved_at')),
+]
+
+
+def to_epoch(timestamp):
+    """Epoch value of a stored-format timestamp, matching the generated columns"""
+    return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))